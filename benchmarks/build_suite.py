@@ -0,0 +1,213 @@
+"""
+Time full site builds on a synthetic photo set.
+
+Run from the repository root:
+    python -m benchmarks.build_suite [--photos 24] [--size 3000x2000] [--format jpeg] [--repeat 3]
+                                     [--output results.json] [--baseline previous.json] [--threshold 0.2]
+
+A throwaway site is generated in a temporary dir: photos of the requested count,
+resolution and format, plus a gallery.yaml with random tags. Each scenario runs
+build.py in a fresh process:
+    cold          empty output dir, every photo is processed
+    warm          nothing changed
+    single_image  one gallery photo replaced
+    html_only     one text field of site.yaml edited
+
+The median wall time of each scenario, with the stage timings of its median run
+(from build-metrics.json), is printed and optionally written as JSON. With
+--baseline, scenarios slower than the baseline by more than --threshold are
+reported and the script exits with status 1.
+"""
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+import yaml
+from PIL import Image
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+TAGS = ["street", "portrait", "landscape", "night", "film", "travel", "city", "nature"]
+FORMATS = {"jpeg": ("JPEG", ".jpg"), "png": ("PNG", ".png"), "webp": ("WEBP", ".webp")}
+HERO_PHOTOS = 3
+
+def make_photo(path, size, fmt, seed):
+    """Write a photo-like image: tinted gradients plus sensor-like noise"""
+    rng = random.Random(seed)
+    small = (size[0] // 8, size[1] // 8)
+    base = Image.merge("RGB", [
+        Image.linear_gradient("L").rotate(rng.randint(0, 359)).resize(small),
+        Image.radial_gradient("L").resize(small),
+        Image.effect_noise(small, rng.randint(32, 96)),
+    ]).resize(size, Image.BICUBIC)
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    Image.blend(base, noise, 0.15).save(path, FORMATS[fmt][0], quality=92)
+
+def make_site(site_dir, photos, size, fmt, seed=0):
+    """Create a Lumeex site using this checkout's builder, return the gallery photo paths"""
+    rng = random.Random(seed)
+    for name in ("src", "build.py"):
+        (site_dir / name).symlink_to(REPO_DIR / name)
+    shutil.copy(REPO_DIR / "VERSION", site_dir / "VERSION")
+    config_dir = site_dir / "config"
+    shutil.copytree(REPO_DIR / "config" / "themes", config_dir / "themes")
+
+    suffix = FORMATS[fmt][1]
+    gallery, hero = [], []
+    for i in range(photos + HERO_PHOTOS):
+        section = "hero" if i >= photos else "gallery"
+        src = f"{section}/photo-{i:05d}{suffix}"
+        path = config_dir / "photos" / src
+        path.parent.mkdir(parents=True, exist_ok=True)
+        make_photo(path, size, fmt, seed=rng.random())
+        if section == "hero":
+            hero.append({"src": src})
+        else:
+            gallery.append({"src": src, "tags": rng.sample(TAGS, rng.randint(0, 3))})
+
+    site = {
+        "info": {"title": "Benchmark", "subtitle": "Synthetic gallery", "canonical": "https://example.com"},
+        "social": {"thumbnail": gallery[0]["src"]},
+        "menu": {"items": [{"label": "Home", "href": "/"}]},
+        "footer": {"copyright": "Copyright", "legal_link": "/legals/", "legal_label": "Legal notice"},
+        "build": {"theme": "modern", "convert_images": True, "resize_images": True},
+        "legals": {"hoster_name": "Host", "intellectual_property": [{"paragraph": "All rights reserved"}]},
+    }
+    with open(config_dir / "site.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(site, f, sort_keys=False)
+    with open(config_dir / "gallery.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump({"hero": {"images": hero}, "gallery": {"images": gallery}}, f, sort_keys=False)
+    return [config_dir / "photos" / img["src"] for img in gallery]
+
+def run_build(site_dir, workers):
+    """Run build.py in a fresh process, return its wall time and build metrics"""
+    command = [sys.executable, "build.py"]
+    if workers is not None:
+        command += ["--workers", str(workers)]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=site_dir, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"build failed:\n{result.stdout}{result.stderr}")
+    with open(site_dir / "output" / ".lumeex" / "build-metrics.json", encoding="utf-8") as f:
+        return elapsed, json.load(f)
+
+def edit_title(site_dir, run):
+    """HTML-only change: rewrite the site subtitle"""
+    site_file = site_dir / "config" / "site.yaml"
+    site = yaml.safe_load(site_file.read_text(encoding="utf-8"))
+    site["info"]["subtitle"] = f"Synthetic gallery, edit {run}"
+    site_file.write_text(yaml.safe_dump(site, sort_keys=False), encoding="utf-8")
+
+def run_scenarios(site_dir, gallery_paths, args):
+    """Run every scenario args.repeat times, return {scenario: [(wall time, metrics)]}"""
+    size, fmt = args.size, args.format
+    scenarios = {
+        "cold": lambda run: shutil.rmtree(site_dir / "output", ignore_errors=True),
+        "warm": lambda run: None,
+        "single_image": lambda run: make_photo(gallery_paths[run % len(gallery_paths)], size, fmt, seed=f"change-{run}"),
+        "html_only": lambda run: edit_title(site_dir, run),
+    }
+    results = {}
+    for name, prepare in scenarios.items():
+        results[name] = []
+        for run in range(args.repeat):
+            prepare(run)
+            results[name].append(run_build(site_dir, args.workers))
+            print(f"  {name:<13} run {run + 1}/{args.repeat}: {results[name][-1][0] * 1000:8.1f} ms", file=sys.stderr)
+        # Leave a fully built site for the next scenario
+        if name == "cold":
+            run_build(site_dir, args.workers)
+    return results
+
+def summarize(results):
+    """Median wall time per scenario, with the stages and counters of the median run"""
+    summary = {}
+    for name, runs in results.items():
+        runs = sorted(runs, key=lambda item: item[0])
+        elapsed, metrics = runs[len(runs) // 2]
+        images = metrics["stages"].get("images", {})
+        summary[name] = {
+            "wall_time": round(statistics.median(item[0] for item in runs), 6),
+            "runs": [round(item[0], 6) for item in results[name]],
+            "build_wall_time": metrics["wall_time"],
+            "peak_rss": metrics["peak_rss"],
+            "images_processed": images.get("images_processed"),
+            "images_skipped": images.get("images_skipped"),
+            "stages": {stage: data["wall_time"] for stage, data in metrics["stages"].items()},
+        }
+    return summary
+
+def compare(summary, baseline, threshold):
+    """Return the scenarios slower than the baseline by more than threshold"""
+    regressions = []
+    for name, data in summary.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        ratio = data["wall_time"] / previous["wall_time"]
+        status = "REGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"{name:<13} {previous['wall_time'] * 1000:9.1f} ms → {data['wall_time'] * 1000:9.1f} ms  ({ratio:5.2f}x) {status}")
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+def parse_size(value):
+    """Parse WIDTHxHEIGHT"""
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark Lumeex builds on a synthetic gallery")
+    parser.add_argument("--photos", type=int, default=24, help="gallery photos to generate (default: 24)")
+    parser.add_argument("--size", type=parse_size, default=(3000, 2000), help="photo resolution WIDTHxHEIGHT (default: 3000x2000)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="jpeg", help="source photo format (default: jpeg)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario, the median is reported (default: 3)")
+    parser.add_argument("--workers", help="passed to build.py --workers")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic photos and tags")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="previous --output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown vs the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site_dir = Path(tmp)
+        print(f"Generating {args.photos} + {HERO_PHOTOS} {args.format} photo(s) of {args.size[0]}x{args.size[1]}", file=sys.stderr)
+        gallery_paths = make_site(site_dir, args.photos, args.size, args.format, args.seed)
+        summary = summarize(run_scenarios(site_dir, gallery_paths, args))
+
+    results = {
+        "config": {
+            "photos": args.photos, "size": list(args.size), "format": args.format,
+            "repeat": args.repeat, "workers": args.workers, "seed": args.seed,
+        },
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": summary,
+    }
+    print(f"\n{'scenario':<13} {'median':>10}  {'images':>6}  slowest stages")
+    for name, data in summary.items():
+        slowest = sorted(data["stages"].items(), key=lambda item: -item[1])[:3]
+        stages = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in slowest)
+        print(f"{name:<13} {data['wall_time'] * 1000:8.1f}ms  {data['images_processed'] or 0:>6}  {stages}")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("config") != results["config"]:
+            print("warning: baseline was recorded with a different configuration")
+        if compare(summary, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,71 @@
+"""
+Compare rendering the gallery into one string with streaming it to index.html.
+
+Run from the repository root:
+    python -m benchmarks.gallery_render [count ...]
+
+Defaults to 1k, 10k and 50k synthetic entries. For each size the script prints
+wall time and peak Python memory (tracemalloc) of both paths.
+"""
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+from itertools import chain
+from pathlib import Path
+from src.py.builder.html_generator import iter_gallery_images, render_gallery_images, write_page
+
+TAGS = ["street", "portrait", "landscape", "night", "film", "travel", "city", "nature"]
+
+def make_images(count, seed=0):
+    """Synthetic gallery entries with srcset, sources and a few random tags"""
+    rng = random.Random(seed)
+    images = []
+    for i in range(count):
+        src = f"gallery/photo-{i:06d}"
+        widths = [360, 720, 1140, 2280]
+        images.append({
+            "src": f"{src}.jpg",
+            "tags": rng.sample(TAGS, rng.randint(0, 3)),
+            "width": 1140,
+            "height": 760,
+            "srcset": [[f"{src}-{w}w.jpg", w] for w in widths],
+            "sources": [{"type": "image/webp", "srcset": [[f"{src}-{w}w.webp", w] for w in widths]}],
+        })
+    return images
+
+def joined(images, output_path):
+    """Previous behaviour: build the whole page in memory, then write it"""
+    page = f"<html><body>{render_gallery_images(images)}</body></html>"
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(page)
+
+def streamed(images, output_path):
+    """Stream each section straight to the file"""
+    write_page(output_path, chain(["<html><body>"], iter_gallery_images(images), ["</body></html>"]))
+
+def measure(func, images, output_path):
+    """Return wall time and peak traced memory of one render"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(images, output_path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main(counts):
+    counts = [int(c) for c in counts] or [1_000, 10_000, 50_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = Path(tmp) / "index.html"
+        print(f"{'entries':>8}  {'mode':<8} {'time':>10} {'peak mem':>10}  {'output':>9}")
+        for count in counts:
+            images = make_images(count)
+            for name, func in (("joined", joined), ("streamed", streamed)):
+                elapsed, peak = measure(func, images, output_path)
+                size = output_path.stat().st_size
+                print(f"{count:>8}  {name:<8} {elapsed * 1000:8.1f}ms {peak / 2**20:8.2f}MB  {size / 2**20:7.1f}MB")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
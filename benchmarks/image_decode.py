@@ -0,0 +1,83 @@
+"""
+Compare the full-decode resize with the draft decode used by the image processor.
+
+Run from the repository root:
+    python -m benchmarks.image_decode [photo.jpg ...]
+
+Without arguments a synthetic 24 MP JPEG is generated. For each photo the script
+prints wall time and peak RSS of both paths, and the PSNR between their outputs.
+"""
+import sys
+import time
+import math
+import resource
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageChops, ImageStat
+from src.py.builder.image_processor import open_image, REDUCING_GAP
+
+MAX_WIDTH = 1140
+
+def make_synthetic_photo(path, size=(6000, 4000)):
+    """Write a photo-like JPEG: smooth gradients plus sensor-like noise"""
+    small = (size[0] // 8, size[1] // 8)
+    base = Image.merge("RGB", [
+        Image.linear_gradient("L").resize(small),
+        Image.radial_gradient("L").resize(small),
+        Image.effect_noise(small, 64),
+    ]).resize(size, Image.BICUBIC)
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    Image.blend(base, noise, 0.15).save(path, "JPEG", quality=92)
+
+def resize_full(path):
+    """Baseline: full decode then LANCZOS"""
+    img = Image.open(path).convert("RGB")
+    width, height = img.size
+    return img.resize((MAX_WIDTH, int(MAX_WIDTH / width * height)), Image.LANCZOS)
+
+def resize_draft(path):
+    """Draft decode near the target then LANCZOS, as convert_and_resize_image does"""
+    img, (width, height) = open_image(path, MAX_WIDTH)
+    img = img.convert("RGB")
+    return img.resize((MAX_WIDTH, int(MAX_WIDTH / width * height)), Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def run_variant(name, path, out_path):
+    """Run one variant in a fresh process so peak RSS is not shared"""
+    func = resize_full if name == "full" else resize_draft
+    start = time.perf_counter()
+    func(path).save(out_path, "PNG")
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, peak_kb
+
+def psnr(a, b):
+    """Peak signal-to-noise ratio between two RGB images, in dB"""
+    diff = ImageChops.difference(a, b)
+    mse = sum(v ** 2 for v in ImageStat.Stat(diff).rms) / 3
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def main(paths):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if not paths:
+            synthetic = tmp / "synthetic.jpg"
+            make_synthetic_photo(synthetic)
+            paths = [synthetic]
+
+        for path in map(Path, paths):
+            results = {}
+            for name in ("full", "draft"):
+                out_path = tmp / f"{name}.png"
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    results[name] = executor.submit(run_variant, name, path, out_path).result()
+            with Image.open(tmp / "full.png") as full, Image.open(tmp / "draft.png") as draft:
+                quality = psnr(full.convert("RGB"), draft.convert("RGB"))
+
+            print(f"{path.name}")
+            for name, (elapsed, peak_kb) in results.items():
+                print(f"  {name:<6} {elapsed * 1000:8.1f} ms  peak RSS {peak_kb / 1024:7.1f} MB")
+            print(f"  PSNR draft vs full: {quality:.1f} dB (above 40 dB is visually equivalent)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
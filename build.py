@@ -1,6 +1,17 @@
 import logging
+import argparse
 from src.py.builder.site_builder import build
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format="%(message)s")
-    build()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the Lumeex static site")
+    parser.add_argument("--workers", help="number of image workers, 0 or 'auto' for one per CPU (overrides build.workers in site.yaml)")
+    parser.add_argument("--watch", action="store_true", help="rebuild whenever config/, src/templates or src/public change")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between change checks in watch mode (default: 0.05)")
+    parser.add_argument("--profile", action="store_true", help="dump cProfile stats of the image and render stages to output/.lumeex/profile")
+    args = parser.parse_args()
+    if args.watch:
+        from src.py.builder.watcher import watch
+        watch(workers=args.workers, interval=args.interval, profile=args.profile)
+    else:
+        build(workers=args.workers, profile=args.profile)
@@ -47,12 +47,21 @@ start_server() {
   cat /tmp/build_logs_fifo2 >&2 &
 
   PREVIEW_PORT="${PREVIEW_PORT:-3000}"
-  echo "[~]Starting preview HTTP server on port 3000..."
+  PREVIEW_SERVER="${PREVIEW_SERVER:-lumeex}"
+  echo "[~] Starting preview HTTP server on port 3000 (${PREVIEW_SERVER})..."
   echo "[i] Preview host port is set to: ${PREVIEW_PORT}"
-  python3 -u -m http.server 3000 -d /app/output &
+  if [ "$PREVIEW_SERVER" = "simple" ]; then
+    python3 -u -m http.server 3000 -d /app/output &
+  else
+    # Range requests, conditional GETs and precompressed .br/.gz sidecars
+    python3 -u -m src.py.webui.preview --port 3000 --dir /app/output &
+  fi
   SERVER_PID=$!
 
-  echo "[~] Starting Lumeex Flask webui..."
+  # WEBUI_MODE: production (waitress, WEBUI_THREADS threads) or development (Flask debug server)
+  export WEBUI_MODE="${WEBUI_MODE:-production}"
+  export WEBUI_THREADS="${WEBUI_THREADS:-16}"
+  echo "[~] Starting Lumeex Flask webui (${WEBUI_MODE})..."
   python3 -u -m src.py.webui.webui &
   WEBUI_PID=$!
 
@@ -1,7 +1,6 @@
 import logging
-from src.py.builder.gallery_builder import update_gallery, update_hero
+from src.py.builder.gallery_builder import sync_photos
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format="%(message)s")
-    update_gallery()
-    update_hero()
\ No newline at end of file
+    sync_photos()
\ No newline at end of file
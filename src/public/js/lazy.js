@@ -3,12 +3,16 @@
 
 window.addEventListener("DOMContentLoaded", () => {
   // Lazy loading
-  const lazyImages = document.querySelectorAll('img.lazyload');
-
   const observer = new IntersectionObserver((entries, obs) => {
     entries.forEach(entry => {
       if (entry.isIntersecting) {
         const img = entry.target;
+        if (img.parentElement.tagName === "PICTURE") {
+          img.parentElement.querySelectorAll("source[data-srcset]").forEach(source => {
+            source.srcset = source.dataset.srcset;
+          });
+        }
+        if (img.dataset.srcset) img.srcset = img.dataset.srcset;
         img.src = img.dataset.src;
         img.onload = () => {
           img.classList.add("loaded");
@@ -21,12 +25,8 @@ window.addEventListener("DOMContentLoaded", () => {
     threshold: 0.01
   });
 
-  lazyImages.forEach(img => observer.observe(img));
-
   // Fade-in effect for loaded images (even outside lazy ones)
-  const fadeImages = document.querySelectorAll("img.fade-in-img");
-
-  fadeImages.forEach(img => {
+  const setupFadeIn = (img) => {
     const onLoad = () => {
       console.log("Image loaded (fade-in):", img.src);
       img.classList.add("loaded");
@@ -48,5 +48,13 @@ window.addEventListener("DOMContentLoaded", () => {
         console.warn("Image failed to load:", img.dataset.src || img.src);
       });
     }
-  });
-});
+  };
+
+  // Also used by lumeex.js for gallery sections loaded from shards
+  window.lumeexObserveImages = (root) => {
+    root.querySelectorAll("img.lazyload").forEach(img => observer.observe(img));
+    root.querySelectorAll("img.fade-in-img").forEach(setupFadeIn);
+  };
+
+  window.lumeexObserveImages(document);
+});
\ No newline at end of file
@@ -71,22 +71,206 @@ const shuffleGallery = () => {
   }
 };
 
+// Sharded gallery: photos beyond the first page are loaded from JSON shards
+const galleryShards = {
+  gallery: null,
+  index: null,
+  requests: new Map()
+};
+
+const formatSrcset = (srcset) => srcset.map(([src, width]) => `/img/${src} ${width}w`).join(', ');
+
+// Same markup as the builder's gallery sections
+const renderGallerySection = (entry, sizes) => {
+  const section = document.createElement('div');
+  section.className = 'section';
+  if (entry.id !== undefined) section.dataset.id = entry.id;
+  section.dataset.tags = entry.tags.join(' ');
+
+  const tags = document.createElement('div');
+  tags.className = 'tags';
+  entry.tags.forEach((tag) => {
+    const tagEl = document.createElement('span');
+    tagEl.className = 'tag';
+    tagEl.textContent = `#${tag}`;
+    tags.appendChild(tagEl);
+  });
+
+  const img = document.createElement('img');
+  img.className = 'fade-in-img lazyload';
+  img.dataset.src = `/img/${entry.src}`;
+  if (entry.srcset) {
+    img.dataset.srcset = formatSrcset(entry.srcset);
+    img.sizes = sizes;
+  }
+  if (entry.width && entry.height) {
+    img.width = entry.width;
+    img.height = entry.height;
+  }
+  img.alt = entry.alt || '';
+  img.loading = 'lazy';
+
+  let media = img;
+  if (entry.sources) {
+    media = document.createElement('picture');
+    entry.sources.forEach((source) => {
+      const sourceEl = document.createElement('source');
+      sourceEl.type = source.type;
+      sourceEl.dataset.srcset = formatSrcset(source.srcset);
+      sourceEl.sizes = sizes;
+      media.appendChild(sourceEl);
+    });
+    media.appendChild(img);
+  }
+
+  section.append(tags, media);
+  return section;
+};
+
+// Fetch a shard once and append its photos, shuffled, to the gallery.
+// A failed fetch is forgotten, so the shard is requested again next time.
+const loadShard = (shardId) => {
+  const { gallery, index, requests } = galleryShards;
+  if (!requests.has(shardId)) {
+    const request = fetch(index.shards[shardId])
+      .then((res) => {
+        if (!res.ok) throw new Error(`Shard ${shardId}: HTTP ${res.status}`);
+        return res.json();
+      })
+      .then((entries) => {
+        const sections = entries.map((entry) => renderGallerySection(entry, index.sizes));
+        while (sections.length) {
+          const randomIndex = Math.floor(Math.random() * sections.length);
+          const section = sections.splice(randomIndex, 1)[0];
+          gallery.appendChild(section);
+          if (window.lumeexObserveImages) window.lumeexObserveImages(section);
+          document.dispatchEvent(new CustomEvent('lumeex:section-added', { detail: section }));
+        }
+      })
+      .catch((err) => {
+        requests.delete(shardId);
+        throw err;
+      });
+    requests.set(shardId, request);
+  }
+  return requests.get(shardId);
+};
+
+// Load only the shards holding photos with all the given tags
+const loadShardsForTags = (tags) => {
+  const { index } = galleryShards;
+  if (!index || tags.length === 0) return Promise.resolve();
+  const shardIds = tags
+    .map((tag) => index.tags[tag] || [])
+    .reduce((common, ids) => common.filter((id) => ids.includes(id)));
+  // Filter with the shards that loaded, failed ones are retried on the next filter
+  return Promise.allSettled(shardIds.map(loadShard)).then((results) => {
+    results.filter((result) => result.status === 'rejected').forEach((result) => console.error(result.reason));
+  });
+};
+
+const setupGalleryShards = () => {
+  const gallery = document.querySelector('#gallery[data-shards]');
+  if (!gallery) return Promise.resolve();
+  galleryShards.gallery = gallery;
+
+  return fetch(gallery.dataset.shards)
+    .then((res) => res.json())
+    .then((index) => {
+      galleryShards.index = index;
+      // Load the next shard when the end of the gallery gets close
+      const sentinel = document.createElement('div');
+      gallery.after(sentinel);
+      const io = new IntersectionObserver((entries) => {
+        if (!entries[0].isIntersecting) return;
+        const nextId = index.shards.findIndex((_, id) => !galleryShards.requests.has(id));
+        if (nextId === -1) {
+          io.disconnect();
+          return;
+        }
+        loadShard(nextId)
+          .then(() => {
+            // Keep loading while the sentinel is still visible
+            io.unobserve(sentinel);
+            io.observe(sentinel);
+          })
+          // Retried when the sentinel scrolls into view again
+          .catch(console.error);
+      }, { rootMargin: '0px 0px 800px 0px' });
+      io.observe(sentinel);
+    })
+    .catch(console.error);
+};
+
+// Intersection of sorted id lists
+const intersectSortedIds = (lists) => lists.reduce((a, b) => {
+  const common = [];
+  let i = 0;
+  let j = 0;
+  while (i < a.length && j < b.length) {
+    if (a[i] === b[j]) {
+      common.push(a[i]);
+      i++;
+      j++;
+    } else if (a[i] < b[j]) {
+      i++;
+    } else {
+      j++;
+    }
+  }
+  return common;
+});
+
 // Tags filter functionality
-const setupTagFilter = () => {
+const setupTagFilter = (shardsReady) => {
   const galleryContainer = document.querySelector('#gallery');
-  const allSections = document.querySelectorAll('.section[data-tags]');
-  const allTags = document.querySelectorAll('.tag');
   let activeTags = [];
   let lastClickedTag = null; // remembers the last clicked tag
   let lastClickedSection = null; // remembers the last clicked section (photo)
+  let matchingIds = null; // ids of the photos matching activeTags, from the tag index
+  let tagIndexRequest = null;
+
+  // Precomputed tag → photo ids index, fetched on first filter
+  const loadTagIndex = () => {
+    if (!tagIndexRequest) {
+      const url = galleryContainer && galleryContainer.dataset.tagIndex;
+      tagIndexRequest = url
+        ? fetch(url).then((res) => res.json()).catch(() => null)
+        : Promise.resolve(null);
+    }
+    return tagIndexRequest;
+  };
 
-  const applyFilter = () => {
+  const matchesActiveTags = (section) => {
+    if (matchingIds && section.dataset.id !== undefined) {
+      return matchingIds.has(Number(section.dataset.id));
+    }
+    const sectionTags = section.dataset.tags.toLowerCase().split(/\s+/);
+    return activeTags.every((tag) => sectionTags.includes(tag));
+  };
+
+  const updateTagStyles = (root) => {
+    root.querySelectorAll('.tag').forEach((tagEl) => {
+      const tagText = tagEl.textContent.replace('#', '').toLowerCase();
+      tagEl.classList.toggle('active', activeTags.includes(tagText));
+    });
+  };
+
+  const applyFilter = async () => {
+    // Sharded galleries first fetch the photos matching the filter
+    await shardsReady;
+    await loadShardsForTags(activeTags);
+    const tagIndex = activeTags.length > 0 ? await loadTagIndex() : null;
+    matchingIds = tagIndex
+      ? new Set(intersectSortedIds(activeTags.map((tag) => tagIndex.tags[tag] || [])))
+      : null;
+
+    const allSections = document.querySelectorAll('.section[data-tags]');
     let filteredSections = [];
     let matchingSection = null;
 
     allSections.forEach((section) => {
-      const sectionTags = section.dataset.tags.toLowerCase().split(/\s+/);
-      const hasAllTags = activeTags.every((tag) => sectionTags.includes(tag));
+      const hasAllTags = matchesActiveTags(section);
       section.style.display = hasAllTags ? '' : 'none';
 
       if (hasAllTags) {
@@ -114,10 +298,7 @@ const setupTagFilter = () => {
     }
 
     // Update tag styles
-    allTags.forEach((tagEl) => {
-      const tagText = tagEl.textContent.replace('#', '').toLowerCase();
-      tagEl.classList.toggle('active', activeTags.includes(tagText));
-    });
+    updateTagStyles(document);
 
     // Update the URL
     const base = window.location.pathname;
@@ -130,8 +311,11 @@ const setupTagFilter = () => {
     }
   };
 
-  allTags.forEach((tagEl) => {
-    tagEl.addEventListener('click', () => {
+  // Delegated, so photos loaded later from shards are clickable too
+  if (galleryContainer) {
+    galleryContainer.addEventListener('click', (e) => {
+      const tagEl = e.target.closest('.tag');
+      if (!tagEl) return;
       const tagText = tagEl.textContent.replace('#', '').toLowerCase();
       lastClickedTag = tagText; // remembers the last clicked tag
       lastClickedSection = tagEl.closest('.section'); // remembers the last clicked section
@@ -143,6 +327,13 @@ const setupTagFilter = () => {
       }
       applyFilter();
     });
+  }
+
+  // Photos loaded from shards follow the active filter
+  document.addEventListener('lumeex:section-added', (e) => {
+    const section = e.detail;
+    section.style.display = matchesActiveTags(section) ? '' : 'none';
+    updateTagStyles(section);
   });
 
   window.addEventListener('DOMContentLoaded', () => {
@@ -191,7 +382,7 @@ document.addEventListener("DOMContentLoaded", () => {
   setupLoader();
   shuffleGallery();
   randomizeHeroBackground();
-  setupTagFilter();
+  setupTagFilter(setupGalleryShards());
   disableRightClickAndDrag();
   setupScrollToTopButton();
   fixNavSeparators();
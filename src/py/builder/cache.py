@@ -0,0 +1,120 @@
+import json
+import hashlib
+import logging
+
+# Build state lives inside the output dir so it survives between builds
+STATE_DIR_NAME = ".lumeex"
+IMAGE_CACHE_FILE = "image-cache.json"
+CACHE_VERSION = 2
+# Bumped whenever the output changes outside a build, e.g. renditions written ahead of it
+OUTPUT_GENERATION_FILE = "output-generation"
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def output_generation(build_dir):
+    """Number of output changes made outside builds so far"""
+    try:
+        return int((build_dir / STATE_DIR_NAME / OUTPUT_GENERATION_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return 0
+
+def bump_output_generation(build_dir):
+    """Record an output change made outside a build"""
+    path = build_dir / STATE_DIR_NAME / OUTPUT_GENERATION_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(str(output_generation(build_dir) + 1), encoding="utf-8")
+    tmp_path.replace(path)
+
+def load_image_cache(build_dir):
+    """Load the persistent image cache, or start an empty one"""
+    cache_path = build_dir / STATE_DIR_NAME / IMAGE_CACHE_FILE
+    cache = {"version": CACHE_VERSION, "entries": {}, "used": set()}
+    if not cache_path.exists():
+        return cache
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == CACHE_VERSION:
+            cache["entries"] = data.get("entries", {})
+        else:
+            logging.warning("[~] Image cache version changed, rebuilding all images")
+    except Exception as e:
+        logging.warning(f"[~] Ignoring unreadable image cache {cache_path}: {e}")
+    return cache
+
+def save_image_cache(cache, build_dir):
+    """Write the image cache, keeping only the entries used by this build"""
+    entries = {key: entry for key, entry in cache["entries"].items() if key in cache["used"]}
+    cache_path = build_dir / STATE_DIR_NAME / IMAGE_CACHE_FILE
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "entries": entries}, f, indent=1, sort_keys=True)
+    tmp_path.replace(cache_path)
+
+def source_digest(cache, key, src_path):
+    """Hash a source image, reusing the previous hash when size and mtime are unchanged"""
+    stat = src_path.stat()
+    entry = cache["entries"].get(key)
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["source_hash"], stat
+    return hash_file(src_path), stat
+
+def params_digest(source_hash, params):
+    """Combine the source content hash with the processing parameters"""
+    payload = json.dumps({"source": source_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def cache_lookup(cache, key, src_path, params, build_dir):
+    """
+    Return (digest, stat, entry) for an image.
+    entry holds the cached outputs and meta when they are still valid, otherwise it is None.
+    """
+    source_hash, stat = source_digest(cache, key, src_path)
+    digest = params_digest(source_hash, params)
+    entry = cache["entries"].get(key)
+    cache["used"].add(key)
+    if entry and entry.get("digest") == digest and "meta" in entry:
+        outputs = entry.get("outputs", [])
+        if outputs and all((build_dir / out).exists() for out in outputs):
+            return digest, stat, entry
+    # Remember the source hash even on a miss so it is not computed twice
+    cache["entries"][key] = {
+        "source_hash": source_hash,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    return digest, stat, None
+
+def cache_store(cache, key, digest, outputs, meta):
+    """Record the outputs produced for an image, with the meta needed to reference them"""
+    entry = cache["entries"].setdefault(key, {})
+    entry["digest"] = digest
+    entry["outputs"] = sorted(outputs)
+    entry["meta"] = meta
+    cache["used"].add(key)
+
+def prune_stale_outputs(cache, build_dir, roots):
+    """Delete files under the image roots that no entry used by this build references"""
+    live = set()
+    for key in cache["used"]:
+        live.update(cache["entries"].get(key, {}).get("outputs", []))
+    removed = 0
+    for root in roots:
+        root_dir = build_dir / root
+        if not root_dir.exists():
+            continue
+        for path in root_dir.rglob("*"):
+            if path.is_file() and path.relative_to(build_dir).as_posix() not in live:
+                path.unlink()
+                removed += 1
+    if removed:
+        logging.info(f"[✓] Removed {removed} stale image(s) from previous builds")
+    return removed
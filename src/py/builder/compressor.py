@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import logging
+import os
+from pathlib import Path
+from shutil import copyfile
+from .cache import STATE_DIR_NAME
+from .pipeline import with_io, worker_threads
+
+# Brotli is optional, only gzip sidecars are written without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = {".html", ".css", ".js", ".json", ".xml", ".txt", ".svg"}
+BLOB_DIR_NAME = "compressed"
+
+def get_encoders():
+    """Return the (sidecar suffix, compress function) pairs available"""
+    encoders = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append((".br", lambda data: brotli.compress(data, quality=11)))
+    return encoders
+
+def link_or_copy(src, dest):
+    """Hard link src to dest, copying when the filesystem does not allow it"""
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        copyfile(src, dest)
+
+def compress_file(path, blob_dir, encoders):
+    """
+    Write the compressed sidecars of a file. Compressed data is stored by content hash in blob_dir,
+    so an unchanged file reuses it without compressing again.
+    Return (digest, number of encodings compressed).
+    """
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    compressed = 0
+    for suffix, compress in encoders:
+        blob = blob_dir / f"{digest}{suffix}"
+        if not blob.exists():
+            tmp_blob = blob.with_name(blob.name + ".tmp")
+            tmp_blob.write_bytes(compress(data))
+            tmp_blob.replace(blob)
+            compressed += 1
+        link_or_copy(blob, path.with_name(path.name + suffix))
+    return digest, compressed
+
+def remove_sidecars(build_dir, keep=()):
+    """Delete the .gz/.br sidecars of text assets, except those of the files in keep"""
+    keep = set(keep)
+    removed = 0
+    for path in build_dir.rglob("*"):
+        if (
+            path.suffix in (".gz", ".br")
+            and Path(path.stem).suffix.lower() in COMPRESSIBLE_SUFFIXES
+            and STATE_DIR_NAME not in path.relative_to(build_dir).parts
+            and path.with_suffix("") not in keep
+            and path.is_file()
+        ):
+            path.unlink()
+            removed += 1
+    return removed
+
+def precompress_output(build_dir, min_size=1024, workers=1):
+    """
+    Write .gz (and .br when brotli is installed) sidecars for text assets above min_size.
+    Return the compressed and unchanged counts, and the [read, written] bytes of the workers.
+    """
+    encoders = get_encoders()
+    blob_dir = build_dir / STATE_DIR_NAME / BLOB_DIR_NAME
+    blob_dir.mkdir(parents=True, exist_ok=True)
+
+    files = sorted(
+        path for path in build_dir.rglob("*")
+        if path.is_file()
+        and path.suffix.lower() in COMPRESSIBLE_SUFFIXES
+        and STATE_DIR_NAME not in path.relative_to(build_dir).parts
+        and path.stat().st_size >= min_size
+    )
+
+    def run(path):
+        try:
+            return compress_file(path, blob_dir, encoders)
+        except Exception as e:
+            logging.error(f"[✗] Error compressing {path}: {e}")
+            return None
+
+    with worker_threads(max(1, workers)) as executor:
+        measured = list(executor.map(lambda path: with_io(run, path), files))
+    results = [result for result, _ in measured]
+    worker_io = [sum(io[index] or 0 for _, io in measured) for index in range(2)]
+
+    # Sidecars of files removed or now below min_size would be served instead of them
+    remove_sidecars(build_dir, keep=files)
+
+    # Drop blobs of files that no longer exist or changed
+    live = {result[0] for result in results if result}
+    for blob in blob_dir.iterdir():
+        if blob.name.split(".", 1)[0] not in live:
+            blob.unlink()
+
+    compressed = sum(1 for result in results if result and result[1])
+    reused = sum(1 for result in results if result and not result[1])
+    encodings = ", ".join(suffix for suffix, _ in encoders)
+    logging.info(f"[✓] Precompressed {len(files)} file(s) ({encodings}): {compressed} compressed, {reused} unchanged")
+    if brotli is None:
+        logging.info("[~] brotli module not installed, skipping .br sidecars")
+    return {"compressed": compressed, "reused": reused, "worker_io": worker_io}
@@ -0,0 +1,181 @@
+import os
+import json
+import yaml
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+# libyaml bindings parse and dump an order of magnitude faster than pure Python
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# File locks are POSIX only, other platforms only get the in-process lock
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Config files that get a JSON sidecar index, read instead of the YAML while fresh
+INDEXED_FILES = {"gallery.yaml"}
+INDEX_VERSION = 1
+
+# Parsed YAML files keyed by absolute path: (mtime_ns, size, data)
+_cache = {}
+_cache_lock = threading.Lock()
+_path_locks = {}
+_flock_depth = {}
+
+def _key(path):
+    """Absolute path used to key the cache and locks"""
+    return Path(path).resolve()
+
+def _path_lock(path):
+    """In-process lock of a config file"""
+    with _cache_lock:
+        return _path_locks.setdefault(path, threading.RLock())
+
+@contextmanager
+def locked(path):
+    """Hold the lock of a config file, across threads and processes. Re-entrant."""
+    path = _key(path)
+    with _path_lock(path):
+        # Only the outermost holder takes the file lock, flock would block on itself
+        if fcntl is None or _flock_depth.get(path):
+            _flock_depth[path] = _flock_depth.get(path, 0) + 1
+            try:
+                yield
+            finally:
+                _flock_depth[path] -= 1
+            return
+        lock_path = path.with_name(f".{path.name}.lock")
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _flock_depth[path] = 1
+            try:
+                yield
+            finally:
+                _flock_depth[path] = 0
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _clone(value):
+    """Copy parsed YAML data, faster than deepcopy for plain dicts and lists"""
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+def index_path(path):
+    """Path of the sidecar index of a config file"""
+    return path.with_name(f".{path.name}.index.json")
+
+def _read_index(path, stat):
+    """
+    Return the data of a fresh sidecar index, else None. The index is fresh when it
+    records the YAML file's size and mtime, or when the YAML content hash still matches.
+    """
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("size") != stat.st_size:
+        return None
+    if index.get("mtime_ns") == stat.st_mtime_ns:
+        return index["data"]
+    # Touched or copied without changes
+    if index.get("sha256") == hashlib.sha256(path.read_bytes()).hexdigest():
+        return index["data"]
+    return None
+
+def _write_index(path, stat, raw, data):
+    """Write the sidecar index of a config file, or drop it when data is not JSON-safe"""
+    target = index_path(path)
+    try:
+        payload = json.dumps({
+            "version": INDEX_VERSION, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+            "sha256": hashlib.sha256(raw).hexdigest(), "data": data,
+        }, ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        # e.g. unquoted dates parsed by YAML
+        target.unlink(missing_ok=True)
+        return
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.write_text(payload, encoding="utf-8")
+        tmp_path.replace(target)
+    except OSError as e:
+        logging.warning(f"[~] Could not write config index {target}: {e}")
+
+def _parse(path, stat):
+    """Parse a config file, through its sidecar index when it has a fresh one"""
+    indexed = path.name in INDEXED_FILES
+    if indexed:
+        data = _read_index(path, stat)
+        if data is not None:
+            return data
+    raw = path.read_bytes()
+    data = yaml.load(raw, Loader=SafeLoader) or {}
+    if indexed:
+        _write_index(path, stat, raw, data)
+    return data
+
+def read_config(path):
+    """
+    Return the parsed content of a YAML config file, {} when missing or empty.
+    The result is cached until the file changes and shared between callers:
+    do not modify it, use load_config for a private copy.
+    """
+    path = _key(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return {}
+    cached = _cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    data = _parse(path, stat)
+    _cache[path] = (stat.st_mtime_ns, stat.st_size, data)
+    return data
+
+def load_config(path):
+    """Return a private, modifiable copy of a YAML config file"""
+    return _clone(read_config(path))
+
+def save_config(path, data):
+    """Write a YAML config file atomically (temp file + rename) under its lock"""
+    path = _key(path)
+    with locked(path):
+        _write(path, data)
+
+def _write(path, data):
+    """Atomic write, the caller holds the lock"""
+    raw = yaml.dump(data, Dumper=SafeDumper, sort_keys=False, allow_unicode=True).encode("utf-8")
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(raw)
+    tmp_path.replace(path)
+    stat = path.stat()
+    data = _clone(data)
+    _cache[path] = (stat.st_mtime_ns, stat.st_size, data)
+    if path.name in INDEXED_FILES:
+        _write_index(path, stat, raw, data)
+
+def update_config(path, update):
+    """
+    Read, modify and write a YAML config file under its lock, so concurrent edits
+    are not lost. update(data) modifies data in place or returns a replacement.
+    Return the saved data.
+    """
+    path = _key(path)
+    with locked(path):
+        data = load_config(path)
+        result = update(data)
+        if result is not None:
+            data = result
+        _write(path, data)
+    logging.debug(f"[✓] Saved {path}")
+    return data
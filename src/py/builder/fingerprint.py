@@ -0,0 +1,49 @@
+import re
+import json
+import hashlib
+import logging
+
+HASH_LENGTH = 8
+MANIFEST_FILE = "asset-manifest.json"
+# Favicons and the social thumbnail keep fixed names and are revalidated instead: browsers
+# and home screens request /favicon.ico and the touch icons directly, and link previews
+# crawled earlier keep pointing at the published thumbnail URL, which must not go away.
+
+def short_hash(data):
+    """Return a short sha256 hex digest of some bytes"""
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+def fingerprint_file(path):
+    """Rename a file to name.<hash>.ext from its content, return the new path"""
+    digest = short_hash(path.read_bytes())
+    hashed_path = path.with_name(f"{path.stem}.{digest}{path.suffix}")
+    path.replace(hashed_path)
+    return hashed_path
+
+def fingerprint_asset(build_dir, rel_path, manifest):
+    """Fingerprint an asset of the output dir, record it in the manifest and return its URL"""
+    hashed_path = fingerprint_file(build_dir / rel_path)
+    hashed_rel = hashed_path.relative_to(build_dir).as_posix()
+    manifest.setdefault("assets", {})[rel_path] = hashed_rel
+    return f"/{hashed_rel}"
+
+def fingerprint_fonts(build_dir, fonts_css_rel, preload_links, manifest):
+    """Fingerprint the font files referenced by fonts.css and rewrite fonts.css and the preload links"""
+    fonts_css = build_dir / fonts_css_rel
+    css = fonts_css.read_text(encoding="utf-8")
+    for name in sorted(set(re.findall(r"url\('\.\./fonts/([^']+)'\)", css))):
+        font_path = build_dir / "fonts" / name
+        if not font_path.exists():
+            continue
+        hashed_name = fingerprint_asset(build_dir, f"fonts/{name}", manifest).rsplit("/", 1)[1]
+        css = css.replace(f"url('../fonts/{name}')", f"url('../fonts/{hashed_name}')")
+        preload_links = [link.replace(f'href="fonts/{name}"', f'href="/fonts/{hashed_name}"') for link in preload_links]
+    fonts_css.write_text(css, encoding="utf-8")
+    return preload_links
+
+def write_asset_manifest(build_dir, manifest):
+    """Write the original → fingerprinted path mapping next to the site"""
+    output_path = build_dir / MANIFEST_FILE
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logging.info(f"[✓] Asset manifest written to {output_path}")
@@ -1,13 +1,22 @@
-import yaml
 import os
+import json
 from pathlib import Path
+from .cache import hash_file
+from .config_store import load_config, save_config, locked
 
 # YAML file paths
 GALLERY_YAML = "config/gallery.yaml"
 
 # Image directories
-GALLERY_DIR = Path("config/photos/gallery")
-HERO_DIR = Path("config/photos/hero")
+PHOTOS_DIR = Path("config/photos")
+GALLERY_DIR = PHOTOS_DIR / "gallery"
+HERO_DIR = PHOTOS_DIR / "hero"
+SECTIONS = ("gallery", "hero")
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+# Persistent state of the photo dirs: per-file size, mtime and hash
+PHOTO_INDEX = Path("config/.photos.index.json")
+PHOTO_INDEX_VERSION = 2
 
 def load_yaml(path):
     """Load gallery config .yaml file"""
@@ -15,16 +24,14 @@ def load_yaml(path):
     if not os.path.exists(path):
         print(f"[✗] File not found: {path}")
         return {}
-    with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
-        images = data.get("images", []) or []
-        print(f"[✓] Loaded {len(images)} image(s) from {path}")
-        return data
+    data = load_config(path)
+    images = data.get("images", []) or []
+    print(f"[✓] Loaded {len(images)} image(s) from {path}")
+    return data
 
 def save_yaml(data, path):
     """Save modified gallery config .yaml file"""
-    with open(path, "w", encoding="utf-8") as f:
-        yaml.dump(data, f, sort_keys=False, allow_unicode=True)
+    save_config(path, data)
     print(f"[✓] Saved updated YAML to {path}")
 
 def get_all_image_paths(directory):
@@ -32,83 +39,150 @@ def get_all_image_paths(directory):
     return sorted([
         str(p.relative_to(directory.parent)).replace("\\", "/")
         for p in directory.rglob("*")
-        if p.suffix.lower() in [".jpg", ".jpeg", ".png", ".webp"]
+        if p.suffix.lower() in IMAGE_SUFFIXES
     ])
 
+def load_photo_index():
+    """Load the photo dir index, or start an empty one"""
+    try:
+        with open(PHOTO_INDEX, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == PHOTO_INDEX_VERSION:
+            return index["dirs"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+def save_photo_index(dirs):
+    """Write the photo dir index atomically"""
+    tmp_path = PHOTO_INDEX.with_name(f"{PHOTO_INDEX.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": PHOTO_INDEX_VERSION, "dirs": dirs}, f, separators=(",", ":"))
+    tmp_path.replace(PHOTO_INDEX)
+
+def scan_dir(rel_dir, previous, dirs):
+    """
+    Record a photo dir and its subdirs in dirs. Every file is listed and stat'ed, as a file
+    overwritten in place leaves its dir mtime unchanged; only new or modified files are hashed.
+    """
+    path = PHOTOS_DIR / rel_dir
+    old_files = previous.get(rel_dir, {}).get("files", {})
+    files, subdirs = {}, []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif Path(entry.name).suffix.lower() in IMAGE_SUFFIXES:
+                    stat = entry.stat()
+                    old = old_files.get(entry.name)
+                    if old and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+                        files[entry.name] = old
+                    else:
+                        files[entry.name] = [stat.st_size, stat.st_mtime_ns, hash_file(Path(entry.path))]
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    dirs[rel_dir] = {"files": files, "dirs": sorted(subdirs)}
+    for name in dirs[rel_dir]["dirs"]:
+        scan_dir(f"{rel_dir}/{name}", previous, dirs)
+
+def section_files(dirs, section):
+    """Map the photos of a section, as gallery.yaml src paths, to their content hash"""
+    return {
+        f"{rel_dir}/{name}": state[2]
+        for rel_dir, entry in dirs.items()
+        if rel_dir == section or rel_dir.startswith(f"{section}/")
+        for name, state in entry["files"].items()
+    }
+
+def sync_photos(sections=SECTIONS):
+    """
+    Sync gallery.yaml with the photo dirs in one load and one save. Photos renamed or moved
+    (same content hash) keep their entry and tags, new photos are appended, deleted ones dropped.
+    """
+    print(f"\n=== Syncing gallery.yaml ({', '.join(sections)}) ===")
+    # Hold the lock from read to write, so concurrent edits are not lost
+    with locked(GALLERY_YAML):
+        previous = load_photo_index()
+        dirs = {}
+        for section in sections:
+            scan_dir(section, previous, dirs)
+        # Keep the state of sections not synced this time
+        dirs.update({rel_dir: entry for rel_dir, entry in previous.items() if rel_dir.split("/")[0] not in sections})
+
+        data = load_yaml(GALLERY_YAML)
+        old_files = {section: section_files(previous, section) for section in sections}
+        new_files = {section: section_files(dirs, section) for section in sections}
+
+        # Photos that appeared, by content hash, to match entries whose file disappeared
+        added = {}
+        for section in sections:
+            known = {img["src"] for img in (data.get(section) or {}).get("images") or []}
+            for src in sorted(set(new_files[section]) - known):
+                added.setdefault(new_files[section][src], []).append((section, src))
+
+        changed = {section: False for section in sections}
+        moved_entries = {section: [] for section in sections}
+        for section in sections:
+            section_data = data.get(section) or {}
+            images = section_data.get("images") or []
+            kept, renamed, removed = [], 0, 0
+            for img in images:
+                if img["src"] in new_files[section]:
+                    kept.append(img)
+                    continue
+                candidates = added.get(old_files[section].get(img["src"]))
+                if candidates:
+                    # Same content under a new name: keep the entry and its tags, and its place
+                    # in the section when renamed; only gallery photos have tags
+                    new_section, new_src = candidates.pop(0)
+                    img["src"] = new_src
+                    if new_section == "gallery":
+                        img.setdefault("tags", [])
+                    else:
+                        img.pop("tags", None)
+                    if new_section == section:
+                        kept.append(img)
+                    else:
+                        moved_entries[new_section].append(img)
+                        changed[new_section] = True
+                    renamed += 1
+                else:
+                    removed += 1
+            section_data["images"] = kept
+            data[section] = section_data
+            if renamed:
+                print(f"[✓] Kept {renamed} renamed or moved image(s) from gallery.yaml ({section})")
+            if removed:
+                print(f"[✓] Removed {removed} deleted image(s) from gallery.yaml ({section})")
+            changed[section] = changed[section] or bool(renamed or removed)
+
+        for section in sections:
+            images = data[section]["images"]
+            images.extend(moved_entries[section])
+            new_images = [
+                {"src": src, "tags": []} if section == "gallery" else {"src": src}
+                for candidates in added.values()
+                for candidate_section, src in candidates
+                if candidate_section == section
+            ]
+            if new_images:
+                images.extend(new_images)
+                print(f"[✓] Added {len(new_images)} new image(s) to gallery.yaml ({section})")
+                changed[section] = True
+            elif not changed[section]:
+                print(f"[✓] No changes to gallery.yaml ({section})")
+
+        if any(changed.values()):
+            save_yaml(data, GALLERY_YAML)
+        save_photo_index(dirs)
+
 def update_gallery():
     """Update the gallery photo list"""
-    print("\n=== Updating gallery.yaml (gallery section) ===")
-    gallery = load_yaml(GALLERY_YAML)
-
-    # Access the 'gallery' section within the gallery data, or initialize it if it doesn't exist
-    gallery_section = gallery.get("gallery", {})
-
-    # Access the 'images' list within the 'gallery' section, or initialize it if it doesn't exist
-    gallery_images = gallery_section.get("images", [])
-
-    all_images = set(get_all_image_paths(GALLERY_DIR))
-    known_images = {img["src"] for img in gallery_images}
-
-    # Add new images
-    new_images = [
-        {"src": path, "tags": []}
-        for path in all_images
-        if path not in known_images
-    ]
-    if new_images:
-        gallery_images.extend(new_images)
-        print(f"[✓] Added {len(new_images)} new image(s) to gallery.yaml (gallery)")
-
-    # Remove deleted images
-    deleted_images = known_images - all_images
-    if deleted_images:
-        gallery_images = [img for img in gallery_images if img["src"] not in deleted_images]
-        print(f"[✓] Removed {len(deleted_images)} deleted image(s) from gallery.yaml (gallery)")
-
-    # Update the 'gallery' section with the modified 'images' list
-    gallery_section["images"] = gallery_images
-    gallery["gallery"] = gallery_section
-
-    save_yaml(gallery, GALLERY_YAML)
-
-    if not new_images and not deleted_images:
-        print("[✓] No changes to gallery.yaml (gallery)")
+    sync_photos(("gallery",))
 
 def update_hero():
     """Update the hero photo list"""
-    print("\n=== Updating gallery.yaml (hero section) ===")
-    gallery = load_yaml(GALLERY_YAML)
-
-    # Access the 'hero' section within the gallery data, or initialize it if it doesn't exist
-    hero_section = gallery.get("hero", {})
-
-    # Access the 'images' list within the 'hero' section, or initialize it if it doesn't exist
-    hero_images = hero_section.get("images", [])
-
-    all_images = set(get_all_image_paths(HERO_DIR))
-    known_images = {img["src"] for img in hero_images}
-
-    # Add new images
-    new_images = [
-        {"src": path}
-        for path in all_images
-        if path not in known_images
-    ]
-    if new_images:
-        hero_images.extend(new_images)
-        print(f"[✓] Added {len(new_images)} new image(s) to gallery.yaml (hero)")
-
-    # Remove deleted images
-    deleted_images = known_images - all_images
-    if deleted_images:
-        hero_images = [img for img in hero_images if img["src"] not in deleted_images]
-        print(f"[✓] Removed {len(deleted_images)} deleted image(s) from gallery.yaml (hero)")
-
-    # Update the 'hero' section with the modified 'images' list
-    hero_section["images"] = hero_images
-    gallery["hero"] = hero_section
-
-    save_yaml(gallery, GALLERY_YAML)
-
-    if not new_images and not deleted_images:
-        print("[✓] No changes to gallery.yaml (hero)")
+    sync_photos(("hero",))
@@ -1,29 +1,190 @@
+import re
 import json
+import html
 import logging
 from pathlib import Path
+from xml.sax.saxutils import escape as xml_escape
+from collections.abc import Iterator
+from .fingerprint import short_hash
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Compiled templates keyed by path: (mtime_ns, parts)
+_template_cache = {}
+
+class RawHTML(str):
+    """Pre-rendered HTML fragment, inserted in templates without escaping"""
+
+def compile_template(template_path):
+    """
+    Parse a template into alternating literal text and placeholder names.
+    The result is cached until the template file changes.
+    """
+    template_path = Path(template_path)
+    mtime_ns = template_path.stat().st_mtime_ns
+    cached = _template_cache.get(template_path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    with open(template_path, encoding="utf-8") as f:
+        parts = tuple(PLACEHOLDER_RE.split(f.read()))
+    _template_cache[template_path] = (mtime_ns, parts)
+    return parts
+
+def render_value(value):
+    """Format a context value, HTML-escaping anything not marked as RawHTML"""
+    if value is None:
+        return ""
+    if isinstance(value, RawHTML):
+        return value
+    return html.escape(str(value))
+
+def iter_template(template_path, context):
+    """
+    Render a template piece by piece. Iterator values (e.g. generators) are streamed
+    as pre-rendered fragments, so large sections never need to be joined in memory.
+    """
+    parts = compile_template(template_path)
+    unknown = set()
+    for index, part in enumerate(parts):
+        # Even indexes are literal text, odd ones placeholder names
+        if index % 2 == 0:
+            yield part
+        elif part not in context:
+            unknown.add(part)
+        elif isinstance(context[part], Iterator):
+            yield from context[part]
+        else:
+            yield render_value(context[part])
+    if unknown:
+        logging.warning(f"[~] {Path(template_path).name}: no value for {', '.join(sorted(unknown))}")
+    unused = set(context) - set(parts[1::2])
+    if unused:
+        logging.debug(f"[~] {Path(template_path).name}: unused values {', '.join(sorted(unused))}")
 
 def render_template(template_path, context):
     """Render html templates"""
-    with open(template_path, encoding="utf-8") as f:
-        content = f.read()
-    for key, value in context.items():
-        placeholder = "{{ " + key + " }}"
-        content = content.replace(placeholder, str(value) if value is not None else "")
-    return content
+    return "".join(iter_template(template_path, context))
 
-def render_gallery_images(images):
-    """Render the photo gallery"""
-    html = ""
+def write_page(output_path, chunks):
+    """Write an HTML page from an iterable of string chunks"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.writelines(chunks)
+
+# Displayed width of gallery photos in the default stylesheet
+GALLERY_SIZES = "(max-width: 768px) 90vw, (max-width: 1340px) calc(100vw - 200px), 1140px"
+
+def format_srcset(srcset):
+    """Format [src, width] pairs as an escaped srcset attribute value"""
+    return html.escape(", ".join(f"/img/{src} {width}w" for src, width in srcset))
+
+def iter_gallery_images(images, sizes=GALLERY_SIZES):
+    """Render the photo gallery, one section at a time"""
     for img in images:
-        tags = " ".join(img.get("tags", []))
-        tag_html = "".join(f'<span class="tag">#{t}</span>' for t in img.get("tags", []))
-        html += f"""
-        <div class="section" data-tags="{tags}">
+        tags = html.escape(" ".join(img.get("tags", [])))
+        tag_html = "".join(f'<span class="tag">#{html.escape(t)}</span>' for t in img.get("tags", []))
+        attrs = ""
+        if img.get("srcset"):
+            attrs += f' data-srcset="{format_srcset(img["srcset"])}" sizes="{sizes}"'
+        if img.get("width") and img.get("height"):
+            attrs += f' width="{img["width"]}" height="{img["height"]}"'
+        img_html = f'<img class="fade-in-img lazyload" data-src="/img/{html.escape(img["src"])}"{attrs} alt="{html.escape(img.get("alt", ""))}" loading="lazy">'
+        if img.get("sources"):
+            # Let the browser pick the first format it supports, <img> stays the fallback
+            sources_html = "".join(
+                f'<source type="{source["type"]}" data-srcset="{format_srcset(source["srcset"])}" sizes="{sizes}">'
+                for source in img["sources"]
+            )
+            img_html = f"<picture>{sources_html}{img_html}</picture>"
+        data_id = f' data-id="{img["id"]}"' if "id" in img else ""
+        yield f"""
+        <div class="section"{data_id} data-tags="{tags}">
             <div class="tags">{tag_html}</div>
-            <img class="fade-in-img lazyload" data-src="/img/{img['src']}" alt="{img.get('alt', '')}" loading="lazy">
+            {img_html}
         </div>
         """
-    return html
+
+def render_gallery_images(images, sizes=GALLERY_SIZES):
+    """Render the photo gallery"""
+    return "".join(iter_gallery_images(images, sizes))
+
+def gallery_entry(img):
+    """Compact JSON form of a gallery image, as rendered client-side from shards"""
+    entry = {"src": img["src"], "tags": img.get("tags", [])}
+    if "id" in img:
+        entry["id"] = img["id"]
+    for key in ("alt", "width", "height", "srcset", "sources"):
+        if img.get(key):
+            entry[key] = img[key]
+    return entry
+
+def generate_gallery_shards(images, output_dir, shard_size=100, version=None, fingerprint=False, sizes=GALLERY_SIZES):
+    """
+    Write gallery entries as fixed-size JSON shards under data/shards, plus an index
+    with the shard URLs and, for each tag, the shards holding at least one tagged photo.
+    Return the index URL.
+    """
+    shards_dir = output_dir / "data" / "shards"
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    shard_urls = []
+    tag_shards = {}
+    for shard_id, start in enumerate(range(0, len(images), shard_size)):
+        entries = [gallery_entry(img) for img in images[start:start + shard_size]]
+        data = json.dumps(entries, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        name = f"{shard_id}.{short_hash(data)}.json" if fingerprint else f"{shard_id}.json"
+        (shards_dir / name).write_bytes(data)
+        shard_urls.append(f"/data/shards/{name}" + (f"?{version}" if version and not fingerprint else ""))
+        for tag in sorted({tag for entry in entries for tag in entry["tags"]}):
+            tag_shards.setdefault(tag.lower(), []).append(shard_id)
+
+    index = {"count": len(images), "shard_size": shard_size, "sizes": sizes, "shards": shard_urls, "tags": tag_shards}
+    index_path = shards_dir / "index.json"
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"), ensure_ascii=False)
+    logging.info(f"[✓] Generated {len(shard_urls)} gallery shard(s) for {len(images)} image(s): {index_path}")
+    return "/data/shards/index.json" + (f"?{version}" if version else "")
+
+def tag_slug(tag):
+    """URL-safe name of a tag page"""
+    return re.sub(r"[^\w-]+", "-", tag.lower()).strip("-")
+
+def tag_slugs(tags):
+    """
+    Map each tag to a unique slug. When several tags share a slug ("B&W", "b-w"), the first
+    in sorted order keeps it and the others get a short hash suffix; so do tags without any
+    URL-safe character.
+    """
+    slugs = {}
+    used = set()
+    for tag in sorted(tags):
+        slug = tag_slug(tag)
+        if not slug or slug in used:
+            slug = f"{slug or 'tag'}-{short_hash(tag.encode('utf-8'))[:6]}"
+        used.add(slug)
+        slugs[tag] = slug
+    return slugs
+
+def group_images_by_tag(images):
+    """Map each lowercased tag to its images, keeping the gallery order"""
+    groups = {}
+    for img in images:
+        for tag in dict.fromkeys(t.lower() for t in img.get("tags", [])):
+            groups.setdefault(tag, []).append(img)
+    return dict(sorted(groups.items()))
+
+def generate_tag_index(images, output_dir, version=None):
+    """
+    Write data/tags.json, mapping each tag to the sorted ids of its gallery images,
+    so the browser intersects id lists instead of scanning every section.
+    Return the index URL.
+    """
+    tags = {tag: sorted(img["id"] for img in tagged) for tag, tagged in group_images_by_tag(images).items()}
+    output_path = output_dir / "data" / "tags.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"count": len(images), "tags": tags}, f, separators=(",", ":"), ensure_ascii=False)
+    logging.info(f"[✓] Generated tag index ({len(tags)} tag(s)): {output_path}")
+    return "/data/tags.json" + (f"?{version}" if version else "")
 
 def generate_gallery_json_from_images(images, output_dir):
     """Generte the hero carrousel photo list"""
@@ -72,7 +233,7 @@ def generate_sitemap_xml(canonical_url, allowed_paths, output_dir):
     urls = ""
     for path in allowed_paths:
         loc = canonical_url.rstrip("/") + path
-        urls += f"  <url>\n    <loc>{loc}</loc>\n  </url>\n"
+        urls += f"  <url>\n    <loc>{xml_escape(loc)}</loc>\n  </url>\n"
     sitemap_content = urlset_start + urls + urlset_end
     output_path = output_dir / "sitemap.xml"
     with open(output_path, "w", encoding="utf-8") as f:
@@ -1,74 +1,287 @@
 import logging
+from math import ceil
 from pathlib import Path
-from PIL import Image, features
+from PIL import Image
 from shutil import copyfile
+from concurrent.futures import ProcessPoolExecutor
+from .cache import cache_lookup, cache_store
+from .pipeline import with_io, worker_threads
+from .fingerprint import fingerprint_file
 
-def convert_and_resize_image(input_path, output_path, resize=True, max_width=1140):
-    """Convert an image to WebP (or JPEG fallback) and optionally resize it."""
+# Same trade-off as Image.thumbnail: decode JPEGs at >= 2x the target, then box-reduce to >= 3x before LANCZOS
+DRAFT_GAP = 2.0
+REDUCING_GAP = 3.0
+
+# Output formats: Pillow format, file suffix, MIME type and default quality
+OUTPUT_FORMATS = {
+    "avif": ("AVIF", ".avif", "image/avif", 60),
+    "webp": ("WEBP", ".webp", "image/webp", 100),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg", 90),
+}
+
+def get_output_formats(names=None, quality=None):
+    """
+    Resolve the configured output formats, best first and most compatible last.
+    Unsupported formats are skipped. Defaults to WebP, or JPEG when WebP is not available.
+    Return a list of (pillow format, suffix, mime type, quality).
+    """
+    Image.init()
+    quality = quality or {}
+    if not names:
+        names = ["webp"] if "WEBP" in Image.SAVE else ["jpeg"]
+    formats = []
+    for name in names:
+        name = str(name).lower().replace("jpg", "jpeg")
+        if name not in OUTPUT_FORMATS:
+            logging.warning(f"[~] Unknown output format '{name}', skipping")
+            continue
+        fmt, suffix, mime, default_quality = OUTPUT_FORMATS[name]
+        if fmt not in Image.SAVE:
+            logging.warning(f"[~] {fmt} is not supported by this Pillow build, skipping")
+            continue
+        formats.append((fmt, suffix, mime, int(quality.get(name, default_quality))))
+    return formats or [("JPEG", ".jpg", "image/jpeg", int(quality.get("jpeg", 90)))]
+
+def open_image(input_path, max_width=None):
+    """
+    Open an image, letting JPEGs decode at a reduced scale when only max_width pixels are needed.
+    Return the image and its original size.
+    """
+    img = Image.open(input_path)
+    width, height = img.size
+    if max_width and img.format == "JPEG" and width > max_width * DRAFT_GAP:
+        # The decoder picks the smallest 1/2, 1/4 or 1/8 scale that still covers the requested size
+        draft_width = ceil(max_width * DRAFT_GAP)
+        img.draft(None, (draft_width, ceil(height * draft_width / width)))
+    return img, (width, height)
+
+def resize_to_width(img, original_size, target_width):
+    """Resize a (possibly draft-decoded) image to target_width, keeping the original aspect ratio."""
+    width, height = original_size
+    if width <= target_width:
+        return img if img.size == original_size else img.resize(original_size, Image.LANCZOS)
+    new_height = int((target_width / width) * height)
+    return img.resize((target_width, new_height), Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def generate_renditions(input_path, output_path, resize=True, max_width=1140, widths=(), formats=None, fingerprint=False):
+    """
+    Convert an image to every output format from a single decode: the main rendition, resized to
+    max_width when enabled, plus one file per extra srcset width narrower than the original.
+    With fingerprint, file names get a content hash (photo.<hash>.webp).
+    Return a list of (path, width, height, mime type), main rendition of the last format first.
+    """
     try:
         if not input_path.exists():
             logging.error(f"[✗] Image file not found: {input_path}")
-            return
+            return None
 
-        img = Image.open(input_path)
+        formats = formats or get_output_formats()
+        extra_widths = sorted({w for w in widths if w != max_width}) if resize else []
+        img, original_size = open_image(input_path, max([max_width, *extra_widths]) if resize else None)
         icc_profile = img.info.get("icc_profile")
         if img.mode != "RGB":
             img = img.convert("RGB")
 
-        if resize:
-            width, height = img.size
-            if width > max_width:
-                new_height = int((max_width / width) * height)
-                img = img.resize((max_width, new_height), Image.LANCZOS)
-
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Check WebP support, otherwise fallback to JPEG
-        fmt = "WEBP" if features.check("webp") else "JPEG"
-        if fmt == "JPEG":
-            output_path = output_path.with_suffix(".jpg")
+        sized = [resize_to_width(img, original_size, max_width) if resize else img]
+        sized += [resize_to_width(img, original_size, w) for w in extra_widths if w < original_size[0]]
+
+        renditions = []
+        # The last format is the <img> fallback, its main rendition comes first
+        for fmt, suffix, mime, quality in reversed(formats):
+            save_kwargs = {"quality": quality}
+            if icc_profile:
+                save_kwargs["icc_profile"] = icc_profile
+            for index, rendition in enumerate(sized):
+                path = output_path.with_suffix(suffix)
+                if index:
+                    path = path.with_name(f"{path.stem}-{rendition.width}w{suffix}")
+                rendition.save(path, fmt, **save_kwargs)
+                if fingerprint:
+                    path = fingerprint_file(path)
+                renditions.append((path, rendition.width, rendition.height, mime))
 
-        save_kwargs = {"quality": 90 if fmt == "JPEG" else 100}
-        if icc_profile:
-            save_kwargs["icc_profile"] = icc_profile
-        img.save(output_path, fmt, **save_kwargs)
-        logging.info(f"[✓] Processed image: {input_path} → {output_path}")
+        logging.info(f"[✓] Processed image: {input_path} → {renditions[0][0]} ({len(renditions)} rendition(s))")
+        return renditions
 
     except Exception as e:
         logging.error(f"[✗] Error processing image {input_path}: {e}")
+        return None
+
+def convert_and_resize_image(input_path, output_path, resize=True, max_width=1140):
+    """Convert an image to WebP (or JPEG fallback) and optionally resize it. Return the written path."""
+    renditions = generate_renditions(input_path, output_path, resize=resize, max_width=max_width)
+    return renditions[0][0] if renditions else None
+
+def apply_image_meta(img, meta):
+    """Point an image reference to its processed files and intrinsic size."""
+    img["src"] = meta["src"]
+    if meta.get("width"):
+        img["width"] = meta["width"]
+        img["height"] = meta["height"]
+    if meta.get("srcset"):
+        img["srcset"] = meta["srcset"]
+    if meta.get("sources"):
+        img["sources"] = meta["sources"]
 
-def process_images(images, resize_images, img_dir, build_dir):
-    """Process a list of image references and update paths to optimized versions."""
+def run_image_jobs(func, jobs, workers=1, processes=True, io=None):
+    """
+    Run func(*args) for each job, in a pool when workers > 1.
+    Results keep the order of jobs, a failing job yields None instead of aborting the others.
+    The bytes read and written by pool workers are added to io, a [read, written] list:
+    build metrics only see the I/O of the calling thread.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        return [func(*args) for args in jobs]
+
+    executor_cls = ProcessPoolExecutor if processes else worker_threads
+    results = []
+    with executor_cls(min(workers, len(jobs))) as executor:
+        futures = [executor.submit(with_io, func, *args) for args in jobs]
+        for args, future in zip(jobs, futures):
+            try:
+                result, job_io = future.result()
+                results.append(result)
+                if io is not None:
+                    for index, count in enumerate(job_io):
+                        io[index] += count or 0
+            except Exception as e:
+                logging.error(f"[✗] Worker failed on {args[0]}: {e}")
+                results.append(None)
+    return results
+
+def process_images(images, resize_images, img_dir, build_dir, cache=None, max_width=1140, workers=1, widths=(), formats=None, fingerprint=False):
+    """
+    Process a list of image references and update paths to optimized versions.
+    Return the number of images processed, skipped from cache and failed.
+    """
+    formats = formats or get_output_formats()
+    widths = sorted({int(w) for w in widths or ()}) if resize_images else []
+    params = {
+        "mode": "convert", "resize": resize_images, "max_width": max_width, "widths": widths,
+        "formats": [[fmt, quality] for fmt, _, _, quality in formats],
+        "draft_gap": DRAFT_GAP, "reducing_gap": REDUCING_GAP, "fingerprint": fingerprint,
+    }
+    img_root = build_dir / "img"
+    skipped = 0
+    pending = []
+    jobs = []
     for img in images:
         src_path = img_dir / img["src"]
-        webp_path = build_dir / "img" / Path(img["src"]).with_suffix(".webp")
-        convert_and_resize_image(src_path, webp_path, resize=resize_images)
+        webp_path = img_root / Path(img["src"]).with_suffix(".webp")
 
-        if webp_path.exists():
-            img["src"] = str(Path(img["src"]).with_suffix(".webp"))
+        # Reuse the previous outputs when the source and parameters are unchanged
+        digest = None
+        if cache is not None and src_path.exists():
+            digest, _, entry = cache_lookup(cache, img["src"], src_path, params, build_dir)
+            if entry:
+                apply_image_meta(img, entry["meta"])
+                skipped += 1
+                continue
+
+        pending.append((img, digest))
+        jobs.append((src_path, webp_path, resize_images, max_width, widths, formats, fingerprint))
+
+    if jobs and workers > 1:
+        logging.info(f"[~] Processing {len(jobs)} image(s) with {workers} workers")
+    worker_io = [0, 0]
+    results = run_image_jobs(generate_renditions, jobs, workers, io=worker_io)
+
+    failed = 0
+    for (img, digest), renditions in zip(pending, results):
+        if not renditions:
+            failed += 1
+            continue
+        main_path, width, height, fallback_mime = renditions[0]
+        meta = {"src": main_path.relative_to(img_root).as_posix(), "width": width, "height": height}
+        by_mime = {}
+        for path, w, _, mime in renditions:
+            by_mime.setdefault(mime, []).append([path.relative_to(img_root).as_posix(), w])
+        for srcset in by_mime.values():
+            srcset.sort(key=lambda item: item[1])
+        if len(by_mime[fallback_mime]) > 1:
+            meta["srcset"] = by_mime.pop(fallback_mime)
         else:
-            # Fallback if WebP not created
-            jpg_path = webp_path.with_suffix(".jpg")
-            if jpg_path.exists():
-                img["src"] = str(Path(img["src"]).with_suffix(".jpg"))
+            by_mime.pop(fallback_mime)
+        if by_mime:
+            # Best format first, as browsers pick the first <source> they support
+            meta["sources"] = [{"type": mime, "srcset": srcset} for mime, srcset in reversed(by_mime.items())]
+        if digest:
+            cache_store(cache, img["src"], digest, [path.relative_to(build_dir).as_posix() for path, _, _, _ in renditions], meta)
+        apply_image_meta(img, meta)
+
+    if skipped:
+        logging.info(f"[✓] Skipped {skipped} unchanged image(s) from cache")
+    return {"processed": len(jobs) - failed, "skipped": skipped, "failed": failed, "worker_read_bytes": worker_io[0], "worker_written_bytes": worker_io[1]}
+
+def copy_original_image(src_path, dest_path, fingerprint=False):
+    """Copy a single original image file, optionally with a content hash in its name. Return the written path."""
+    try:
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        copyfile(src_path, dest_path)
+        if fingerprint:
+            dest_path = fingerprint_file(dest_path)
+        logging.info(f"[✓] Copied original: {src_path} → {dest_path}")
+        return dest_path
+
+    except Exception as e:
+        logging.error(f"[✗] Error copying {src_path}: {e}")
+        return None
 
-def copy_original_images(images, img_dir, build_dir):
-    """Copy original image files without processing."""
+def copy_original_images(images, img_dir, build_dir, cache=None, workers=1, fingerprint=False):
+    """
+    Copy original image files without processing.
+    Return the number of images copied, skipped from cache and failed.
+    """
+    params = {"mode": "copy", "fingerprint": fingerprint}
+    skipped = 0
+    failed = 0
+    pending = []
+    jobs = []
     for img in images:
         src_path = img_dir / img["src"]
         dest_path = build_dir / "img" / img["src"]
 
-        try:
-            if not src_path.exists():
-                logging.error(f"[✗] Original image not found: {src_path}")
+        if not src_path.exists():
+            logging.error(f"[✗] Original image not found: {src_path}")
+            failed += 1
+            continue
+
+        digest = None
+        if cache is not None:
+            digest, _, entry = cache_lookup(cache, img["src"], src_path, params, build_dir)
+            if entry:
+                apply_image_meta(img, entry["meta"])
+                skipped += 1
                 continue
 
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
-            copyfile(src_path, dest_path)
-            logging.info(f"[✓] Copied original: {src_path} → {dest_path}")
+        pending.append((img, digest))
+        jobs.append((src_path, dest_path, fingerprint))
+
+    # Copies are I/O bound, threads are enough
+    worker_io = [0, 0]
+    results = run_image_jobs(copy_original_image, jobs, workers, processes=False, io=worker_io)
+
+    for (img, digest), dest_path in zip(pending, results):
+        if not dest_path:
+            failed += 1
+            continue
+        meta = {"src": dest_path.relative_to(build_dir / "img").as_posix()}
+        # Only the header is read, to give the gallery its intrinsic size
+        try:
+            with Image.open(dest_path) as copied:
+                meta.update(width=copied.width, height=copied.height)
+        except Exception:
+            pass
+        if digest:
+            cache_store(cache, img["src"], digest, [dest_path.relative_to(build_dir).as_posix()], meta)
+        apply_image_meta(img, meta)
 
-        except Exception as e:
-            logging.error(f"[✗] Error copying {src_path}: {e}")
+    if skipped:
+        logging.info(f"[✓] Skipped {skipped} unchanged original(s) from cache")
+    copied = len(jobs) - sum(1 for dest_path in results if not dest_path)
+    return {"processed": copied, "skipped": skipped, "failed": failed, "worker_read_bytes": worker_io[0], "worker_written_bytes": worker_io[1]}
 
 def get_favicon_path(theme_vars, theme_dir):
     """Retrieve the favicon path from theme variables, ensuring it exists."""
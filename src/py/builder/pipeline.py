@@ -0,0 +1,371 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+import hashlib
+import logging
+from datetime import datetime
+from contextlib import nullcontext
+from pathlib import Path
+from dataclasses import dataclass
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .cache import STATE_DIR_NAME
+
+# Peak RSS comes from getrusage, which is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STAGE_STATE_FILE = "stages.json"
+METRICS_FILE = "build-metrics.json"
+PROFILE_DIR_NAME = "profile"
+STAGE_THREADS = 4
+
+@dataclass
+class Stage:
+    """
+    A build step. run(ctx) starts once every stage named in after has finished,
+    and may return a dict of counters recorded in the build metrics. A "worker_io"
+    counter, [bytes read, bytes written] by pool workers, is added to the stage I/O.
+    When inputs(ctx) is given, the stage is skipped while its fingerprint is unchanged,
+    none of the stages in after ran and every path returned by outputs(ctx) still exists.
+    The ctx keys named in provides are saved with the fingerprint and restored when
+    the stage is skipped, before outputs(ctx) is called. Their values must be JSON.
+    """
+    name: str
+    run: Callable
+    after: tuple = ()
+    inputs: Callable = None
+    outputs: Callable = None
+    provides: tuple = ()
+
+def _stat_path(value):
+    """JSON fallback for input values: paths are fingerprinted by size and mtime"""
+    if isinstance(value, Path):
+        try:
+            stat = value.stat()
+            return [str(value), stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            return [str(value), None]
+    return str(value)
+
+def stage_fingerprint(inputs):
+    """Digest of a stage inputs: config values and the size/mtime of source files"""
+    payload = json.dumps(inputs, sort_keys=True, default=_stat_path)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def stage_state_path(build_dir):
+    """Where the stage fingerprints of the previous build are kept"""
+    return build_dir / STATE_DIR_NAME / STAGE_STATE_FILE
+
+def load_stage_state(build_dir):
+    """Load the input fingerprints and provided values recorded by the previous build"""
+    state_path = stage_state_path(build_dir)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"[~] Ignoring unreadable stage state {state_path}: {e}")
+        return {}
+
+def save_stage_state(state, build_dir):
+    """Write the input fingerprints and provided values of this build"""
+    state_path = stage_state_path(build_dir)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    tmp_path.replace(state_path)
+
+def check_stages(stages):
+    """Make sure stage names are unique, dependencies exist and there is no cycle"""
+    names = {stage.name for stage in stages}
+    if len(names) != len(stages):
+        raise ValueError("[✗] Duplicate build stage names")
+    for stage in stages:
+        missing = set(stage.after) - names
+        if missing:
+            raise ValueError(f"[✗] Stage {stage.name} depends on unknown stage(s): {', '.join(sorted(missing))}")
+    done = set()
+    pending = list(stages)
+    while pending:
+        ready = [stage for stage in pending if set(stage.after) <= done]
+        if not ready:
+            raise ValueError(f"[✗] Dependency cycle between stages: {', '.join(s.name for s in pending)}")
+        done.update(stage.name for stage in ready)
+        pending = [stage for stage in pending if stage.name not in done]
+
+def critical_path(stages, timings):
+    """Return the chain of stages with the longest total duration, and that duration"""
+    by_name = {stage.name: stage for stage in stages}
+    longest = {}
+
+    def finish(name):
+        if name not in longest:
+            deps = by_name[name].after
+            prev = max(deps, key=lambda dep: finish(dep)[0]) if deps else None
+            total = timings.get(name, 0.0) + (finish(prev)[0] if prev else 0.0)
+            longest[name] = (total, prev)
+        return longest[name]
+
+    end = max(by_name, key=lambda name: finish(name)[0])
+    total = finish(end)[0]
+    path = []
+    while end:
+        path.append(end)
+        end = longest[end][1]
+    return path[::-1], total
+
+def should_skip(stage, ctx, state, fingerprints, ran):
+    """
+    Compute the stage fingerprint and tell whether its previous outputs can be reused.
+    A stage runs again whenever one of its dependencies ran, as their outputs changed.
+    """
+    if stage.inputs is None:
+        return False
+    fingerprints[stage.name] = stage_fingerprint(stage.inputs(ctx))
+    previous = state.get(stage.name)
+    if not isinstance(previous, dict) or previous.get("fingerprint") != fingerprints[stage.name]:
+        return False
+    if any(dep in ran for dep in stage.after):
+        return False
+    provided = previous.get("provides", {})
+    if not set(stage.provides) <= provided.keys():
+        return False
+    ctx.update(provided)
+    outputs = stage.outputs(ctx) if stage.outputs else []
+    return all(Path(path).exists() for path in outputs)
+
+def dependents(stages, names):
+    """The named stages and every stage depending on them, directly or not"""
+    affected = set(names)
+    grown = True
+    while grown:
+        grown = False
+        for stage in stages:
+            if stage.name not in affected and affected.intersection(stage.after):
+                affected.add(stage.name)
+                grown = True
+    return affected
+
+def reuse_previous(stage, ctx, state, fingerprints, ran):
+    """Restore the provided values of a stage from the previous build, without checking its inputs"""
+    previous = state.get(stage.name)
+    if not isinstance(previous, dict) or any(dep in ran for dep in stage.after):
+        return False
+    provided = previous.get("provides", {})
+    if not set(stage.provides) <= provided.keys():
+        return False
+    ctx.update({key: provided[key] for key in stage.provides})
+    fingerprints[stage.name] = previous.get("fingerprint")
+    return True
+
+def peak_rss(who=None):
+    """Process-wide peak resident memory in bytes, None when unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def workers_peak_rss():
+    """
+    Peak resident memory in bytes of the largest worker process that exited so far, None when
+    unknown. Image workers run in their own processes, the build process peak misses them.
+    """
+    return peak_rss(resource.RUSAGE_CHILDREN) if resource else None
+
+def current_rss():
+    """Current resident memory of the build process in bytes, None when unknown"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def children_cpu_time():
+    """CPU time used by finished worker processes, None when unknown"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def thread_io():
+    """Bytes read and written by the calling thread so far, (None, None) when unknown"""
+    try:
+        with open("/proc/thread-self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def io_delta(before, after):
+    """Difference between two readings of counters, None where either is unknown"""
+    return [b - a if a is not None and b is not None else None for a, b in zip(before, after)]
+
+def with_io(func, *args):
+    """
+    Call func(*args) and return its result with the [bytes read, bytes written] of the
+    calling thread meanwhile. Pool workers use it to report I/O the stage cannot see.
+    """
+    before = thread_io()
+    result = func(*args)
+    return result, io_delta(before, thread_io())
+
+def write_build_metrics(metrics, build_dir):
+    """Write the metrics of this build as JSON in the state dir"""
+    metrics_path = build_dir / STATE_DIR_NAME / METRICS_FILE
+    metrics_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+    logging.info(f"[✓] Build metrics written to {metrics_path}")
+
+def worker_threads(max_workers):
+    """Thread pool named after the calling thread, so log records of its threads can be traced back to it"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name)
+
+def run_stages(stages, ctx, build_dir, threads=STAGE_THREADS, profile=(), info=None, progress=None, targets=None):
+    """
+    Run build stages as soon as their dependencies are done, independent stages
+    concurrently. Stages after a failed one are not run; the first error is raised
+    once running stages have finished. progress(stage name, finished count, total)
+    is called as each stage ends.
+    Per-stage metrics are written to build-metrics.json, along with info. Stages named
+    in profile run under cProfile, one at a time, and dump a .pstats file each; the
+    other stages keep running concurrently.
+    When targets names the stages whose sources changed, only they and their dependents
+    are checked; the others reuse the previous build results as they are.
+    Return the metrics.
+    """
+    check_stages(stages)
+    state = load_stage_state(build_dir)
+    affected = dependents(stages, targets) if targets is not None else {stage.name for stage in stages}
+    fingerprints = {}
+    provided = {}
+    ran = set()
+    stage_metrics = {}
+    timings = {}
+    skipped = []
+    failed = {}
+    done = set()
+    pending = list(stages)
+    running = {}
+    profile_dir = build_dir / STATE_DIR_NAME / PROFILE_DIR_NAME
+    # Only one profiler can be active at a time
+    profile_lock = threading.Lock()
+    if profile:
+        profile_dir.mkdir(parents=True, exist_ok=True)
+
+    def run(stage):
+        with profile_lock if stage.name in profile else nullcontext():
+            measure(stage)
+
+    def measure(stage):
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        io_start = thread_io()
+        memory_start = current_rss(), peak_rss(), workers_peak_rss()
+        counters = {}
+        try:
+            if stage.name not in affected and reuse_previous(stage, ctx, state, fingerprints, ran):
+                skipped.append(stage.name)
+            elif should_skip(stage, ctx, state, fingerprints, ran):
+                skipped.append(stage.name)
+            else:
+                ran.add(stage.name)
+                if stage.name in profile:
+                    profiler = cProfile.Profile()
+                    try:
+                        counters = profiler.runcall(stage.run, ctx) or {}
+                    finally:
+                        profiler.dump_stats(profile_dir / f"{stage.name}.pstats")
+                else:
+                    counters = stage.run(ctx) or {}
+            provided[stage.name] = {key: ctx.get(key) for key in stage.provides}
+        finally:
+            timings[stage.name] = time.perf_counter() - start
+            read_bytes, written_bytes = io_delta(io_start, thread_io())
+            worker_io = counters.pop("worker_io", None) or [0, 0]
+            rss_delta, peak_rss_delta, workers_peak_rss_delta = io_delta(memory_start, (current_rss(), peak_rss(), workers_peak_rss()))
+            stage_metrics[stage.name] = {
+                "wall_time": round(timings[stage.name], 6),
+                "cpu_time": round(time.thread_time() - cpu_start, 6),
+                # Memory kept by the stage, and how much it raised the process peak. Stages
+                # running concurrently share these, the process peak is reported as is
+                "rss_delta": rss_delta,
+                "peak_rss_delta": peak_rss_delta,
+                "process_peak_rss": peak_rss(),
+                # How much the worker processes of the stage raised the largest worker peak
+                "workers_peak_rss_delta": workers_peak_rss_delta,
+                # The stage thread and its pool workers
+                "read_bytes": read_bytes + (worker_io[0] or 0) if read_bytes is not None else None,
+                "written_bytes": written_bytes + (worker_io[1] or 0) if written_bytes is not None else None,
+                "skipped": stage.name in skipped,
+                **counters,
+            }
+
+    started = datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    workers_cpu_start = children_cpu_time()
+    with worker_threads(max(1, threads)) as executor:
+        while pending or running:
+            for stage in [s for s in pending if set(s.after) <= done]:
+                pending.remove(stage)
+                running[executor.submit(run, stage)] = stage
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                if progress:
+                    progress(stage.name, len(stages) - len(pending) - len(running), len(stages))
+                if future.exception() is not None:
+                    failed[stage.name] = future.exception()
+                    logging.error(f"[✗] Stage {stage.name} failed: {future.exception()}")
+                    # Dependents of a failed stage never become ready
+                    continue
+                done.add(stage.name)
+    elapsed = time.perf_counter() - start
+
+    # Keep the fingerprints of failed or unreached stages out, so they run next time
+    state = {
+        name: {"fingerprint": fingerprints.get(name), "provides": provided[name]}
+        for name in done
+    }
+    save_stage_state(state, build_dir)
+
+    path, total = critical_path(stages, timings)
+    metrics = {
+        **(info or {}),
+        "started": started,
+        "wall_time": round(elapsed, 6),
+        "cpu_time": round(time.process_time() - cpu_start, 6),
+        "workers_cpu_time": round(children_cpu_time() - workers_cpu_start, 6) if resource else None,
+        "peak_rss": peak_rss(),
+        "workers_peak_rss": workers_peak_rss(),
+        "critical_path": path,
+        "failed": sorted(failed),
+        "not_run": [stage.name for stage in pending],
+        "stages": stage_metrics,
+    }
+    write_build_metrics(metrics, build_dir)
+    if profile:
+        logging.info(f"[✓] Profiles written to {profile_dir}")
+
+    if skipped:
+        logging.info(f"[~] Skipped up-to-date stage(s): {', '.join(sorted(skipped))}")
+    if failed:
+        if pending:
+            logging.error(f"[✗] Stage(s) not run: {', '.join(stage.name for stage in pending)}")
+        raise next(iter(failed.values()))
+
+    chain = " → ".join(f"{name} ({timings[name] * 1000:.0f} ms)" for name in path)
+    logging.info(f"[~] Critical path: {chain} = {total * 1000:.0f} ms of {elapsed * 1000:.0f} ms")
+    return metrics
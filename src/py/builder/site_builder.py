@@ -1,12 +1,20 @@
+import re
 import logging
+import threading
+from uuid import uuid4
+from itertools import chain
 from datetime import datetime
 from pathlib import Path
-from shutil import copyfile
+from shutil import copyfile, rmtree
 from PIL import Image
-from .utils import ensure_dir, copy_assets, load_yaml, load_theme_config
+from .utils import ensure_dir, clear_dir, copy_assets, load_yaml, load_theme_config, resolve_workers
+from .compressor import precompress_output, remove_sidecars
+from .pipeline import Stage, run_stages, stage_state_path
+from .fingerprint import HASH_LENGTH, MANIFEST_FILE, fingerprint_asset, fingerprint_fonts, write_asset_manifest
+from .cache import STATE_DIR_NAME, load_image_cache, save_image_cache, prune_stale_outputs, bump_output_generation
 from .css_generator import generate_css_variables, generate_fonts_css, generate_google_fonts_link
-from .image_processor import process_images, copy_original_images, convert_and_resize_image, generate_favicons_from_logo, generate_favicon_ico
-from .html_generator import render_template, render_gallery_images, generate_gallery_json_from_images, generate_robots_txt, generate_sitemap_xml
+from .image_processor import process_images, copy_original_images, get_output_formats, generate_favicons_from_logo, generate_favicon_ico
+from .html_generator import RawHTML, render_template, iter_template, iter_gallery_images, write_page, generate_gallery_shards, generate_tag_index, group_images_by_tag, tag_slugs, generate_gallery_json_from_images, generate_robots_txt, generate_sitemap_xml
 
 # Configure logging to display only the messages
 logging.basicConfig(level=logging.INFO, format='%(message)s')
@@ -25,69 +33,318 @@ VERSION_FILE = SRC_DIR / "VERSION"
 with open(VERSION_FILE, "r") as vf:
     build_version = vf.read().strip()
 
-def build():
-    logging.info("\n")
-    logging.info("=" * 24)
-    logging.info(f"🚀 Lumeex builder v{build_version}")
-    logging.info("=" * 24)
-    logging.info("\n === Starting build === ")
-    ensure_dir(BUILD_DIR)
-    copy_assets(JS_DIR, STYLE_DIR, BUILD_DIR)
-    
-    # Defining build vars
-    build_date = datetime.now().strftime("%Y%m%d%H%M%S")
-    build_date_version = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    site_vars = load_yaml(SITE_FILE)
-    gallery_vars = load_yaml(GALLERY_FILE)
-    build_section = site_vars.get("build", {})
-    theme_name = site_vars.get("build", {}).get("theme", "default")
-    theme_vars, theme_dir = load_theme_config(theme_name, THEMES_DIR)
-    fonts_dir = theme_dir / "fonts"
-    theme_css_path = theme_dir / "theme.css"
-    canonical_url = site_vars.get("info", {}).get("canonical", "").rstrip("/")
-    canonical_home = f"{canonical_url}/"
-    canonical_legals = f"{canonical_url}/legals/"
+# Builds and WebUI pre-renders of the same process share the image cache file
+IMAGE_CACHE_LOCK = threading.Lock()
+
+def asset_url(ctx, rel_path, manifest):
+    """Return the URL of an output asset, fingerprinting it when enabled"""
+    if ctx["fingerprint"]:
+        return fingerprint_asset(BUILD_DIR, rel_path, manifest)
+    return f"/{rel_path}?{ctx['build_date']}"
+
+def url_path(url):
+    """Output file of a site URL"""
+    return BUILD_DIR / url.split("?", 1)[0].lstrip("/")
 
-    # Copying theme.css if existing
+def source_files(*dirs):
+    """Files under the given source dirs, fingerprinted by size and mtime"""
+    return sorted(path for folder in dirs if folder.exists() for path in folder.rglob("*") if path.is_file())
+
+def remove_asset(rel_path):
+    """Delete an output asset, its fingerprinted copies and their compressed sidecars"""
+    path = BUILD_DIR / rel_path
+    name_re = re.compile(rf"{re.escape(path.stem)}(\.[0-9a-f]{{{HASH_LENGTH}}})?{re.escape(path.suffix)}(\.gz|\.br)?")
+    if path.parent.exists():
+        for old in path.parent.iterdir():
+            if name_re.fullmatch(old.name):
+                old.unlink()
+
+def rendered_images(images, image_meta):
+    """Gallery.yaml entries pointing to their rendered files"""
+    return [{**img, **image_meta.get(img["src"], {})} for img in images]
+
+def page_head(ctx, path):
+    """Render head.html for a page of the site"""
+    head_vars = {**ctx["head_vars"], "canonical": f"{ctx['canonical_url']}{path}"}
+    # Restored from the stage state as plain strings when layout was skipped
+    head_vars.update({key: RawHTML(head_vars[key]) for key in HEAD_HTML_VARS})
+    return render_template(TEMPLATE_DIR / "head.html", head_vars)
+
+def page_chunks(ctx, head, body):
+    """Wrap rendered head and body chunks into a full HTML page"""
+    return chain(
+        [f"<!DOCTYPE html>\n{ctx['signature']}\n<html lang='en'>\n{head}\n"],
+        ['\n    <body>\n        <div class="page-loader"><div class="spinner"></div></div>\n        '],
+        body,
+        ["\n        ", ctx["footer"], "\n    </body>\n    ", "\n</html>"],
+    )
+
+# Public assets linked from every page
+PAGE_ASSETS = ("style/style.css", "js/lumeex.js", "js/lazy.js")
+
+def assets_inputs(ctx):
+    """The public JS/CSS and the theme stylesheet"""
+    return {"sources": source_files(JS_DIR, STYLE_DIR), "theme_css": ctx["theme_dir"] / "theme.css", "fingerprint": ctx["fingerprint"]}
+
+def assets_outputs(ctx):
+    """The copied page assets"""
+    return [url_path(url) for url in ctx["asset_urls"].values()]
+
+def stage_assets(ctx):
+    """Copy the public JS/CSS and the theme stylesheet"""
+    # fonts.css and colors.css are written again by their stages, which run after this one
+    for folder in (JS_DIR, STYLE_DIR):
+        rmtree(BUILD_DIR / folder.name, ignore_errors=True)
+    copy_assets(JS_DIR, STYLE_DIR, BUILD_DIR)
+    manifest = {}
+    asset_urls = {rel_path: asset_url(ctx, rel_path, manifest) for rel_path in PAGE_ASSETS}
+    theme_css_path = ctx["theme_dir"] / "theme.css"
     if theme_css_path.exists():
         dest_theme_css = BUILD_DIR / "style" / "theme.css"
         dest_theme_css.parent.mkdir(parents=True, exist_ok=True)
         copyfile(theme_css_path, dest_theme_css)
-        theme_css = f'<link rel="stylesheet" href="/style/theme.css?build_date={build_date}">'
+        asset_urls["style/theme.css"] = asset_url(ctx, "style/theme.css", manifest)
         logging.info(f"[✓] Theme CSS found, copied to build folder: {dest_theme_css}")
     else:
-        theme_css = ""
         logging.warning(f"[~] No theme.css found in {theme_css_path}, skipping theme CSS injection.")
+    ctx["asset_urls"] = asset_urls
+    ctx["assets_manifest"] = manifest
+
+def fonts_inputs(ctx):
+    """The theme font files and font settings"""
+    return {"sources": source_files(ctx["theme_dir"] / "fonts"), "fonts": ctx["theme_vars"].get("fonts"), "fingerprint": ctx["fingerprint"]}
+
+def fonts_outputs(ctx):
+    """fonts.css"""
+    return [url_path(ctx["fonts_css_url"])]
+
+def stage_fonts(ctx):
+    """Copy theme fonts and write fonts.css"""
+    theme_vars = ctx["theme_vars"]
+    rmtree(BUILD_DIR / "fonts", ignore_errors=True)
+    remove_asset("style/fonts.css")
+    manifest = {}
+    preload_links = generate_fonts_css(ctx["theme_dir"] / "fonts", BUILD_DIR / "style" / "fonts.css", fonts_cfg=theme_vars.get("fonts"))
+    if ctx["fingerprint"]:
+        preload_links = fingerprint_fonts(BUILD_DIR, "style/fonts.css", preload_links, manifest)
+    ctx["preload_links"] = preload_links
+    ctx["fonts_css_url"] = asset_url(ctx, "style/fonts.css", manifest)
+    ctx["fonts_manifest"] = manifest
 
-    preload_links = generate_fonts_css(fonts_dir, BUILD_DIR / "style" / "fonts.css", fonts_cfg=theme_vars.get("fonts"))
-    generate_css_variables(theme_vars.get("colors", {}), BUILD_DIR / "style" / "colors.css")
-    generate_favicons_from_logo(theme_vars, theme_dir, BUILD_DIR / "img" / "favicon")
-    generate_favicon_ico(theme_vars, theme_dir, BUILD_DIR / "favicon.ico")
+def colors_inputs(ctx):
+    """The theme colours"""
+    return {"colors": ctx["theme_vars"].get("colors", {}), "fingerprint": ctx["fingerprint"]}
 
-    # Converting and resizing images if enabled
+def colors_outputs(ctx):
+    """colors.css"""
+    return [url_path(ctx["colors_css_url"])]
+
+def stage_colors(ctx):
+    """Write the theme colours as CSS variables"""
+    remove_asset("style/colors.css")
+    generate_css_variables(ctx["theme_vars"].get("colors", {}), BUILD_DIR / "style" / "colors.css")
+    manifest = {}
+    ctx["colors_css_url"] = asset_url(ctx, "style/colors.css", manifest)
+    ctx["colors_manifest"] = manifest
+
+def favicon_inputs(ctx):
+    """The favicon source image and its config"""
+    fav_path = ctx["theme_vars"].get("favicon", {}).get("path")
+    return {"favicon": fav_path, "source": ctx["theme_dir"] / fav_path if fav_path else None}
+
+def favicon_outputs(ctx):
+    """A generated PNG favicon and favicon.ico"""
+    return [BUILD_DIR / "img" / "favicon" / "favicon-32.png", BUILD_DIR / "favicon.ico"]
+
+def stage_favicons(ctx):
+    """Generate the PNG favicons and favicon.ico from the theme logo"""
+    generate_favicons_from_logo(ctx["theme_vars"], ctx["theme_dir"], BUILD_DIR / "img" / "favicon")
+    generate_favicon_ico(ctx["theme_vars"], ctx["theme_dir"], BUILD_DIR / "favicon.ico")
+
+def thumbnail_inputs(ctx):
+    """The social thumbnail source image"""
+    thumbnail_path = ctx["thumbnail_path"]
+    return {"thumbnail": thumbnail_path, "source": IMG_DIR / thumbnail_path if thumbnail_path else None}
+
+def thumbnail_outputs(ctx):
+    """The resized social thumbnail"""
+    thumbnail_path = ctx["thumbnail_path"]
+    return [BUILD_DIR / "img" / "social" / Path(thumbnail_path).name] if thumbnail_path else []
+
+def stage_thumbnail(ctx):
+    """Resize the social thumbnail to 1200x630"""
+    thumbnail_path = ctx["thumbnail_path"]
+    dest_thumb_dir = BUILD_DIR / "img" / "social"
+    if not thumbnail_path:
+        rmtree(dest_thumb_dir, ignore_errors=True)
+        logging.warning("[~] No thumbnail found in social section")
+        return
+    src_thumb = IMG_DIR / thumbnail_path
+    dest_thumb = dest_thumb_dir / Path(thumbnail_path).name
+    clear_dir(dest_thumb_dir)
+    try:
+        img = Image.open(src_thumb)
+        img = img.convert("RGB")
+        img = img.resize((1200, 630), Image.LANCZOS)
+        img.save(dest_thumb, "JPEG", quality=90)
+        logging.info(f"[✓] Thumbnail resized and saved to {dest_thumb}")
+    except Exception as e:
+        logging.error(f"[✗] Failed to process thumbnail: {e}")
+
+def render_images(build_section, hero_images, gallery_images, image_cache, workers=1, fingerprint=False):
+    """Convert, resize or copy hero and gallery photos as configured in the build section"""
     convert_images = build_section.get("convert_images", True)
     resize_images = build_section.get("resize_images", True)
     logging.info(f"[~] convert_images = {convert_images}")
     logging.info(f"[~] resize_images = {resize_images}")
-
-    hero_images = gallery_vars.get("hero", {}).get("images", [])
-    gallery_images = gallery_vars.get("gallery", {}).get("images", [])
+    srcset_widths = build_section.get("srcset_widths") or []
+    if srcset_widths:
+        logging.info(f"[~] srcset_widths = {srcset_widths}")
+    output_formats = get_output_formats(build_section.get("formats"), build_section.get("quality"))
+    logging.info(f"[~] formats = {', '.join(f'{fmt} ({quality})' for fmt, _, _, quality in output_formats)}")
 
     if convert_images:
-        process_images(hero_images, resize_images, IMG_DIR, BUILD_DIR)
-        process_images(gallery_images, resize_images, IMG_DIR, BUILD_DIR)
-    else:
-        copy_original_images(hero_images, IMG_DIR, BUILD_DIR)
-        copy_original_images(gallery_images, IMG_DIR, BUILD_DIR)
+        # Hero photos are CSS backgrounds, only the gallery needs srcset and <picture> renditions
+        hero_counts = process_images(hero_images, resize_images, IMG_DIR, BUILD_DIR, cache=image_cache, workers=workers, formats=output_formats[-1:], fingerprint=fingerprint)
+        gallery_counts = process_images(gallery_images, resize_images, IMG_DIR, BUILD_DIR, cache=image_cache, workers=workers, widths=srcset_widths, formats=output_formats, fingerprint=fingerprint)
+        return {key: hero_counts[key] + gallery_counts[key] for key in hero_counts}
+    return copy_original_images(hero_images + gallery_images, IMG_DIR, BUILD_DIR, cache=image_cache, workers=workers, fingerprint=fingerprint)
 
-    if "hero" not in site_vars:
-        site_vars["hero"] = {}  # Initialize an empty hero section
+# Build settings that change the rendered photos, and the entry fields rendering sets
+IMAGE_SETTINGS = ("convert_images", "resize_images", "srcset_widths", "formats", "quality")
+IMAGE_META_KEYS = ("src", "width", "height", "srcset", "sources")
+
+def images_inputs(ctx):
+    """The photo sources and the settings they are rendered with"""
+    return {
+        "settings": {key: ctx["build_section"].get(key) for key in IMAGE_SETTINGS},
+        "fingerprint": ctx["fingerprint"],
+        "hero": [IMG_DIR / img["src"] for img in ctx["hero_images"]],
+        "gallery": [IMG_DIR / img["src"] for img in ctx["gallery_images"]],
+    }
+
+def images_outputs(ctx):
+    """The main rendition of every rendered photo"""
+    return [BUILD_DIR / "img" / meta["src"] for meta in ctx["image_meta"].values()]
+
+def stage_images(ctx):
+    """Convert, resize or copy hero and gallery photos"""
+    # Rendered on copies, so skipped runs and tag edits share the same gallery.yaml entries
+    hero_images = [dict(img) for img in ctx["hero_images"]]
+    gallery_images = [dict(img) for img in ctx["gallery_images"]]
+    original_srcs = [img["src"] for img in hero_images + gallery_images]
+    with IMAGE_CACHE_LOCK:
+        image_cache = load_image_cache(BUILD_DIR)
+        counts = render_images(ctx["build_section"], hero_images, gallery_images, image_cache, ctx["workers"], ctx["fingerprint"])
+        prune_stale_outputs(image_cache, BUILD_DIR, ("img/gallery", "img/hero"))
+        save_image_cache(image_cache, BUILD_DIR)
+    ctx["image_meta"] = {
+        src: {key: img[key] for key in IMAGE_META_KEYS if key in img}
+        for src, img in zip(original_srcs, hero_images + gallery_images)
+        if (BUILD_DIR / "img" / img["src"]).exists()
+    }
+    worker_io = [counts.pop("worker_read_bytes"), counts.pop("worker_written_bytes")]
+    return {**{f"images_{key}": count for key, count in counts.items()}, "worker_io": worker_io}
+
+def prerender_images(hero_srcs=(), gallery_srcs=(), workers=None):
+    """
+    Render the given photos into the build cache ahead of the next build, which then
+    skips them. Other cache entries and outputs are kept as they are.
+    """
+    build_section = load_yaml(SITE_FILE).get("build", {})
+    workers = resolve_workers(workers if workers is not None else build_section.get("workers"))
+    with IMAGE_CACHE_LOCK:
+        image_cache = load_image_cache(BUILD_DIR)
+        counts = render_images(
+            build_section, [{"src": src} for src in hero_srcs], [{"src": src} for src in gallery_srcs],
+            image_cache, workers, build_section.get("fingerprint", False)
+        )
+        # Nothing is pruned here, every entry stays for the next build to decide
+        image_cache["used"].update(image_cache["entries"])
+        save_image_cache(image_cache, BUILD_DIR)
+        # The output now differs from the archive of the last build
+        if counts["processed"]:
+            bump_output_generation(BUILD_DIR)
+    return counts
+
+def invalidate_images(srcs):
+    """
+    Drop the cache entries of photos deleted or moved, leaving the other entries untouched.
+    Their rendered files stay, the last built pages still reference them, until the next
+    build prunes them. Return the number of entries dropped.
+    """
+    with IMAGE_CACHE_LOCK:
+        image_cache = load_image_cache(BUILD_DIR)
+        dropped = sum(image_cache["entries"].pop(src, None) is not None for src in srcs)
+        image_cache["used"].update(image_cache["entries"])
+        save_image_cache(image_cache, BUILD_DIR)
+    return dropped
+
+def tag_index_inputs(ctx):
+    """The tags of every gallery photo, by id"""
+    return {"tags": [img.get("tags") or [] for img in ctx["gallery_images"]]}
+
+def tag_index_outputs(ctx):
+    """data/tags.json"""
+    return [url_path(ctx["tag_index_url"])]
+
+def stage_tag_index(ctx):
+    """Write the tag → gallery ids index"""
+    ctx["tag_index_url"] = generate_tag_index(ctx["gallery_images"], BUILD_DIR, version=ctx["build_date"])
+
+def shards_inputs(ctx):
+    """The gallery entries and the paging settings"""
+    build_section = ctx["build_section"]
+    return {
+        "page_size": build_section.get("gallery_page_size"),
+        "shard_size": build_section.get("gallery_shard_size", 100),
+        "fingerprint": ctx["fingerprint"],
+        "gallery": ctx["gallery_images"],
+    }
+
+def shards_outputs(ctx):
+    """The shard index, when the gallery is paginated"""
+    return [url_path(ctx["shards_url"])] if ctx["shards_url"] else []
+
+def stage_shards(ctx):
+    """Large galleries: only the first page is inlined, the rest is loaded from JSON shards"""
+    build_section, gallery_images = ctx["build_section"], ctx["gallery_images"]
+    page_size = build_section.get("gallery_page_size")
+    rmtree(BUILD_DIR / "data" / "shards", ignore_errors=True)
+    ctx["inline_count"] = len(gallery_images)
+    ctx["shards_url"] = None
+    if page_size and len(gallery_images) > page_size:
+        ctx["inline_count"] = page_size
+        ctx["shards_url"] = generate_gallery_shards(
+            rendered_images(gallery_images[page_size:], ctx["image_meta"]), BUILD_DIR,
+            shard_size=build_section.get("gallery_shard_size", 100), version=ctx["build_date"], fingerprint=ctx["fingerprint"]
+        )
+
+# head.html values inserted as HTML
+HEAD_HTML_VARS = ("google_fonts_link", "font_preloads", "theme_css")
+LAYOUT_TEMPLATES = ("head.html", "hero.html", "footer.html")
+
+def layout_inputs(ctx):
+    """The site sections, theme values and templates of the shared page parts"""
+    site_vars, theme_vars = ctx["site_vars"], ctx["theme_vars"]
+    return {
+        "site": {key: site_vars.get(key) for key in ("info", "social", "menu", "hero", "footer")},
+        "colors": theme_vars.get("colors", {}),
+        "google_fonts": theme_vars.get("google_fonts", []),
+        "templates": [TEMPLATE_DIR / name for name in LAYOUT_TEMPLATES],
+    }
+
+def stage_layout(ctx):
+    """Render the head, hero and footer shared by the pages"""
+    site_vars, theme_vars = ctx["site_vars"], ctx["theme_vars"]
+    thumbnail_path = ctx["thumbnail_path"]
+    asset_urls = ctx["asset_urls"]
 
     # Adding menu
-    menu_html = "\n".join(
+    menu_html = RawHTML("\n".join(
         f'<li class="nav-item appear"><a href="{item["href"]}">{item["label"]}</a></li>'
         for item in site_vars.get("menu", {}).get("items", [])
-    )
+    ))
     site_vars["hero"]["menu_items"] = menu_html
     if "footer" in site_vars:
         site_vars["footer"]["menu_items"] = menu_html
@@ -96,96 +353,266 @@ def build():
     google_fonts_link = generate_google_fonts_link(theme_vars.get("google_fonts", []))
     logging.info(f"[✓] Google Fonts link generated")
 
-    # Generating thumbnail
-    thumbnail_path = site_vars.get("social", {}).get("thumbnail")
-    if thumbnail_path:
-        src_thumb = IMG_DIR / thumbnail_path
-        dest_thumb_dir = BUILD_DIR / "img" / "social"
-        dest_thumb_dir.mkdir(parents=True, exist_ok=True)
-        dest_thumb = dest_thumb_dir / Path(thumbnail_path).name
-        try:
-            img = Image.open(src_thumb)
-            img = img.convert("RGB")
-            img = img.resize((1200, 630), Image.LANCZOS)
-            img.save(dest_thumb, "JPEG", quality=90)
-            logging.info(f"[✓] Thumbnail resized and saved to {dest_thumb}")
-        except Exception as e:
-            logging.error(f"[✗] Failed to process thumbnail: {e}")
-    else:
-        logging.warning("[~] No thumbnail found in social section")
-
     # Defining head variables
     head_vars = dict(site_vars.get("info", {}))
     head_vars.update(theme_vars.get("colors", {}))
     head_vars.update(site_vars.get("social", {}))
     head_vars["thumbnail"] = f"/img/social/{Path(thumbnail_path).name}" if thumbnail_path else ""
-    head_vars["google_fonts_link"] = google_fonts_link
-    head_vars["font_preloads"] = "\n".join(preload_links)
-    head_vars["theme_css"] = theme_css
-    head_vars["build_date"] = build_date
-    head_vars["canonical"] = canonical_home
-    
-    # Render the home page
-    head = render_template(TEMPLATE_DIR / "head.html", head_vars)
-    hero = render_template(TEMPLATE_DIR / "hero.html", {**site_vars["hero"], **head_vars})
-    footer = render_template(TEMPLATE_DIR / "footer.html", {**site_vars.get("footer", {}), **head_vars})
-    gallery_html = render_gallery_images(gallery_images)
-    gallery = render_template(TEMPLATE_DIR / "gallery.html", {"gallery_images": gallery_html})
-
-    signature = f"<!-- Build with Lumeex {build_version} | https://git.djeex.fr/Djeex/lumeex | {build_date_version} -->"
-    body = f"""
-    <body>
-        <div class="page-loader"><div class="spinner"></div></div>
-        {hero}
-        {gallery}
-        {footer}
-    </body>
-    """
+    head_vars["google_fonts_link"] = RawHTML(google_fonts_link)
+    head_vars["font_preloads"] = RawHTML("\n".join(ctx["preload_links"]))
+    theme_css_url = asset_urls.get("style/theme.css")
+    head_vars["theme_css"] = RawHTML(f'<link rel="stylesheet" href="{theme_css_url}">' if theme_css_url else "")
+    head_vars["build_date"] = ctx["build_date"]
+    head_vars["style_css_url"] = asset_urls["style/style.css"]
+    head_vars["colors_css_url"] = ctx["colors_css_url"]
+    head_vars["fonts_css_url"] = ctx["fonts_css_url"]
+    head_vars["lumeex_js_url"] = asset_urls["js/lumeex.js"]
+    head_vars["lazy_js_url"] = asset_urls["js/lazy.js"]
+    ctx["head_vars"] = head_vars
+
+    ctx["head"] = page_head(ctx, "/")
+    ctx["hero"] = render_template(TEMPLATE_DIR / "hero.html", {**site_vars["hero"], **head_vars})
+    ctx["footer"] = render_template(TEMPLATE_DIR / "footer.html", {**site_vars.get("footer", {}), **head_vars})
+
+def index_inputs(ctx):
+    """The gallery entries and template"""
+    return {"gallery": ctx["gallery_images"], "template": TEMPLATE_DIR / "gallery.html"}
+
+def index_outputs(ctx):
+    """index.html"""
+    return [BUILD_DIR / "index.html"]
+
+def stage_index(ctx):
+    """Stream the home page, gallery section by section, straight to index.html"""
+    gallery_attrs = f' data-tag-index="{ctx["tag_index_url"]}"'
+    if ctx["shards_url"]:
+        gallery_attrs += f' data-shards="{ctx["shards_url"]}"'
+    inline_images = rendered_images(ctx["gallery_images"][:ctx["inline_count"]], ctx["image_meta"])
+    gallery = iter_template(TEMPLATE_DIR / "gallery.html", {
+        "gallery_images": iter_gallery_images(inline_images),
+        "gallery_attrs": RawHTML(gallery_attrs),
+    })
     output_file = BUILD_DIR / "index.html"
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(f"<!DOCTYPE html>\n{signature}\n<html lang='en'>\n{head}\n{body}\n</html>")
+    write_page(output_file, page_chunks(ctx, ctx["head"], chain([ctx["hero"], "\n        "], gallery)))
     logging.info(f"[✓] HTML generated: {output_file}")
 
-    # Rendering legals page
-    head_vars["canonical"] = canonical_legals
-
-    legals_vars = site_vars.get("legals", {})
-    if legals_vars:
-        head = render_template(TEMPLATE_DIR / "head.html", head_vars)
-
-        ip_paragraphs = legals_vars.get("intellectual_property", [])
-        paragraphs_html = "\n".join(f"<p>{item['paragraph']}</p>" for item in ip_paragraphs)
-        legals_context = {
-            "hoster_name": legals_vars.get("hoster_name", ""),
-            "hoster_adress": legals_vars.get("hoster_adress", ""),
-            "hoster_contact": legals_vars.get("hoster_contact", ""),
-            "intellectual_property": paragraphs_html,
-        }
-        legals_body = render_template(TEMPLATE_DIR / "legals.html", legals_context)
-        legals_html = f"<!DOCTYPE html>\n{signature}\n<html lang='en'>\n{head}\n{legals_body}\n{footer}\n</html>"
-        output_legals = BUILD_DIR / "legals" / "index.html"
-        output_legals.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_legals, "w", encoding="utf-8") as f:
-            f.write(legals_html)
-        logging.info(f"[✓] Legals page generated: {output_legals}")
-    else:
+def legals_inputs(ctx):
+    """The legals section and template"""
+    return {"legals": ctx["site_vars"].get("legals", {}), "template": TEMPLATE_DIR / "legals.html"}
+
+def legals_outputs(ctx):
+    """legals/index.html, when there is a legals section"""
+    return [BUILD_DIR / "legals" / "index.html"] if ctx["site_vars"].get("legals") else []
+
+def stage_legals(ctx):
+    """Render the legals page"""
+    legals_vars = ctx["site_vars"].get("legals", {})
+    if not legals_vars:
+        rmtree(BUILD_DIR / "legals", ignore_errors=True)
         logging.warning("[~] No legals section found in site.yaml")
+        return
+    head = page_head(ctx, "/legals/")
+
+    ip_paragraphs = legals_vars.get("intellectual_property", [])
+    paragraphs_html = RawHTML("\n".join(f"<p>{item['paragraph']}</p>" for item in ip_paragraphs))
+    legals_context = {
+        "hoster_name": legals_vars.get("hoster_name", ""),
+        "hoster_adress": legals_vars.get("hoster_adress", ""),
+        "hoster_contact": legals_vars.get("hoster_contact", ""),
+        "intellectual_property": paragraphs_html,
+    }
+    legals_body = render_template(TEMPLATE_DIR / "legals.html", legals_context)
+    legals_html = f"<!DOCTYPE html>\n{ctx['signature']}\n<html lang='en'>\n{head}\n{legals_body}\n{ctx['footer']}\n</html>"
+    output_legals = BUILD_DIR / "legals" / "index.html"
+    output_legals.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_legals, "w", encoding="utf-8") as f:
+        f.write(legals_html)
+    logging.info(f"[✓] Legals page generated: {output_legals}")
+
+def tag_pages_inputs(ctx):
+    """The gallery entries, the tag_pages setting and the page templates"""
+    return {
+        "enabled": ctx["build_section"].get("tag_pages", False),
+        "gallery": ctx["gallery_images"],
+        "templates": [TEMPLATE_DIR / "tag.html", TEMPLATE_DIR / "gallery.html"],
+    }
+
+def tag_pages_outputs(ctx):
+    """Every tag page"""
+    return [url_path(tag_path) / "index.html" for tag_path in ctx["tag_pages"]]
+
+def stage_tag_pages(ctx):
+    """Render a static landing page per tag"""
+    tag_pages = []
+    ctx["tag_pages"] = tag_pages
+    rmtree(BUILD_DIR / "tag", ignore_errors=True)
+    if not ctx["build_section"].get("tag_pages", False):
+        return
+    groups = group_images_by_tag(rendered_images(ctx["gallery_images"], ctx["image_meta"]))
+    slugs = tag_slugs(groups)
+    for tag, tagged_images in groups.items():
+        slug = slugs[tag]
+        tag_path = f"/tag/{slug}/"
+        head = page_head(ctx, tag_path)
+        tag_header = render_template(TEMPLATE_DIR / "tag.html", {"tag": tag, "count": len(tagged_images)})
+        tag_gallery = iter_template(TEMPLATE_DIR / "gallery.html", {
+            "gallery_images": iter_gallery_images(tagged_images),
+            "gallery_attrs": RawHTML(""),
+        })
+        write_page(BUILD_DIR / "tag" / slug / "index.html", page_chunks(ctx, head, chain([tag_header, "\n        "], tag_gallery)))
+        tag_pages.append(tag_path)
+    logging.info(f"[✓] Tag pages generated: {len(tag_pages)}")
+    return {"pages": len(tag_pages)}
 
-    # Hero carrousel generator
-    if hero_images:
-        generate_gallery_json_from_images(hero_images, BUILD_DIR)
+def hero_json_inputs(ctx):
+    """The hero entries"""
+    return {"hero": ctx["hero_images"]}
+
+def hero_json_outputs(ctx):
+    """data/gallery.json, when there are hero photos"""
+    return [BUILD_DIR / "data" / "gallery.json"] if ctx["hero_images"] else []
+
+def stage_hero_json(ctx):
+    """Hero carrousel generator"""
+    if ctx["hero_images"]:
+        generate_gallery_json_from_images(rendered_images(ctx["hero_images"], ctx["image_meta"]), BUILD_DIR)
     else:
+        (BUILD_DIR / "data" / "gallery.json").unlink(missing_ok=True)
         logging.warning("[~] No hero images found, skipping JSON generation.")
 
-    # Sitemap and robot.txt generator
-    site_info = site_vars.get("info", {})
-    canonical_url = site_info.get("canonical", "").rstrip("/")
+def sitemap_inputs(ctx):
+    """The canonical URL"""
+    return {"canonical": ctx["canonical_url"]}
+
+def sitemap_outputs(ctx):
+    """robots.txt and sitemap.xml, when there is a canonical URL"""
+    return [BUILD_DIR / "robots.txt", BUILD_DIR / "sitemap.xml"] if ctx["canonical_url"] else []
+
+def stage_sitemap(ctx):
+    """Sitemap and robot.txt generator"""
+    canonical_url = ctx["canonical_url"]
     if canonical_url:
-        allowed_pages = ["/", "/legals/"]
+        allowed_pages = ["/", "/legals/", *ctx["tag_pages"]]
         generate_robots_txt(canonical_url, allowed_pages, BUILD_DIR)
         generate_sitemap_xml(canonical_url, allowed_pages, BUILD_DIR)
     else:
+        for name in ("robots.txt", "sitemap.xml"):
+            (BUILD_DIR / name).unlink(missing_ok=True)
         logging.warning("[~] No canonical URL found in site.yaml info section, skipping robots.txt and sitemap.xml generation.")
 
+def manifest_inputs(ctx):
+    """The fingerprint setting"""
+    return {"fingerprint": ctx["fingerprint"]}
+
+def manifest_outputs(ctx):
+    """The asset manifest, when fingerprinting"""
+    return [BUILD_DIR / MANIFEST_FILE] if ctx["fingerprint"] else []
+
+def stage_manifest(ctx):
+    """Write the fingerprinted asset manifest"""
+    if not ctx["fingerprint"]:
+        (BUILD_DIR / MANIFEST_FILE).unlink(missing_ok=True)
+        return
+    assets = {}
+    for key in ("assets_manifest", "fonts_manifest", "colors_manifest"):
+        assets.update(ctx[key].get("assets", {}))
+    images = {src: meta["src"] for src, meta in ctx["image_meta"].items()}
+    write_asset_manifest(BUILD_DIR, {"assets": assets, "images": images})
+
+def precompress_inputs(ctx):
+    """The precompress settings"""
+    build_section = ctx["build_section"]
+    return {"precompress": build_section.get("precompress", False), "min_size": build_section.get("precompress_min_size", 1024)}
+
+def stage_precompress(ctx):
+    """Gzip/brotli sidecars for gzip_static and brotli_static"""
+    build_section = ctx["build_section"]
+    if build_section.get("precompress", False):
+        return precompress_output(BUILD_DIR, min_size=build_section.get("precompress_min_size", 1024), workers=ctx["workers"])
+    remove_sidecars(BUILD_DIR)
+
+# Stages dumped by build(profile=True)
+PROFILE_STAGES = ("images", "layout", "index", "legals", "tag_pages")
+
+# Build graph: each stage starts once the stages in its "after" list are done, and is
+# skipped when its inputs are unchanged and none of those stages ran
+STAGES = [
+    Stage("assets", stage_assets, inputs=assets_inputs, outputs=assets_outputs, provides=("asset_urls", "assets_manifest")),
+    Stage("fonts", stage_fonts, after=("assets",), inputs=fonts_inputs, outputs=fonts_outputs, provides=("preload_links", "fonts_css_url", "fonts_manifest")),
+    Stage("colors", stage_colors, after=("assets",), inputs=colors_inputs, outputs=colors_outputs, provides=("colors_css_url", "colors_manifest")),
+    Stage("favicons", stage_favicons, inputs=favicon_inputs, outputs=favicon_outputs),
+    Stage("thumbnail", stage_thumbnail, inputs=thumbnail_inputs, outputs=thumbnail_outputs),
+    Stage("images", stage_images, inputs=images_inputs, outputs=images_outputs, provides=("image_meta",)),
+    Stage("tag_index", stage_tag_index, inputs=tag_index_inputs, outputs=tag_index_outputs, provides=("tag_index_url",)),
+    Stage("shards", stage_shards, after=("images",), inputs=shards_inputs, outputs=shards_outputs, provides=("inline_count", "shards_url")),
+    Stage("layout", stage_layout, after=("assets", "fonts", "colors"), inputs=layout_inputs, provides=("head_vars", "head", "hero", "footer")),
+    Stage("index", stage_index, after=("layout", "images", "tag_index", "shards"), inputs=index_inputs, outputs=index_outputs),
+    Stage("legals", stage_legals, after=("layout",), inputs=legals_inputs, outputs=legals_outputs),
+    Stage("tag_pages", stage_tag_pages, after=("layout", "images"), inputs=tag_pages_inputs, outputs=tag_pages_outputs, provides=("tag_pages",)),
+    Stage("hero_json", stage_hero_json, after=("images",), inputs=hero_json_inputs, outputs=hero_json_outputs),
+    Stage("sitemap", stage_sitemap, after=("tag_pages",), inputs=sitemap_inputs, outputs=sitemap_outputs),
+    Stage("manifest", stage_manifest, after=("assets", "fonts", "colors", "images"), inputs=manifest_inputs, outputs=manifest_outputs),
+    Stage("precompress", stage_precompress, after=("index", "legals", "tag_pages", "tag_index", "hero_json", "sitemap", "manifest"), inputs=precompress_inputs),
+]
+
+def build(workers=None, profile=False, progress=None, stages=None):
+    """
+    Build the static site, workers overrides build.workers from site.yaml.
+    With profile, the image and render stages are profiled to output/.lumeex/profile.
+    progress(stage name, finished count, total) is called as each stage ends.
+    stages names the stages whose sources changed, e.g. as found by the watcher: only
+    they and their dependents are checked, the others reuse the previous build.
+    """
+    logging.info("\n")
+    logging.info("=" * 24)
+    logging.info(f"🚀 Lumeex builder v{build_version}")
+    logging.info("=" * 24)
+    logging.info("\n === Starting build === ")
+    # Stages clean up their own outputs, so up-to-date ones are kept. Without the state
+    # of a previous build nothing is reused: keep only processed photos, favicons, the
+    # thumbnail and the build cache
+    if not stage_state_path(BUILD_DIR).exists():
+        ensure_dir(BUILD_DIR, keep=("img", "favicon.ico", STATE_DIR_NAME))
+    clear_dir(BUILD_DIR / "img", keep=("gallery", "hero", "favicon", "social"))
+
+    # Defining build vars
+    site_vars = load_yaml(SITE_FILE)
+    gallery_vars = load_yaml(GALLERY_FILE)
+    build_section = site_vars.get("build", {})
+    theme_name = build_section.get("theme", "default")
+    theme_vars, theme_dir = load_theme_config(theme_name, THEMES_DIR)
+    if "hero" not in site_vars:
+        site_vars["hero"] = {}  # Initialize an empty hero section
+
+    # Content-hashed file names, or ?build_date cache busting
+    fingerprint = build_section.get("fingerprint", False)
+    logging.info(f"[~] fingerprint = {fingerprint}")
+    workers = resolve_workers(workers if workers is not None else build_section.get("workers"))
+    logging.info(f"[~] workers = {workers}")
+
+    gallery_images = gallery_vars.get("gallery", {}).get("images", [])
+    # Ids used by the tag index to address gallery sections
+    for index, img in enumerate(gallery_images):
+        img["id"] = index
+
+    build_date_version = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ctx = {
+        "build_date": datetime.now().strftime("%Y%m%d%H%M%S"),
+        "signature": f"<!-- Build with Lumeex {build_version} | https://git.djeex.fr/Djeex/lumeex | {build_date_version} -->",
+        "site_vars": site_vars,
+        "build_section": build_section,
+        "theme_vars": theme_vars,
+        "theme_dir": theme_dir,
+        "canonical_url": site_vars.get("info", {}).get("canonical", "").rstrip("/"),
+        "thumbnail_path": site_vars.get("social", {}).get("thumbnail"),
+        "hero_images": gallery_vars.get("hero", {}).get("images", []),
+        "gallery_images": gallery_images,
+        "fingerprint": fingerprint,
+        "workers": workers,
+    }
+    run_stages(
+        STAGES, ctx, BUILD_DIR, profile=PROFILE_STAGES if profile else (), progress=progress, targets=stages,
+        info={"build_id": uuid4().hex, "version": build_version, "workers": workers, "images": len(ctx["hero_images"]) + len(gallery_images)},
+    )
+
     logging.info("✅ Build complete.")
-    
\ No newline at end of file
@@ -1,15 +1,15 @@
-import yaml
+import os
 import logging
 from pathlib import Path
 from shutil import copytree, rmtree, copyfile
+from .config_store import load_config
 
 def load_yaml(path):
     """Load gallery and site .yaml conf"""
     if not path.exists():
         logging.warning(f"[!] YAML file not found: {path}")
         return {}
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    return load_config(path)
 
 def load_theme_config(theme_name, themes_dir):
     """Load theme.yaml"""
@@ -17,27 +17,28 @@ def load_theme_config(theme_name, themes_dir):
     theme_config_path = theme_dir / "theme.yaml"
     if not theme_config_path.exists():
         raise FileNotFoundError(f"[✗] Theme config not found: {theme_config_path}")
-    with open(theme_config_path, "r", encoding="utf-8") as f:
-        theme_vars = yaml.safe_load(f)
+    theme_vars = load_config(theme_config_path)
     return theme_vars, theme_dir
 
-def clear_dir(path: Path):
-    """Clear the output dir"""
+def clear_dir(path: Path, keep=()):
+    """Clear the output dir, leaving the top-level entries named in keep"""
     if not path.exists():
         path.mkdir(parents=True)
         return
     for child in path.iterdir():
+        if child.name in keep:
+            continue
         if child.is_file() or child.is_symlink():
             child.unlink()
         elif child.is_dir():
             rmtree(child)
 
-def ensure_dir(path: Path):
+def ensure_dir(path: Path, keep=()):
     """Create the output dir if it does not exist"""
     if not path.exists():
         path.mkdir(parents=True)
     else:
-        clear_dir(path)
+        clear_dir(path, keep)
 
 def copy_assets(js_dir, style_dir, build_dir):
     """Copy public assets to output dir"""
@@ -48,3 +49,19 @@ def copy_assets(js_dir, style_dir, build_dir):
             logging.info(f"[✓] Copied assets from {folder.name}")
         else:
             logging.warning(f"[~] Skipped missing folder: {folder.name}")
+
+
+def resolve_workers(value):
+    """Turn a workers setting into a worker count, 0 or "auto" means one per CPU"""
+    if value in (None, ""):
+        return 1
+    if str(value).lower() == "auto":
+        return os.cpu_count() or 1
+    try:
+        workers = int(value)
+    except (TypeError, ValueError):
+        logging.warning(f"[~] Invalid workers value '{value}', using 1")
+        return 1
+    if workers == 0:
+        return os.cpu_count() or 1
+    return max(1, workers)
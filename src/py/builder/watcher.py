@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+from fnmatch import fnmatch
+from .site_builder import SRC_DIR, IMG_DIR, build
+
+WATCH_DIRS = [SRC_DIR / "config", SRC_DIR / "src/templates", SRC_DIR / "src/public"]
+# Wait for writes to settle before rebuilding, editors often save in several steps
+SETTLE_DELAY = 0.05
+# Photo folders are listed again only when their mtime changes (a photo added, removed
+# or renamed). Photos overwritten in place are caught by a full check this often.
+PHOTO_RESCAN = 2.0
+
+# Changed path (relative to the project root) → stages reading it, first match wins.
+# Anything else, like site.yaml, has every stage check its inputs.
+WATCH_TARGETS = [
+    ("config/gallery.yaml", ("images", "tag_index", "shards", "index", "tag_pages", "hero_json")),
+    ("config/photos/*", ("images", "thumbnail")),
+    ("config/themes/*/theme.yaml", ("fonts", "colors", "favicons", "layout")),
+    ("config/themes/*/theme.css", ("assets",)),
+    ("config/themes/*/fonts/*", ("fonts",)),
+    ("config/themes/*", ("favicons",)),
+    ("src/public/*", ("assets",)),
+    ("src/templates/gallery.html", ("index", "tag_pages")),
+    ("src/templates/legals.html", ("legals",)),
+    ("src/templates/tag.html", ("tag_pages",)),
+    ("src/templates/*", ("layout",)),
+]
+
+def ignored(name):
+    """Hidden files and editor leftovers"""
+    return name.startswith(".") or name.endswith(("~", ".swp", ".tmp"))
+
+def mtime_ns(path):
+    """mtime of a path, None when it does not exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def snapshot(dirs=WATCH_DIRS, skip=(IMG_DIR,), folders=None):
+    """
+    Map every watched file outside the skipped dirs to its (mtime_ns, size).
+    The mtime of each folder walked is recorded in folders when given.
+    """
+    skip = {str(path) for path in skip}
+    files = {}
+    for root_dir in dirs:
+        if folders is not None:
+            folders[str(root_dir)] = mtime_ns(root_dir)
+        for root, dirnames, filenames in os.walk(root_dir):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and os.path.join(root, d) not in skip]
+            if folders is not None:
+                folders.update((os.path.join(root, d), mtime_ns(os.path.join(root, d))) for d in dirnames)
+            for name in filenames:
+                if ignored(name):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def photo_snapshot(root=IMG_DIR):
+    """Return the photos with their (mtime_ns, size), and the photo folders with their mtime"""
+    folders = {}
+    return snapshot([root], skip=(), folders=folders), folders
+
+def folders_changed(folders):
+    """Whether an entry was added, removed or renamed in a photo folder"""
+    return any(mtime_ns(path) != mtime for path, mtime in folders.items())
+
+def diff_snapshots(before, after):
+    """Return the sorted paths added, removed or modified between two snapshots"""
+    return sorted(path for path in before.keys() | after.keys() if before.get(path) != after.get(path))
+
+def describe_changes(changed):
+    """Summarise changed paths relative to the project root"""
+    names = [os.path.relpath(path, SRC_DIR) for path in changed]
+    if len(names) > 3:
+        return f"{', '.join(names[:3])} and {len(names) - 3} more"
+    return ", ".join(names)
+
+def affected_stages(changed):
+    """Names of the build stages reading the changed paths, None when every stage may be"""
+    stages = set()
+    for path in changed:
+        rel_path = os.path.relpath(path, SRC_DIR).replace(os.sep, "/")
+        targets = next((names for pattern, names in WATCH_TARGETS if fnmatch(rel_path, pattern)), None)
+        if targets is None:
+            return None
+        stages.update(targets)
+    return stages
+
+def watch(workers=None, interval=0.05, profile=False):
+    """
+    Build once, then poll the config and source dirs and rebuild on every change.
+    Rebuilds run in-process and only the stages reading the changed files, and the
+    stages after them, run again; the image cache then reprocesses only changed photos.
+    """
+    build(workers=workers, profile=profile)
+    sources = snapshot()
+    photos, folders = photo_snapshot()
+    rescanned = time.monotonic()
+    logging.info(f"\n[~] Watching {len(sources) + len(photos)} file(s) for changes, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(interval)
+            current_sources, current_photos = snapshot(), photos
+            if folders_changed(folders) or time.monotonic() - rescanned >= PHOTO_RESCAN:
+                current_photos, folders = photo_snapshot()
+                rescanned = time.monotonic()
+            changed = diff_snapshots(sources, current_sources) + diff_snapshots(photos, current_photos)
+            if not changed:
+                continue
+            # Let the editor or file copy finish, then pick up anything written meanwhile
+            time.sleep(SETTLE_DELAY)
+            current_sources = snapshot()
+            current_photos, folders = photo_snapshot()
+            rescanned = time.monotonic()
+            changed = diff_snapshots(sources, current_sources) + diff_snapshots(photos, current_photos)
+            sources, photos = current_sources, current_photos
+            if not changed:
+                continue
+            stages = affected_stages(changed)
+            logging.info(f"\n[~] Changed: {describe_changes(changed)}")
+            start = time.perf_counter()
+            try:
+                build(workers=workers, profile=profile, stages=stages)
+            except Exception as e:
+                logging.error(f"[✗] Build failed: {e}")
+                continue
+            logging.info(f"[✓] Rebuilt in {(time.perf_counter() - start) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        logging.info("\n[~] Stopped watching")
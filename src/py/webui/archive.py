@@ -0,0 +1,115 @@
+import os
+import json
+import uuid
+import logging
+import zipfile
+from pathlib import Path
+from src.py.builder.cache import STATE_DIR_NAME, output_generation
+from src.py.builder.pipeline import METRICS_FILE
+
+# --- Already compressed files are stored as is, deflating them only costs CPU ---
+STORED_SUFFIXES = {
+    ".webp", ".jpg", ".jpeg", ".avif", ".png", ".gif", ".ico",
+    ".woff", ".woff2", ".gz", ".br", ".zip",
+}
+ARCHIVE_DIR_NAME = "archive"
+CHUNK_SIZE = 256 * 1024
+
+class ZipStream:
+    """Write-only file object buffering zip data until the response generator drains it."""
+
+    def __init__(self, tee=None):
+        self.chunks = []
+        self.tee = tee
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        if self.tee:
+            self.tee.write(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and forget the data written so far."""
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def get_build_id(output_dir):
+    """
+    Return the id of the current output, or None: the id of the last build, from its metrics,
+    and the generation of the changes made to the output since, like pre-rendered uploads.
+    """
+    try:
+        with open(output_dir / STATE_DIR_NAME / METRICS_FILE, "r", encoding="utf-8") as f:
+            build_id = json.load(f).get("build_id")
+    except (OSError, ValueError):
+        return None
+    return f"{build_id}-{output_generation(output_dir)}" if build_id else None
+
+def iter_output_files(output_dir):
+    """Yield (path, archive name) of the site files, skipping the build state dir."""
+    for root, dirs, files in os.walk(output_dir):
+        if Path(root) == output_dir:
+            dirs[:] = [d for d in dirs if d != STATE_DIR_NAME]
+        dirs.sort()
+        for name in sorted(files):
+            path = Path(root) / name
+            yield path, path.relative_to(output_dir).as_posix()
+
+def cached_archive(output_dir, build_id):
+    """Path of the archive of this build when it was already generated, else None."""
+    if not build_id:
+        return None
+    path = output_dir / STATE_DIR_NAME / ARCHIVE_DIR_NAME / f"{build_id}.zip"
+    return path if path.exists() else None
+
+def stream_output_zip(output_dir, build_id=None):
+    """
+    Yield a zip of the output dir chunk by chunk, without building it on disk first.
+    With a build id, a copy is saved alongside so later downloads of the same build reuse it.
+    """
+    archive_dir = output_dir / STATE_DIR_NAME / ARCHIVE_DIR_NAME
+    tee = tmp_path = None
+    if build_id:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        # Unique name, concurrent downloads never write the same file
+        tmp_path = archive_dir / f"{build_id}.{uuid.uuid4().hex}.tmp"
+        tee = open(tmp_path, "wb")
+
+    complete = False
+    try:
+        stream = ZipStream(tee)
+        with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zipf:
+            for path, arcname in iter_output_files(output_dir):
+                compress_type = zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                try:
+                    src = open(path, "rb")
+                except FileNotFoundError:
+                    # Removed by a build running meanwhile
+                    logging.warning(f"[~] Skipped vanished file: {arcname}")
+                    continue
+                with src:
+                    info = zipfile.ZipInfo.from_file(path, arcname)
+                    info.compress_type = compress_type
+                    with zipf.open(info, "w", force_zip64=True) as entry:
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                            entry.write(chunk)
+                            yield stream.drain()
+                yield stream.drain()
+        yield stream.drain()
+        complete = True
+    finally:
+        if tee:
+            tee.close()
+            # Keep the archive only when it is whole and the output did not change meanwhile
+            if complete and get_build_id(output_dir) == build_id:
+                tmp_path.replace(archive_dir / f"{build_id}.zip")
+                for old in archive_dir.glob("*.zip"):
+                    if old.stem != build_id:
+                        old.unlink(missing_ok=True)
+            else:
+                tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,141 @@
+import json
+import uuid
+import time
+import logging
+import threading
+from collections import OrderedDict
+from src.py.builder.site_builder import build
+
+# --- Finished jobs kept for late SSE clients ---
+MAX_JOBS = 10
+# --- Seconds between SSE keep-alive comments ---
+KEEPALIVE_INTERVAL = 15
+
+class BuildJob:
+    """A background build, its log lines and progress events."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.events = []
+        self.changed = threading.Condition()
+
+    def publish(self, event, data):
+        """Append an event and wake up the SSE streams."""
+        with self.changed:
+            self.events.append((event, data))
+            self.changed.notify_all()
+
+    def finish(self, status, error=None):
+        """Record the outcome and publish the final status event."""
+        with self.changed:
+            self.status = status
+            self.error = error
+            self.finished = time.time()
+            self.events.append(("status", self.to_dict()))
+            self.changed.notify_all()
+
+    def to_dict(self):
+        """Job summary returned by the API."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "started": self.started,
+            "finished": self.finished,
+            "duration": round(self.finished - self.started, 3) if self.finished and self.started else None,
+        }
+
+class JobLogHandler(logging.Handler):
+    """
+    Forward builder log lines to the running job. Only records of the build thread and
+    of the worker threads it starts, which are named after it, belong to the build.
+    """
+
+    def __init__(self, job, thread_name):
+        super().__init__(level=logging.INFO)
+        self.job = job
+        self.thread_name = thread_name
+        self.setFormatter(logging.Formatter("%(message)s"))
+
+    def emit(self, record):
+        # Requests, uploads and the upload queue log from other threads meanwhile
+        if not record.threadName.startswith(self.thread_name):
+            return
+        for line in self.format(record).splitlines():
+            if line.strip():
+                self.job.publish("log", line)
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_current = None
+
+def get_job(job_id):
+    """Return a known job, or None."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def run_job(job):
+    """Run the build in this thread, streaming its logs to the job."""
+    global _current
+    handler = JobLogHandler(job, threading.current_thread().name)
+    logging.getLogger().addHandler(handler)
+    job.status = "running"
+    job.started = time.time()
+    job.publish("status", job.to_dict())
+    status, error = "ok", None
+    try:
+        build(progress=lambda stage, done, total: job.publish("progress", {"stage": stage, "done": done, "total": total}))
+    except Exception as e:
+        logging.error(f"[✗] Build failed: {e}")
+        status, error = "error", str(e)
+    finally:
+        logging.getLogger().removeHandler(handler)
+        with _jobs_lock:
+            _current = None
+        job.finish(status, error)
+
+def start_build():
+    """
+    Start a build on a background thread and return (job, started).
+    While a build is running, its job is returned instead of starting another one.
+    """
+    global _current
+    with _jobs_lock:
+        if _current is not None:
+            return _current, False
+        job = BuildJob()
+        _current = job
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+    threading.Thread(target=run_job, args=(job,), name=f"build-{job.id[:8]}", daemon=True).start()
+    return job, True
+
+def format_sse(event, data, event_id=None):
+    """Encode one Server-Sent Event."""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+def stream_events(job, last_event_id=None):
+    """Yield the job events as SSE, from last_event_id on, until the build ends."""
+    index = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    while True:
+        with job.changed:
+            if index >= len(job.events) and job.finished is None:
+                job.changed.wait(timeout=KEEPALIVE_INTERVAL)
+            events = job.events[index:]
+            finished = job.finished is not None
+        if not events and not finished:
+            yield ": keep-alive\n\n"
+        for event, data in events:
+            yield format_sse(event, data, event_id=index)
+            index += 1
+        if finished and index >= len(job.events):
+            return
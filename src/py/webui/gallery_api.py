@@ -0,0 +1,313 @@
+import os
+import json
+import base64
+import logging
+import binascii
+from pathlib import PurePosixPath
+from collections import Counter
+from flask import Blueprint, request, current_app
+from src.py.builder.gallery_builder import GALLERY_YAML
+from src.py.builder.config_store import read_config, load_config, save_config, locked
+from src.py.builder.site_builder import invalidate_images
+from src.py.webui.thumbnails import photo_versions
+
+# --- Create Flask blueprint for the paginated gallery API ---
+gallery_api_bp = Blueprint("gallery_api", __name__)
+
+SECTIONS = ("gallery", "hero")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def section_images(data, section):
+    """Images list of a section of gallery.yaml."""
+    return (data.get(section) or {}).get("images") or []
+
+def encode_cursor(index, src):
+    """Opaque cursor: position and src of the last returned entry."""
+    return base64.urlsafe_b64encode(json.dumps([index, src]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    """Return (index, src) of a cursor, raise ValueError when invalid."""
+    try:
+        index, src = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(index, int) or not isinstance(src, str):
+        raise ValueError("Invalid cursor")
+    return index, src
+
+def resume_position(images, cursor):
+    """Index to continue from. Found by src, so entries added or removed before it do not shift pages."""
+    index, src = decode_cursor(cursor)
+    if index < len(images) and images[index].get("src") == src:
+        return index + 1
+    for position, img in enumerate(images):
+        if img.get("src") == src:
+            return position + 1
+    # Entry removed meanwhile, continue from its old position
+    return min(index, len(images))
+
+def image_filter(args):
+    """Build the predicate of the tag, untagged and filename filters of a listing."""
+    tags = set(args.getlist("tag"))
+    untagged = args.get("untagged") in ("1", "true")
+    query = args.get("q", "").strip().lower()
+
+    def matches(img):
+        img_tags = img.get("tags") or []
+        if untagged and img_tags:
+            return False
+        if tags and not tags.issubset(img_tags):
+            return False
+        if query and query not in img.get("src", "").rsplit("/", 1)[-1].lower():
+            return False
+        return True
+
+    return matches if tags or untagged or query else None
+
+@gallery_api_bp.route("/api/<section>/images", methods=["GET"])
+def list_images(section):
+    """
+    One page of a section. Query: limit, cursor (next_cursor of the previous page),
+    tag (repeatable, all required), untagged=1, q (filename substring).
+    versions maps the srcs of the page to the photo version of their thumbnail URL.
+    """
+    if section not in SECTIONS:
+        return {"error": "Invalid section"}, 400
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    if limit < 1:
+        return {"error": "Invalid limit"}, 400
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    images = section_images(read_config(GALLERY_YAML), section)
+    try:
+        start = resume_position(images, request.args["cursor"]) if request.args.get("cursor") else 0
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    matches = image_filter(request.args)
+    if matches is None:
+        total = len(images)
+        positions = range(start, len(images))
+    else:
+        found = [position for position, img in enumerate(images) if matches(img)]
+        total = len(found)
+        positions = [position for position in found if position >= start]
+    page = positions[:limit]
+    page_images = [images[position] for position in page]
+    return {
+        "images": page_images,
+        "versions": photo_versions(current_app.config["PHOTOS_DIR"], [img["src"] for img in page_images]),
+        "total": total,
+        "next_cursor": encode_cursor(page[-1], images[page[-1]]["src"]) if len(positions) > limit else None,
+    }
+
+@gallery_api_bp.route("/api/gallery/tags", methods=["GET"])
+def list_tags():
+    """Gallery tags with their photo count, most used first."""
+    counts = Counter(tag for img in section_images(read_config(GALLERY_YAML), "gallery") for tag in img.get("tags") or [])
+    return {"tags": [{"tag": tag, "count": count} for tag, count in counts.most_common()]}
+
+def validate_tags(value, field):
+    """Return a clean tag list, raise ValueError when malformed."""
+    if not isinstance(value, list) or not all(isinstance(tag, str) for tag in value):
+        raise ValueError(f"'{field}' must be a list of strings")
+    return [tag.strip() for tag in value if tag.strip()]
+
+def parse_operations(section, body):
+    """
+    Validate a PATCH body: {"operations": [{"src": str | [str], "tags": [...],
+    "add_tags": [...], "remove_tags": [...]}]}. Return the operations with src as a list.
+    """
+    operations = body.get("operations") if isinstance(body, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("Expected a non-empty 'operations' list")
+    parsed = []
+    for op in operations:
+        if not isinstance(op, dict):
+            raise ValueError("Each operation must be an object")
+        srcs = op.get("src")
+        srcs = [srcs] if isinstance(srcs, str) else srcs
+        if not isinstance(srcs, list) or not srcs or not all(isinstance(src, str) for src in srcs):
+            raise ValueError("'src' must be a string or a list of strings")
+        unknown = set(op) - {"src", "tags", "add_tags", "remove_tags"}
+        if unknown:
+            raise ValueError(f"Unsupported field(s): {', '.join(sorted(unknown))}")
+        changes = {field: validate_tags(op[field], field) for field in ("tags", "add_tags", "remove_tags") if field in op}
+        if not changes:
+            raise ValueError("Operation without any change")
+        if section != "gallery":
+            raise ValueError("Only gallery photos have tags")
+        parsed.append((srcs, changes))
+    return parsed
+
+def apply_changes(img, changes):
+    """Apply one operation to an entry, return True when it changed."""
+    tags = list(img.get("tags") or [])
+    if "tags" in changes:
+        tags = list(dict.fromkeys(changes["tags"]))
+    tags += [tag for tag in dict.fromkeys(changes.get("add_tags", [])) if tag not in tags]
+    tags = [tag for tag in tags if tag not in changes.get("remove_tags", [])]
+    if tags == img.get("tags"):
+        return False
+    img["tags"] = tags
+    return True
+
+@gallery_api_bp.route("/api/<section>/images", methods=["PATCH"])
+def patch_images(section):
+    """
+    Edit entries by src: replace their tags, or add and remove tags in batch.
+    All operations are applied in one locked write of gallery.yaml.
+    """
+    if section not in SECTIONS:
+        return {"error": "Invalid section"}, 400
+    try:
+        operations = parse_operations(section, request.get_json(silent=True))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    result = {"updated": {}, "missing": []}
+    with locked(GALLERY_YAML):
+        data = load_config(GALLERY_YAML)
+        by_src = {img["src"]: img for img in section_images(data, section)}
+        for srcs, changes in operations:
+            for src in srcs:
+                img = by_src.get(src)
+                if img is None:
+                    result["missing"].append(src)
+                elif apply_changes(img, changes):
+                    result["updated"][src] = img
+        # Nothing to write when every src is missing or already up to date
+        if result["updated"]:
+            save_config(GALLERY_YAML, data)
+    return {
+        "status": "ok",
+        "updated": len(result["updated"]),
+        "images": list(result["updated"].values()),
+        "missing": sorted(set(result["missing"])),
+    }
+
+# --- Bulk operations: one locked gallery.yaml update for the whole batch ---
+BULK_ACTIONS = ("delete", "move", "retag")
+
+def src_section(src):
+    """Section of a gallery.yaml src, raise ValueError when it is not a photo path."""
+    parts = PurePosixPath(src).parts
+    if src.startswith("/") or len(parts) < 2 or parts[0] not in SECTIONS or any(part in (".", "..") for part in parts):
+        raise ValueError(f"Invalid src: {src}")
+    return parts[0]
+
+def invalidate_renditions(srcs):
+    """Drop the cached build renditions and editor thumbnails of photos deleted or moved."""
+    if not srcs:
+        return
+    dropped = invalidate_images(srcs)
+    thumbnails = current_app.config.get("THUMBNAILS")
+    if thumbnails:
+        for src in srcs:
+            thumbnails.discard(src)
+    logging.info(f"[✓] Invalidated renditions of {len(srcs)} photo(s), {dropped} cache entrie(s) dropped")
+
+def bulk_update(action, srcs, photos_dir, to=None, changes=None):
+    """
+    Delete, move (to another section) or retag photos by src, with a single write of
+    gallery.yaml. Return {"done": [...], "failed": {src: reason}, "moved": {src: new src}}.
+    """
+    result = {"done": [], "failed": {}, "moved": {}}
+    stale = []
+    with locked(GALLERY_YAML):
+        data = load_config(GALLERY_YAML)
+        entries = {img["src"]: (section, img) for section in SECTIONS for img in section_images(data, section)}
+        dropped = set()
+        added = {section: [] for section in SECTIONS}
+        changed = False
+
+        for src in dict.fromkeys(srcs):
+            try:
+                section = src_section(src)
+            except ValueError as e:
+                result["failed"][src] = str(e)
+                continue
+            path = photos_dir / src
+            entry = entries.get(src)
+            if not path.is_file() and entry is None:
+                result["failed"][src] = "not found"
+                continue
+
+            if action == "delete":
+                path.unlink(missing_ok=True)
+                dropped.add(src)
+                stale.append(src)
+            elif action == "move":
+                if section == to:
+                    result["failed"][src] = f"already in {to}"
+                    continue
+                new_src = f"{to}/{src.split('/', 1)[1]}"
+                target = photos_dir / new_src
+                if target.exists() or new_src in entries:
+                    result["failed"][src] = f"{new_src} already exists"
+                    continue
+                if not path.is_file():
+                    result["failed"][src] = "file not found"
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, target)
+                img = dict(entry[1]) if entry else {}
+                img["src"] = new_src
+                # Only gallery photos have tags
+                if to == "gallery":
+                    img.setdefault("tags", [])
+                else:
+                    img.pop("tags", None)
+                dropped.add(src)
+                added[to].append(img)
+                result["moved"][src] = new_src
+                stale.append(src)
+            elif action == "retag":
+                if section != "gallery" or entry is None:
+                    result["failed"][src] = "only gallery entries have tags"
+                    continue
+                if not apply_changes(entry[1], changes):
+                    continue
+            result["done"].append(src)
+            changed = True
+
+        if changed:
+            for section in SECTIONS:
+                section_data = data.get(section) or {}
+                section_data["images"] = [img for img in section_images(data, section) if img["src"] not in dropped] + added[section]
+                data[section] = section_data
+            save_config(GALLERY_YAML, data)
+
+    invalidate_renditions(stale)
+    return result
+
+@gallery_api_bp.route("/api/photos/bulk", methods=["POST"])
+def bulk_photos():
+    """
+    Apply one action to many photos. JSON body: action (delete, move or retag), src (list of
+    gallery.yaml srcs), to (target section of move), tags / add_tags / remove_tags (retag).
+    """
+    body = request.get_json(silent=True) or {}
+    action, srcs, to = body.get("action"), body.get("src"), body.get("to")
+    if action not in BULK_ACTIONS:
+        return {"error": f"Invalid action, use one of {list(BULK_ACTIONS)}"}, 400
+    if not isinstance(srcs, list) or not srcs or not all(isinstance(src, str) for src in srcs):
+        return {"error": "'src' must be a non-empty list of strings"}, 400
+    if action == "move" and to not in SECTIONS:
+        return {"error": "Invalid target section"}, 400
+    changes = None
+    if action == "retag":
+        try:
+            changes = {field: validate_tags(body[field], field) for field in ("tags", "add_tags", "remove_tags") if field in body}
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        if not changes:
+            return {"error": "Retag without any change"}, 400
+    PHOTOS_DIR = current_app.config.get("PHOTOS_DIR")
+    if not PHOTOS_DIR:
+        return {"error": "Server misconfiguration"}, 500
+
+    result = bulk_update(action, srcs, PHOTOS_DIR, to=to, changes=changes)
+    logging.info(f"[✓] Bulk {action}: {len(result['done'])} photo(s), {len(result['failed'])} failed")
+    return {"status": "ok", **result}
@@ -0,0 +1,191 @@
+"""
+Preview server of the built site.
+
+Serves the output dir over HTTP/1.1 with keep-alive, ETag/Last-Modified
+revalidation, single byte Range requests and the .br/.gz sidecars written
+by the builder. Run from the repository root:
+    python -m src.py.webui.preview [--port 3000] [--dir output] [--bind 0.0.0.0]
+"""
+import re
+import argparse
+import logging
+import posixpath
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from src.py.builder.cache import STATE_DIR_NAME
+
+# --- Sidecar suffix per Content-Encoding, preferred first ---
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# --- Content-hashed file names (photo.3f2a9c1b.webp) never change, the rest is revalidated ---
+FINGERPRINT_RE = re.compile(r"\.[0-9a-f]{8,}\.[^.]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    """Static file handler with conditional, range and precompressed responses."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug(f"[~] Preview: {format % args}")
+
+    def do_GET(self):
+        self.serve(head=False)
+
+    def do_HEAD(self):
+        self.serve(head=True)
+
+    def resolve(self):
+        """Return the file for the request path, or None. Directories map to their index.html."""
+        path = posixpath.normpath(unquote(urlsplit(self.path).path))
+        parts = [part for part in path.split("/") if part and part not in (".", "..")]
+        if parts and parts[0] == STATE_DIR_NAME:
+            return None
+        file_path = Path(self.directory).joinpath(*parts)
+        if file_path.is_dir():
+            file_path = file_path / "index.html"
+        return file_path if file_path.is_file() else None
+
+    def redirect_dir(self):
+        """Redirect /dir to /dir/ like http.server, so relative links resolve. Return True when sent."""
+        parts = urlsplit(self.path)
+        if parts.path.endswith("/") or not Path(self.translate_path(parts.path)).is_dir():
+            return False
+        self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+        self.send_header("Location", parts.path + "/" + (f"?{parts.query}" if parts.query else ""))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def pick_encoding(self, file_path):
+        """Return (encoding, sidecar path) of the best sidecar the client accepts, or (None, file_path)."""
+        accepted = {
+            token.split(";")[0].strip().lower()
+            for token in self.headers.get("Accept-Encoding", "").split(",")
+            if not token.strip().endswith(";q=0")
+        }
+        for encoding, suffix in ENCODINGS:
+            sidecar = file_path.with_name(file_path.name + suffix)
+            if encoding in accepted and sidecar.is_file():
+                return encoding, sidecar
+        return None, file_path
+
+    def not_modified(self, etag, mtime):
+        """Evaluate If-None-Match, then If-Modified-Since."""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def byte_range(self, size, etag, last_modified):
+        """Return the (start, end) of a satisfiable single Range, None to send it all, or False when unsatisfiable."""
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range.strip() not in (etag, last_modified):
+            return None
+        match = RANGE_RE.match(header.strip())
+        if not match or match.groups() == ("", ""):
+            # Multiple or malformed ranges: the whole file is a valid answer
+            return None
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+            if start >= size or (last and int(last) < start):
+                return False
+        else:
+            length = int(last)
+            if not length:
+                return False
+            start, end = max(size - length, 0), size - 1
+        return start, end
+
+    def serve(self, head):
+        if self.redirect_dir():
+            return
+        file_path = self.resolve()
+        if file_path is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+
+        # Byte ranges address the identity encoding, sidecars are for whole responses
+        encoding, body_path = (None, file_path) if self.headers.get("Range") else self.pick_encoding(file_path)
+        stat = body_path.stat()
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}{"-" + encoding if encoding else ""}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": last_modified,
+            "Cache-Control": IMMUTABLE if FINGERPRINT_RE.search(file_path.name) else REVALIDATE,
+            "Vary": "Accept-Encoding",
+            "Accept-Ranges": "bytes",
+        }
+
+        if self.not_modified(etag, stat.st_mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        status, start, length = HTTPStatus.OK, 0, size
+        span = self.byte_range(size, etag, last_modified)
+        if span is False:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if span:
+            status, start, length = HTTPStatus.PARTIAL_CONTENT, span[0], span[1] - span[0] + 1
+            headers["Content-Range"] = f"bytes {span[0]}-{span[1]}/{size}"
+
+        self.send_response(status)
+        self.send_header("Content-Type", self.guess_type(str(file_path)))
+        self.send_header("Content-Length", str(length))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if head:
+            return
+        with open(body_path, "rb") as f:
+            try:
+                self.connection.sendfile(f, offset=start, count=length)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+def serve(directory, port=3000, bind="0.0.0.0"):
+    """Serve directory until interrupted."""
+    def handler(*args, **kwargs):
+        return PreviewHandler(*args, directory=str(directory), **kwargs)
+
+    with ThreadingHTTPServer((bind, port), handler) as server:
+        server.daemon_threads = True
+        logging.info(f"[✓] Preview server on http://{bind}:{port} serving {directory}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Serve the built Lumeex site")
+    parser.add_argument("--port", type=int, default=3000, help="port to listen on (default: 3000)")
+    parser.add_argument("--dir", type=Path, default=Path("output"), help="directory to serve (default: output)")
+    parser.add_argument("--bind", default="0.0.0.0", help="address to bind (default: 0.0.0.0)")
+    args = parser.parse_args()
+    serve(args.dir, args.port, args.bind)
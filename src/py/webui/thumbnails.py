@@ -0,0 +1,139 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from PIL import Image
+from src.py.builder.image_processor import open_image
+
+# --- Editor previews: small WebP thumbnails of the original photos ---
+THUMB_SIZES = (128, 256, 512)
+DEFAULT_THUMB_SIZE = 256
+THUMB_QUALITY = 75
+# --- Thumbnail URLs carry the photo version, so browsers keep them until it changes ---
+THUMB_MAX_AGE = 365 * 24 * 3600
+# --- Disk cache cap, least recently used thumbnails are evicted first ---
+CACHE_MAX_BYTES = int(os.getenv("WEBUI_THUMB_CACHE_MB", 256)) * 1024 * 1024
+
+def src_prefix(src):
+    """File name prefix of the thumbnails of a photo."""
+    return hashlib.sha256(src.encode("utf-8")).hexdigest()[:24]
+
+def photo_version(stat):
+    """Version of a photo in thumbnail URLs, changes whenever the file is replaced or edited."""
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+def photo_versions(photos_dir, srcs):
+    """Map the srcs of the photos found on disk to their version."""
+    versions = {}
+    for src in srcs:
+        try:
+            versions[src] = photo_version((photos_dir / src).stat())
+        except OSError:
+            pass
+    return versions
+
+class ThumbnailCache:
+    """
+    Thumbnails on disk, named after their source path, source mtime and size, so an edited
+    photo gets a new one. Usage order is kept in memory and in the file mtimes across restarts.
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries = None  # name -> size, least recently used first
+        self.total = 0
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def load(self):
+        """Index the thumbnails already on disk, oldest use first."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".webp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        self.entries = OrderedDict((name, size) for _, name, size in sorted(files))
+        self.total = sum(self.entries.values())
+        self.evict()
+
+    def get(self, photos_dir, src, size=DEFAULT_THUMB_SIZE):
+        """Return (thumbnail path, etag, source mtime, photo version) of a photo, generating it when missing, or None."""
+        source = (photos_dir / src).resolve()
+        if not source.is_relative_to(photos_dir.resolve()) or not source.is_file():
+            return None
+        stat = source.stat()
+        prefix = src_prefix(src)
+        name = f"{prefix}.{size}.{stat.st_mtime_ns}.{stat.st_size}.webp"
+        path = self.cache_dir / name
+
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            hit = name in self.entries and path.exists()
+            if hit:
+                self.entries.move_to_end(name)
+            else:
+                key_lock = self.key_locks.setdefault(name, threading.Lock())
+        if hit:
+            try:
+                os.utime(path)
+                return path, name, stat.st_mtime, photo_version(stat)
+            except FileNotFoundError:
+                # Evicted or discarded meanwhile, generate it again
+                with self.lock:
+                    key_lock = self.key_locks.setdefault(name, threading.Lock())
+
+        # One generation per thumbnail, concurrent requests wait for it
+        with key_lock:
+            ok = path.exists() or self.generate(source, path, size)
+            with self.lock:
+                self.key_locks.pop(name, None)
+                if ok:
+                    self.add(name, path.stat().st_size, prefix, size)
+        return (path, name, stat.st_mtime, photo_version(stat)) if ok else None
+
+    def generate(self, source, path, size):
+        """Write a thumbnail atomically, decoding JPEGs at a reduced scale."""
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            img, _ = open_image(source, max_width=size)
+            with img:
+                img.thumbnail((size, size), Image.LANCZOS)
+                img.convert("RGB").save(tmp_path, "WEBP", quality=THUMB_QUALITY)
+            tmp_path.replace(path)
+            return True
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            logging.error(f"[✗] Thumbnail failed for {source}: {e}")
+            return False
+
+    def add(self, name, file_size, prefix, size):
+        """Record a new thumbnail, drop outdated ones of the same photo and evict past the cap."""
+        for old in [old for old in self.entries if old != name and old.startswith(f"{prefix}.{size}.")]:
+            self.remove(old)
+        self.total += file_size - self.entries.pop(name, 0)
+        self.entries[name] = file_size
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used thumbnails until the cache fits its cap."""
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            self.remove(next(iter(self.entries)))
+
+    def discard(self, src):
+        """Delete every thumbnail of a photo, e.g. once it is deleted or moved."""
+        prefix = f"{src_prefix(src)}."
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            for name in [name for name in self.entries if name.startswith(prefix)]:
+                self.remove(name)
+
+    def remove(self, name):
+        """Delete a thumbnail, the caller holds the lock."""
+        self.total -= self.entries.pop(name)
+        (self.cache_dir / name).unlink(missing_ok=True)
@@ -1,14 +1,33 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
 import logging
+import threading
 from pathlib import Path
 from flask import Blueprint, request, current_app
 from werkzeug.utils import secure_filename
-from src.py.builder.gallery_builder import update_gallery, update_hero
+from src.py.builder.cache import hash_file
+from src.py.webui.upload_queue import enqueue, queue_status
 
 # --- Create Flask blueprint for upload routes ---
 upload_bp = Blueprint("upload", __name__)
 
 # --- Allowed file types ---
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}
+SECTIONS = ("gallery", "hero")
+
+# --- Chunked uploads: sessions and partial files live in a hidden dir of the photos dir ---
+UPLOADS_DIR_NAME = ".uploads"
+CHUNK_SIZE = 8 * 1024 * 1024  # Suggested to clients
+READ_SIZE = 1024 * 1024  # Streamed from the request body to disk
+SESSION_TTL = 24 * 3600
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_session_locks = {}
+_session_locks_lock = threading.Lock()
 
 def allowed_file(filename: str) -> bool:
     """Check if the uploaded file has an allowed extension."""
@@ -22,26 +41,29 @@ def save_uploaded_file(file, folder: Path):
     logging.info(f"[✓] Uploaded {filename} to {folder}")
     return filename
 
+def get_photos_dir():
+    """Photos directory from app config."""
+    return current_app.config.get("PHOTOS_DIR")
+
 @upload_bp.route("/api/<section>/upload", methods=["POST"])
 def upload_photo(section: str):
     """
     Handle file uploads for gallery or hero section.
-    Accepts multiple files under 'files'.
+    Accepts multiple files under 'files', registered in the background.
     """
     # Validate section
-    if section not in ["gallery", "hero"]:
+    if section not in SECTIONS:
         return {"error": "Invalid section"}, 400
 
     # Check if files are provided
     if "files" not in request.files:
         return {"error": "No files provided"}, 400
-    
+
     files = request.files.getlist("files")
     if not files:
         return {"error": "No selected files"}, 400
 
-    # Get photos directory from app config
-    PHOTOS_DIR = current_app.config.get("PHOTOS_DIR")
+    PHOTOS_DIR = get_photos_dir()
     if not PHOTOS_DIR:
         return {"error": "Server misconfiguration"}, 500
 
@@ -53,14 +75,219 @@ def upload_photo(section: str):
         if file and allowed_file(file.filename):
             filename = save_uploaded_file(file, folder)
             uploaded.append(filename)
+            enqueue(section, f"{section}/{filename}")
 
-    # Update YAML if any files were uploaded
     if uploaded:
-        if section == "gallery":
-            update_gallery()
-        else:
-            update_hero()
-        return {"status": "ok", "uploaded": uploaded}
+        return {"status": "ok", "uploaded": uploaded, "queued": True}
 
     return {"error": "No valid files uploaded"}, 400
 
+# --- Chunked, resumable uploads ---
+def session_lock(upload_id):
+    """Lock of an upload session, chunks of one file are written one at a time."""
+    with _session_locks_lock:
+        return _session_locks.setdefault(upload_id, threading.Lock())
+
+def uploads_dir():
+    """Directory of the upload sessions."""
+    return get_photos_dir() / UPLOADS_DIR_NAME
+
+def session_paths(upload_id):
+    """(metadata, partial file) paths of an upload session."""
+    folder = uploads_dir()
+    return folder / f"{upload_id}.json", folder / f"{upload_id}.part"
+
+def load_session(upload_id):
+    """Return an upload session with its current offset, or None."""
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        return None
+    meta_path, part_path = session_paths(upload_id)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # The partial file is the source of truth, it survives interrupted requests and restarts
+    session["offset"] = part_path.stat().st_size if part_path.exists() else 0
+    return session
+
+def drop_session(upload_id):
+    """Delete an upload session, its partial file and its lock."""
+    for path in session_paths(upload_id):
+        path.unlink(missing_ok=True)
+    with _session_locks_lock:
+        _session_locks.pop(upload_id, None)
+
+def prune_sessions():
+    """Delete upload sessions left untouched for longer than SESSION_TTL."""
+    folder = uploads_dir()
+    if not folder.exists():
+        return
+    now = time.time()
+    for meta_path in folder.glob("*.json"):
+        part_path = meta_path.with_suffix(".part")
+        last_write = max(path.stat().st_mtime for path in (meta_path, part_path) if path.exists())
+        if now - last_write > SESSION_TTL:
+            drop_session(meta_path.stem)
+
+def session_response(session, status=None):
+    """Upload session as returned by the API."""
+    return {
+        "upload_id": session["id"],
+        "status": status or ("complete" if session["offset"] >= session["size"] else "uploading"),
+        "src": session["src"],
+        "offset": session["offset"],
+        "size": session["size"],
+        "chunk_size": CHUNK_SIZE,
+    }
+
+@upload_bp.route("/api/<section>/uploads", methods=["POST"])
+def create_upload(section: str):
+    """
+    Start or resume a chunked upload. JSON body: filename, size, and optionally sha256
+    (of the whole file) and upload_id, of the session to resume. That session is returned,
+    with the offset to continue from, when it is still there and for the same file.
+    """
+    if section not in SECTIONS:
+        return {"error": "Invalid section"}, 400
+    PHOTOS_DIR = get_photos_dir()
+    if not PHOTOS_DIR:
+        return {"error": "Server misconfiguration"}, 500
+
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(str(data.get("filename", "")))
+    size = data.get("size")
+    sha256 = str(data.get("sha256") or "").lower() or None
+    if not filename or not allowed_file(filename):
+        return {"error": "Invalid file type"}, 400
+    if not isinstance(size, int) or size <= 0:
+        return {"error": "Invalid size"}, 400
+    if sha256 and not SHA256_RE.match(sha256):
+        return {"error": "Invalid sha256"}, 400
+
+    src = f"{section}/{filename}"
+
+    # Already uploaded: nothing to send
+    target = PHOTOS_DIR / src
+    if sha256 and target.exists() and target.stat().st_size == size and hash_file(target) == sha256:
+        return session_response({"id": uuid.uuid4().hex, "src": src, "offset": size, "size": size}, status="complete")
+
+    # Sessions are only resumed by id, clients sending alike files never share one
+    session = load_session(str(data.get("upload_id") or ""))
+    if session is not None and (session["src"], session["size"], session["sha256"]) != (src, size, sha256):
+        session = None
+    if session is None:
+        prune_sessions()
+        upload_id = uuid.uuid4().hex
+        session = {"id": upload_id, "section": section, "filename": filename, "src": src, "size": size, "sha256": sha256, "created": time.time()}
+        meta_path, _ = session_paths(upload_id)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta_path.write_text(json.dumps(session), encoding="utf-8")
+        session["offset"] = 0
+        logging.info(f"[~] Upload started: {src} ({size} bytes)")
+    return session_response(session), 201
+
+@upload_bp.route("/api/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    """Current offset of an upload session."""
+    session = load_session(upload_id)
+    if session is None:
+        return {"error": "Unknown upload"}, 404
+    return session_response(session)
+
+@upload_bp.route("/api/uploads/<upload_id>", methods=["DELETE"])
+def cancel_upload(upload_id):
+    """Abort an upload session."""
+    if load_session(upload_id) is None:
+        return {"error": "Unknown upload"}, 404
+    with session_lock(upload_id):
+        drop_session(upload_id)
+    return {"status": "cancelled"}
+
+@upload_bp.route("/api/uploads/<upload_id>", methods=["PATCH"])
+def upload_chunk(upload_id):
+    """
+    Append a chunk to an upload. The raw body is streamed to disk at the Upload-Offset
+    header, which must match the current offset. An optional Upload-Checksum header
+    ("sha256 <hex>") is checked before the chunk is kept. The last chunk completes the
+    upload: the file is checked against its sha256, moved in place and queued.
+    """
+    session = load_session(upload_id)
+    if session is None:
+        return {"error": "Unknown upload"}, 404
+    lock = session_lock(upload_id)
+    if not lock.acquire(blocking=False):
+        return {"error": "Another chunk of this upload is being written"}, 409
+    try:
+        return write_chunk(load_session(upload_id) or session)
+    finally:
+        lock.release()
+
+def write_chunk(session):
+    """Stream the request body into the partial file of a session."""
+    upload_id, offset, size = session["id"], session["offset"], session["size"]
+    try:
+        client_offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return {"error": "Missing Upload-Offset header"}, 400
+    if client_offset != offset:
+        return {**session_response(session), "error": "Offset mismatch"}, 409
+    length = request.content_length
+    if length is None:
+        return {"error": "Missing Content-Length"}, 411
+    if offset + length > size:
+        return {"error": "Chunk exceeds the file size"}, 400
+
+    expected = None
+    checksum = request.headers.get("Upload-Checksum")
+    if checksum:
+        algorithm, _, expected = checksum.partition(" ")
+        if algorithm.lower() != "sha256" or not SHA256_RE.match(expected.lower()):
+            return {"error": "Unsupported Upload-Checksum, use 'sha256 <hex>'"}, 400
+        expected = expected.lower()
+
+    _, part_path = session_paths(upload_id)
+    digest = hashlib.sha256()
+    written = 0
+    with open(part_path, "ab") as part:
+        try:
+            while written < length:
+                data = request.stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                part.write(data)
+                digest.update(data)
+                written += len(data)
+        finally:
+            # A short or corrupted chunk is dropped entirely, the client resends it
+            if written != length or (expected and digest.hexdigest() != expected):
+                part.truncate(offset)
+    if written != length:
+        return {**session_response({**session, "offset": offset}), "error": "Incomplete chunk"}, 400
+    if expected and digest.hexdigest() != expected:
+        return {**session_response({**session, "offset": offset}), "error": "Chunk checksum mismatch"}, 400
+
+    session["offset"] = offset + written
+    if session["offset"] < size:
+        return session_response(session)
+    return complete_upload(session, part_path)
+
+def complete_upload(session, part_path):
+    """Verify a fully received file, move it to its section and queue it."""
+    file_hash = hash_file(part_path)
+    if session["sha256"] and file_hash != session["sha256"]:
+        drop_session(session["id"])
+        logging.error(f"[✗] Upload checksum mismatch: {session['src']}")
+        return {"error": "File checksum mismatch, upload it again", "upload_id": session["id"]}, 422
+    target = get_photos_dir() / session["src"]
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(part_path, target)
+    drop_session(session["id"])
+    logging.info(f"[✓] Uploaded {session['filename']} to {target.parent}")
+    enqueue(session["section"], session["src"])
+    return {**session_response(session, status="complete"), "sha256": file_hash}
+
+@upload_bp.route("/api/uploads/queue", methods=["GET"])
+def upload_queue_status():
+    """Progress of the background registration and pre-rendering of uploads."""
+    return queue_status()
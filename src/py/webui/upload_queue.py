@@ -0,0 +1,73 @@
+import time
+import queue
+import logging
+import threading
+from src.py.builder.gallery_builder import sync_photos
+from src.py.builder.site_builder import prerender_images
+
+# --- Seconds to wait for more uploads before processing a batch ---
+BATCH_DELAY = 0.5
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_state = {"pending": 0, "processing": 0, "processed": 0, "failed": 0}
+_state_lock = threading.Lock()
+
+def enqueue(section, src):
+    """Queue an uploaded photo (section, gallery.yaml src) for registration and pre-rendering."""
+    global _worker
+    with _state_lock:
+        _state["pending"] += 1
+    _queue.put((section, src))
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=run_worker, name="upload-queue", daemon=True)
+            _worker.start()
+
+def queue_status():
+    """Counters of the upload queue, idle when nothing is pending or processing."""
+    with _state_lock:
+        return {**_state, "idle": not _state["pending"] and not _state["processing"]}
+
+def next_batch():
+    """Block for the next upload, then collect the ones arriving shortly after it."""
+    batch = [_queue.get()]
+    deadline = time.monotonic() + BATCH_DELAY
+    while True:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return batch
+        try:
+            batch.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            return batch
+
+def process_batch(batch):
+    """Register a batch in gallery.yaml with one sync, then render its photos."""
+    sections = tuple(section for section in ("gallery", "hero") if any(item[0] == section for item in batch))
+    sync_photos(sections)
+    counts = prerender_images(
+        hero_srcs=[src for section, src in batch if section == "hero"],
+        gallery_srcs=[src for section, src in batch if section == "gallery"],
+    )
+    logging.info(f"[✓] Pre-rendered {counts['processed']} uploaded photo(s), {counts['skipped']} already up to date")
+    return counts["failed"]
+
+def run_worker():
+    """Process queued uploads in batches, forever."""
+    while True:
+        batch = next_batch()
+        with _state_lock:
+            _state["pending"] -= len(batch)
+            _state["processing"] = len(batch)
+        failed = len(batch)
+        try:
+            failed = process_batch(batch)
+        except Exception as e:
+            logging.error(f"[✗] Processing of {len(batch)} upload(s) failed: {e}")
+        finally:
+            with _state_lock:
+                _state["processing"] = 0
+                _state["processed"] += len(batch) - failed
+                _state["failed"] += failed
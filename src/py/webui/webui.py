@@ -1,18 +1,28 @@
 # --- Imports ---
 import logging
-import yaml
-import subprocess
-import zipfile
 import os
 from pathlib import Path
 from flask import (
-    Flask, jsonify, request, send_from_directory, render_template,
-    send_file, after_this_request
+    Flask, Response, jsonify, request, send_from_directory, render_template,
+    send_file, stream_with_context
 )
+from werkzeug.security import safe_join
 from src.py.builder.gallery_builder import (
-    GALLERY_YAML, load_yaml, save_yaml, update_gallery, update_hero
+    GALLERY_YAML, update_gallery, update_hero
 )
+from src.py.builder.config_store import read_config, save_config, update_config
 from src.py.webui.upload import upload_bp
+from src.py.webui.gallery_api import gallery_api_bp, bulk_update, section_images
+from src.py.webui.build_jobs import start_build, get_job, stream_events
+from src.py.webui.archive import get_build_id, cached_archive, stream_output_zip
+from src.py.webui.thumbnails import ThumbnailCache, THUMB_SIZES, DEFAULT_THUMB_SIZE, THUMB_MAX_AGE
+from src.py.builder.cache import STATE_DIR_NAME
+
+# --- Production WSGI server, optional ---
+try:
+    from waitress import serve as waitress_serve
+except ImportError:
+    waitress_serve = None
 
 # --- Logging configuration ---
 logging.basicConfig(level=logging.INFO, format="%(message)s")
@@ -31,34 +41,38 @@ app = Flask(
 )
 
 WEBUI_PORT = int(os.getenv("WEBUI_PORT", 5000))
+# --- "production" (waitress) or "development" (Werkzeug with reloader and debugger) ---
+WEBUI_MODE = os.getenv("WEBUI_MODE", "production").lower()
+# --- Request threads, each open build progress stream holds one ---
+WEBUI_THREADS = int(os.getenv("WEBUI_THREADS", 16))
+STATIC_MAX_AGE = 365 * 24 * 3600
 
 # --- Config paths ---
 SITE_YAML = Path(__file__).resolve().parents[3] / "config" / "site.yaml"
 PHOTOS_DIR = Path(__file__).resolve().parents[3] / "config" / "photos"
 app.config["PHOTOS_DIR"] = PHOTOS_DIR
+THUMBNAILS = ThumbnailCache(Path(__file__).resolve().parents[3] / "output" / STATE_DIR_NAME / "thumbnails")
+app.config["THUMBNAILS"] = THUMBNAILS
 
-# --- Register upload blueprint ---
+# --- Register upload and gallery API blueprints ---
 app.register_blueprint(upload_bp)
+app.register_blueprint(gallery_api_bp)
 
 # --- Theme editor helper functions ---
 def get_theme_name():
     """Get current theme name from site.yaml."""
     site_yaml_path = Path(__file__).resolve().parents[3] / "config" / "site.yaml"
-    with open(site_yaml_path, "r") as f:
-        site_yaml = yaml.safe_load(f)
-    return site_yaml.get("build", {}).get("theme", "modern")
+    return read_config(site_yaml_path).get("build", {}).get("theme", "modern")
 
 def get_theme_yaml(theme_name):
     """Load theme.yaml for a given theme."""
     theme_yaml_path = Path(__file__).resolve().parents[3] / "config" / "themes" / theme_name / "theme.yaml"
-    with open(theme_yaml_path, "r") as f:
-        return yaml.safe_load(f)
+    return read_config(theme_yaml_path)
 
 def save_theme_yaml(theme_name, theme_yaml):
     """Save theme.yaml for a given theme."""
     theme_yaml_path = Path(__file__).resolve().parents[3] / "config" / "themes" / theme_name / "theme.yaml"
-    with open(theme_yaml_path, "w") as f:
-        yaml.safe_dump(theme_yaml, f, sort_keys=False, allow_unicode=True)
+    save_config(theme_yaml_path, theme_yaml)
 
 def get_local_fonts(theme_name):
     """List local font files for a theme."""
@@ -67,6 +81,42 @@ def get_local_fonts(theme_name):
         return []
     return [f.name for f in fonts_dir.glob("*") if f.is_file() and f.suffix in [".woff", ".woff2"]]
 
+# --- Static files: URLs carry the file mtime, so they are cached until the file changes ---
+def static_version(filename):
+    """Version of a static file in its URL, None when it does not exist."""
+    path = safe_join(str(WEBUI_PATH), filename)
+    try:
+        return f"{os.stat(path).st_mtime_ns:x}" if path else None
+    except (OSError, ValueError):
+        return None
+
+@app.url_defaults
+def version_static_urls(endpoint, values):
+    """Add the file version to url_for('static', ...) URLs."""
+    if endpoint == "static" and "v" not in values:
+        version = static_version(values.get("filename", ""))
+        if version:
+            values["v"] = version
+
+@app.after_request
+def static_cache_headers(response):
+    """
+    Long-lived caching of static files requested at their current version, the others keep
+    ETag revalidation. Development mode always revalidates, files are edited all the time.
+    """
+    if (
+        WEBUI_MODE != "development"
+        and request.endpoint == "static"
+        and response.status_code in (200, 304)
+        and request.args.get("v")
+        and request.args.get("v") == static_version(request.view_args.get("filename", ""))
+    ):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
 # --- ROUTES ---
 
 # --- Main page ---
@@ -92,31 +142,27 @@ def gallery_editor():
 @app.route("/api/gallery", methods=["GET"])
 def get_gallery():
     """Get gallery images."""
-    data = load_yaml(GALLERY_YAML)
+    data = read_config(GALLERY_YAML)
     return jsonify(data.get("gallery", {}).get("images", []))
 
 @app.route("/api/hero", methods=["GET"])
 def get_hero():
     """Get hero images."""
-    data = load_yaml(GALLERY_YAML)
+    data = read_config(GALLERY_YAML)
     return jsonify(data.get("hero", {}).get("images", []))
 
 @app.route("/api/gallery/update", methods=["POST"])
 def update_gallery_api():
     """Update gallery images."""
     images = request.json
-    data = load_yaml(GALLERY_YAML)
-    data["gallery"]["images"] = images
-    save_yaml(data, GALLERY_YAML)
+    update_config(GALLERY_YAML, lambda data: data.setdefault("gallery", {}).update(images=images))
     return jsonify({"status": "ok"})
 
 @app.route("/api/hero/update", methods=["POST"])
 def update_hero_api():
     """Update hero images."""
     images = request.json
-    data = load_yaml(GALLERY_YAML)
-    data["hero"]["images"] = images
-    save_yaml(data, GALLERY_YAML)
+    update_config(GALLERY_YAML, lambda data: data.setdefault("hero", {}).update(images=images))
     return jsonify({"status": "ok"})
 
 @app.route("/api/gallery/refresh", methods=["POST"])
@@ -132,55 +178,46 @@ def refresh_hero():
     return jsonify({"status": "ok"})
 
 # --- Gallery & Hero photo deletion ---
+def delete_photos(srcs):
+    """Delete photos and their gallery.yaml entries in one update."""
+    result = bulk_update("delete", srcs, app.config["PHOTOS_DIR"])
+    return jsonify({"status": "ok", "deleted": len(result["done"]), "failed": result["failed"]})
+
+def delete_one_photo(section):
+    """Delete a photo given by its file name in the section."""
+    src = (request.json or {}).get("src")
+    if not src:
+        return {"error": "❌ Missing src"}, 400
+    result = bulk_update("delete", [f"{section}/{src}"], app.config["PHOTOS_DIR"])
+    if not result["done"]:
+        return {"error": "❌ File not found"}, 404
+    return {"status": "ok"}
+
+def section_srcs(section):
+    """srcs of a section: its gallery.yaml entries and the photos on disk."""
+    srcs = [img["src"] for img in section_images(read_config(GALLERY_YAML), section)]
+    srcs += [f"{section}/{file.name}" for file in (app.config["PHOTOS_DIR"] / section).glob("*") if file.is_file()]
+    return list(dict.fromkeys(srcs))
+
 @app.route("/api/gallery/delete", methods=["POST"])
 def delete_gallery_photo():
     """Delete a gallery photo."""
-    data = request.json
-    src = data.get("src")
-    file_path = PHOTOS_DIR / "gallery" / src
-    if file_path.exists():
-        file_path.unlink()
-        return {"status": "ok"}
-    return {"error": "❌ File not found"}, 404
+    return delete_one_photo("gallery")
 
 @app.route("/api/hero/delete", methods=["POST"])
 def delete_hero_photo():
     """Delete a hero photo."""
-    data = request.json
-    src = data.get("src")
-    file_path = PHOTOS_DIR / "hero" / src
-    if file_path.exists():
-        file_path.unlink()
-        return {"status": "ok"}
-    return {"error": "❌ File not found"}, 404
+    return delete_one_photo("hero")
 
 @app.route("/api/gallery/delete_all", methods=["POST"])
 def delete_all_gallery_photos():
     """Delete all gallery photos."""
-    gallery_dir = PHOTOS_DIR / "gallery"
-    deleted = 0
-    for file in gallery_dir.glob("*"):
-        if file.is_file():
-            file.unlink()
-            deleted += 1
-    data = load_yaml(GALLERY_YAML)
-    data["gallery"]["images"] = []
-    save_yaml(data, GALLERY_YAML)
-    return jsonify({"status": "ok", "deleted": deleted})
+    return delete_photos(section_srcs("gallery"))
 
 @app.route("/api/hero/delete_all", methods=["POST"])
 def delete_all_hero_photos():
     """Delete all hero photos."""
-    hero_dir = PHOTOS_DIR / "hero"
-    deleted = 0
-    for file in hero_dir.glob("*"):
-        if file.is_file():
-            file.unlink()
-            deleted += 1
-    data = load_yaml(GALLERY_YAML)
-    data["hero"]["images"] = []
-    save_yaml(data, GALLERY_YAML)
-    return jsonify({"status": "ok", "deleted": deleted})
+    return delete_photos(section_srcs("hero"))
 
 # --- Serve photos ---
 @app.route("/photos/<section>/<path:filename>")
@@ -194,6 +231,31 @@ def serve_photo(filename):
     photos_dir = Path(__file__).resolve().parents[3] / "config" / "photos"
     return send_from_directory(photos_dir, filename)
 
+@app.route("/thumbnails/<path:src>")
+def serve_thumbnail(src):
+    """Serve a small preview of a photo, generated on first request and cached."""
+    size = request.args.get("size", DEFAULT_THUMB_SIZE, type=int)
+    if size not in THUMB_SIZES:
+        return {"error": f"Invalid size, use one of {list(THUMB_SIZES)}"}, 400
+    # A thumbnail evicted between lookup and send is generated once more
+    for _ in range(2):
+        thumbnail = THUMBNAILS.get(app.config["PHOTOS_DIR"], src, size)
+        if thumbnail is None:
+            break
+        path, etag, last_modified, version = thumbnail
+        try:
+            response = send_file(path, mimetype="image/webp", etag=etag, last_modified=last_modified, conditional=True)
+        except FileNotFoundError:
+            continue
+        # URLs carrying the current photo version never change content, others are revalidated
+        if request.args.get("v") == version:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = THUMB_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+    return {"error": "❌ File not found"}, 404
+
 # --- Site info page & API ---
 @app.route("/site-info")
 def site_info():
@@ -203,16 +265,12 @@ def site_info():
 @app.route("/api/site-info", methods=["GET"])
 def get_site_info():
     """Get site info YAML as JSON."""
-    with open(SITE_YAML, "r") as f:
-        data = yaml.safe_load(f)
-    return jsonify(data)
+    return jsonify(read_config(SITE_YAML))
 
 @app.route("/api/site-info", methods=["POST"])
 def update_site_info():
     """Update site info YAML."""
     new_data = request.json
-    with open(SITE_YAML, "r") as f:
-        old_data = yaml.safe_load(f) or {}
 
     def deep_merge(old, new):
         for k, v in new.items():
@@ -222,9 +280,7 @@ def update_site_info():
                 old[k] = v
         return old
 
-    merged = deep_merge(old_data, new_data)
-    with open(SITE_YAML, "w") as f:
-        yaml.safe_dump(merged, f, sort_keys=False, allow_unicode=True)
+    update_config(SITE_YAML, lambda old_data: deep_merge(old_data, new_data))
     return jsonify({"status": "ok"})
 
 # --- Theme management ---
@@ -245,11 +301,7 @@ def upload_thumbnail():
         return {"error": "❌ No file provided"}, 400
     filename = "thumbnail.png"
     file.save(PHOTOS_DIR / filename)
-    with open(SITE_YAML, "r") as f:
-        data = yaml.safe_load(f)
-    data.setdefault("social", {})["thumbnail"] = filename
-    with open(SITE_YAML, "w") as f:
-        yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True)
+    update_config(SITE_YAML, lambda data: data.setdefault("social", {}).update(thumbnail=filename))
     return jsonify({"status": "ok", "filename": filename})
 
 @app.route("/api/thumbnail/remove", methods=["POST"])
@@ -259,12 +311,12 @@ def remove_thumbnail():
     thumbnail_path = PHOTOS_DIR / "thumbnail.png"
     if thumbnail_path.exists():
         thumbnail_path.unlink()
-    with open(SITE_YAML, "r") as f:
-        data = yaml.safe_load(f)
-    if "social" in data and "thumbnail" in data["social"]:
-        data["social"]["thumbnail"] = ""
-    with open(SITE_YAML, "w") as f:
-        yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True)
+
+    def clear_thumbnail(data):
+        if "social" in data and "thumbnail" in data["social"]:
+            data["social"]["thumbnail"] = ""
+
+    update_config(SITE_YAML, clear_thumbnail)
     return jsonify({"status": "ok"})
 
 # --- Theme upload ---
@@ -337,11 +389,7 @@ def update_theme_google_fonts():
     theme_name = data.get("theme_name")
     google_fonts = data.get("google_fonts", [])
     theme_yaml_path = Path(__file__).resolve().parents[3] / "config" / "themes" / theme_name / "theme.yaml"
-    with open(theme_yaml_path, "r") as f:
-        theme_yaml = yaml.safe_load(f)
-    theme_yaml["google_fonts"] = google_fonts
-    with open(theme_yaml_path, "w") as f:
-        yaml.safe_dump(theme_yaml, f, sort_keys=False, allow_unicode=True)
+    update_config(theme_yaml_path, lambda theme_yaml: theme_yaml.update(google_fonts=google_fonts))
     return jsonify({"status": "ok"})
 
 @app.route("/api/local-fonts")
@@ -365,12 +413,7 @@ def upload_favicon():
     filename = "favicon" + ext
     theme_dir = Path(__file__).resolve().parents[3] / "config" / "themes" / theme_name
     file.save(theme_dir / filename)
-    theme_yaml_path = theme_dir / "theme.yaml"
-    with open(theme_yaml_path, "r") as f:
-        theme_yaml = yaml.safe_load(f)
-    theme_yaml.setdefault("favicon", {})["path"] = filename
-    with open(theme_yaml_path, "w") as f:
-        yaml.safe_dump(theme_yaml, f, sort_keys=False, allow_unicode=True)
+    update_config(theme_dir / "theme.yaml", lambda theme_yaml: theme_yaml.setdefault("favicon", {}).update(path=filename))
     return jsonify({"status": "ok", "filename": filename})
 
 @app.route("/api/favicon/remove", methods=["POST"])
@@ -385,13 +428,12 @@ def remove_favicon():
         favicon_path = theme_dir / f"favicon{ext}"
         if favicon_path.exists():
             favicon_path.unlink()
-    theme_yaml_path = theme_dir / "theme.yaml"
-    with open(theme_yaml_path, "r") as f:
-        theme_yaml = yaml.safe_load(f)
-    if "favicon" in theme_yaml:
-        theme_yaml["favicon"]["path"] = ""
-    with open(theme_yaml_path, "w") as f:
-        yaml.safe_dump(theme_yaml, f, sort_keys=False, allow_unicode=True)
+
+    def clear_favicon(theme_yaml):
+        if "favicon" in theme_yaml:
+            theme_yaml["favicon"]["path"] = ""
+
+    update_config(theme_dir / "theme.yaml", clear_favicon)
     return jsonify({"status": "ok"})
 
 # --- Serve theme assets ---
@@ -434,79 +476,106 @@ def remove_font():
     return jsonify({"error": "❌ Font not found"}), 404
 
 # --- Build & Download ZIP ---
-@app.route("/api/build", methods=["POST"])
-def trigger_build():
-    """
-    Validate site.yaml and run build.py.
-    Does NOT create zip here; zip is created on demand in download route.
-    """
-    site_yaml_path = Path(__file__).resolve().parents[3] / "config" / "site.yaml"
-    output_folder = Path(__file__).resolve().parents[3] / "output"
-
-    if not site_yaml_path.exists():
-        return jsonify({"status": "error", "message": "❌ site.yaml not found"}), 400
-
-    with open(site_yaml_path, "r") as f:
-        site_data = yaml.safe_load(f) or {}
-
+def validate_site_data(site_data):
+    """Return an error message when a site.yaml section or value is empty, else None."""
     # Dynamically check all main sections and nested keys
     main_sections = list(site_data.keys())
     for section in main_sections:
         value = site_data.get(section)
         if not value:
-            return jsonify({"status": "error", "message": f"❌ Site info are not set: missing {section}"}), 400
+            return f"❌ Site info are not set: missing {section}"
         if isinstance(value, dict):
             for k, v in value.items():
                 if v is None or v == "" or (isinstance(v, list) and not v):
-                    return jsonify({"status": "error", "message": f"❌ Site info are not set: missing {section}.{k}"}), 400
+                    return f"❌ Site info are not set: missing {section}.{k}"
         elif isinstance(value, list):
             if not value:
-                return jsonify({"status": "error", "message": f"❌ Site info are not set: missing {section}"}), 400
+                return f"❌ Site info are not set: missing {section}"
             for idx, item in enumerate(value):
                 if isinstance(item, dict):
                     for k, v in item.items():
                         if v is None or v == "" or (isinstance(v, list) and not v):
-                            return jsonify({"status": "error", "message": f"❌ Site info are not set: missing {section}[{idx}].{k}"}), 400
+                            return f"❌ Site info are not set: missing {section}[{idx}].{k}"
                 elif item is None or item == "":
-                    return jsonify({"status": "error", "message": f"❌ Site info are not set: missing {section}[{idx}]"}), 400
+                    return f"❌ Site info are not set: missing {section}[{idx}]"
         else:
             if value is None or value == "":
-                return jsonify({"status": "error", "message": f"❌ Site info are not set: missing {section}"}), 400
+                return f"❌ Site info are not set: missing {section}"
+    return None
 
-    try:
-        subprocess.run(["python3", "build.py"], check=True)
-        return jsonify({"status": "ok"})
-    except Exception as e:
-        return jsonify({"status": "error", "message": f"❌ {str(e)}"}), 500
+@app.route("/api/build", methods=["POST"])
+def trigger_build():
+    """
+    Validate site.yaml and start an in-process build in the background.
+    While a build is running, its job is returned instead of starting a new one.
+    Progress is streamed from /api/build/<job_id>/events.
+    Does NOT create zip here; zip is created on demand in download route.
+    """
+    site_yaml_path = Path(__file__).resolve().parents[3] / "config" / "site.yaml"
+
+    if not site_yaml_path.exists():
+        return jsonify({"status": "error", "message": "❌ site.yaml not found"}), 400
+
+    error = validate_site_data(read_config(site_yaml_path))
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+
+    job, started = start_build()
+    return jsonify({"status": "ok", "job_id": job.id, "coalesced": not started}), 202
+
+@app.route("/api/build/<job_id>", methods=["GET"])
+def build_status(job_id):
+    """Get the status of a build job."""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "❌ Unknown build job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/api/build/<job_id>/events", methods=["GET"])
+def build_events(job_id):
+    """Stream build logs, progress and the final status as Server-Sent Events."""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "❌ Unknown build job"}), 404
+    last_event_id = request.headers.get("Last-Event-ID")
+    return Response(
+        stream_with_context(stream_events(job, last_event_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route("/download-output-zip", methods=["POST"])
 def download_output_zip():
     """
-    Create output zip on demand and send it to the user.
-    Zip is deleted after sending.
+    Stream the output zip to the user while it is generated.
+    The archive of the output is cached, and sent as is until the next build or output change.
     """
     output_folder = Path(__file__).resolve().parents[3] / "output"
-    zip_path = Path(__file__).resolve().parents[3] / "site_output.zip"  # Store in lumeex/ root
-
-    # Create zip on demand
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for root, dirs, files in os.walk(output_folder):
-            for file in files:
-                file_path = Path(root) / file
-                zipf.write(file_path, file_path.relative_to(output_folder))
+    build_id = get_build_id(output_folder)
 
-    @after_this_request
-    def remove_file(response):
-        try:
-            os.remove(zip_path)
-        except Exception:
-            pass
-        return response
+    archive_path = cached_archive(output_folder, build_id)
+    if archive_path:
+        return send_file(archive_path, as_attachment=True, download_name="site_output.zip", mimetype="application/zip")
 
-    return send_file(zip_path, as_attachment=True)
+    return Response(
+        stream_with_context(stream_output_zip(output_folder, build_id)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=site_output.zip"},
+    )
 
 # --- Run server ---
-if __name__ == "__main__":
-    logging.info("[~] Starting WebUI at http://0.0.0.0:5000")
+def run(mode=WEBUI_MODE, threads=WEBUI_THREADS, host="0.0.0.0", port=5000):
+    """Serve the WebUI. Builds, uploads and thumbnails keep state in this process, so it is one process with a thread pool."""
+    logging.info(f"[~] Starting WebUI at http://{host}:{port} ({mode} mode)")
     logging.info(f"[i] WebUI host port is set to {WEBUI_PORT}")
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    if mode == "development":
+        app.run(host=host, port=port, debug=True, threaded=True)
+    elif waitress_serve is None:
+        logging.warning("[~] waitress is not installed, falling back to the threaded Werkzeug server")
+        app.run(host=host, port=port, threaded=True)
+    else:
+        logging.info(f"[i] WebUI threads: {threads}")
+        waitress_serve(app, host=host, port=port, threads=threads, ident="Lumeex")
+
+if __name__ == "__main__":
+    run()
\ No newline at end of file
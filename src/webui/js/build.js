@@ -42,18 +42,61 @@ document.addEventListener("DOMContentLoaded", () => {
   const downloadZipBtn = document.getElementById("download-zip-btn");
   const zipLoader = document.getElementById("zip-loader");
 
+  // Follow a build job through Server-Sent Events until it ends
+  function followBuild(jobId) {
+    return new Promise((resolve) => {
+      const events = new EventSource(`/api/build/${jobId}/events`);
+      let lastError = "";
+      events.addEventListener("log", (event) => {
+        if (event.data.startsWith("[✗]")) lastError = event.data;
+      });
+      events.addEventListener("progress", (event) => {
+        const { done, total } = JSON.parse(event.data);
+        showLoader(`Building static site... (${done}/${total})`);
+      });
+      events.addEventListener("status", (event) => {
+        const job = JSON.parse(event.data);
+        if (job.finished) {
+          events.close();
+          resolve({ ...job, message: job.error ? `❌ ${job.error}` : lastError });
+        }
+      });
+      events.onerror = () => {
+        // EventSource reconnects by itself while the job is running
+        if (events.readyState === EventSource.CLOSED) {
+          resolve({ status: "error", message: "❌ Lost connection to the build" });
+        }
+      };
+    });
+  }
+
+  let building = false;
+
   // Build action handler
   async function handleBuildClick() {
+    // Ignore double-clicks, the backend also reuses a running build
+    if (building) return;
+    building = true;
     showLoader("Building static site...");
-    // Trigger build on backend
-    const res = await fetch("/api/build", { method: "POST" });
-    const result = await res.json();
-    hideLoader();
-    if (result.status === "ok") {
-      // Show build success modal
-      if (buildModal) buildModal.style.display = "flex";
-    } else {
-      showToast(result.message || "❌ Build failed!", "error");
+    try {
+      // Trigger build on backend
+      const res = await fetch("/api/build", { method: "POST" });
+      let result = await res.json();
+      if (result.status === "ok") {
+        result = await followBuild(result.job_id);
+      }
+      hideLoader();
+      if (result.status === "ok") {
+        // Show build success modal
+        if (buildModal) buildModal.style.display = "flex";
+      } else {
+        showToast(result.message || "❌ Build failed!", "error");
+      }
+    } catch (e) {
+      hideLoader();
+      showToast("❌ Build failed!", "error");
+    } finally {
+      building = false;
     }
   }
 
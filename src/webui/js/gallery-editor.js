@@ -1,7 +1,15 @@
 let galleryImages = [];
 let heroImages = [];
 let allTags = [];
+let tagCounts = {};
 let showOnlyUntagged = false;
+let gallerySearch = '';
+let galleryCursor = null;
+let galleryTotal = 0;
+let galleryLoading = false;
+let galleryRequest = 0;
+let photoVersions = {};
+const PAGE_SIZE = 100;
 
 // --- Fade-in helper ---
 function applyFadeInImages(container) {
@@ -17,28 +25,98 @@ function applyFadeInImages(container) {
   });
 }
 
+// --- Thumbnail URL, versioned so the browser caches it until the photo changes ---
+function thumbnailUrl(src) {
+  const version = photoVersions[src];
+  return `/thumbnails/${src}` + (version ? `?v=${version}` : '');
+}
+
+// --- Fetch one page of a section, filtered server-side ---
+async function fetchImages(section, cursor = null, filters = {}) {
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if (cursor) params.set('cursor', cursor);
+  if (filters.untagged) params.set('untagged', '1');
+  if (filters.q) params.set('q', filters.q);
+  const res = await fetch(`/api/${section}/images?${params}`);
+  if (!res.ok) throw new Error((await res.json()).error);
+  const page = await res.json();
+  Object.assign(photoVersions, page.versions || {});
+  return page;
+}
+
 // --- Load images from server on page load ---
 async function loadData() {
   try {
-    galleryImages = await (await fetch('/api/gallery')).json();
-    updateAllTags();
-    renderGallery();
-    heroImages = await (await fetch('/api/hero')).json();
-    renderHero();
+    await Promise.all([loadTags(), loadGallery(), loadHero()]);
   } catch(err) {
     console.error(err);
     showToast("Error loading images!", "error");
   }
 }
 
-// --- Update global tag list from galleryImages ---
+// --- Load the first gallery page with the current filters ---
+async function loadGallery() {
+  galleryImages = [];
+  galleryCursor = null;
+  await loadMoreGallery(true);
+}
+
+// --- Append the next gallery page ---
+async function loadMoreGallery(reset = false) {
+  if (galleryLoading && !reset) return;
+  if (!reset && !galleryCursor) return;
+  const request = ++galleryRequest;
+  galleryLoading = true;
+  try {
+    const page = await fetchImages('gallery', galleryCursor, { untagged: showOnlyUntagged, q: gallerySearch });
+    // A newer filter change won the race
+    if (request !== galleryRequest) return;
+    const start = reset ? 0 : galleryImages.length;
+    galleryImages = galleryImages.concat(page.images);
+    galleryCursor = page.next_cursor;
+    galleryTotal = page.total;
+    renderGallery(start);
+  } finally {
+    if (request === galleryRequest) galleryLoading = false;
+  }
+}
+
+// --- Hero photos are few, load every page ---
+async function loadHero() {
+  let images = [];
+  let cursor = null;
+  do {
+    const page = await fetchImages('hero', cursor);
+    images = images.concat(page.images);
+    cursor = page.next_cursor;
+  } while (cursor);
+  heroImages = images;
+  renderHero();
+}
+
+// --- Tag suggestions, counted over the whole gallery ---
+async function loadTags() {
+  const data = await (await fetch('/api/gallery/tags')).json();
+  tagCounts = {};
+  data.tags.forEach(({ tag, count }) => tagCounts[tag] = count);
+  updateAllTags();
+}
+
+// --- Update global tag list, most used first ---
 function updateAllTags() {
-  allTags = [];
-  galleryImages.forEach(img => {
-    (img.tags || []).forEach(t => {
-      if (!allTags.includes(t)) allTags.push(t);
-    });
-  });
+  allTags = Object.keys(tagCounts).sort((a, b) => tagCounts[b] - tagCounts[a]);
+}
+
+// --- Load the next page when the end of the gallery gets visible ---
+function setupInfiniteScroll() {
+  const container = document.getElementById('gallery');
+  if (!container || !('IntersectionObserver' in window)) return;
+  const sentinel = document.createElement('div');
+  sentinel.id = 'gallery-sentinel';
+  container.after(sentinel);
+  new IntersectionObserver(entries => {
+    if (entries.some(entry => entry.isIntersecting)) loadMoreGallery().catch(console.error);
+  }, { rootMargin: '800px' }).observe(sentinel);
 }
 
 // --- Helper: update count and button visibility ---
@@ -57,21 +135,17 @@ function updateCountAndButtons(prefix, count) {
   if (bottomUpload) bottomUpload.style.display = count > 0 ? 'flex' : 'none';
 }
 
-// --- Render gallery images with tags and delete buttons ---
-function renderGallery() {
+// --- Render gallery images with tags and delete buttons, from start on (appended page) ---
+function renderGallery(start = 0) {
   const container = document.getElementById('gallery');
-  container.innerHTML = '';
-  let imagesToShow = showOnlyUntagged
-    ? galleryImages.filter(img => !img.tags || img.tags.length === 0)
-    : galleryImages;
-
-  imagesToShow.forEach((img) => {
-    const i = galleryImages.indexOf(img);
+  if (start === 0) container.innerHTML = '';
+  galleryImages.slice(start).forEach((img, offset) => {
+    const i = start + offset;
     const div = document.createElement('div');
     div.className = 'photo flex-item flex-column';
     div.innerHTML = `
       <div class="flex-item">
-        <img class="fade-in-img" src="/photos/${img.src}">
+        <img class="fade-in-img" src="${thumbnailUrl(img.src)}" loading="lazy">
       </div>
       <div class="tags-display" data-index="${i}"></div>
       <div class="flex-item flex-full">
@@ -83,10 +157,10 @@ function renderGallery() {
     `;
     container.appendChild(div);
     renderTags(i, img.tags || []);
+    applyFadeInImages(div);
   });
 
-  updateCountAndButtons('gallery', imagesToShow.length);
-  applyFadeInImages(container);
+  updateCountAndButtons('gallery', galleryTotal);
 }
 
 // --- Render tags for a single image ---
@@ -140,11 +214,7 @@ function renderTags(imgIndex, tags) {
 
   const updateSuggestions = () => {
     const value = input.value.toLowerCase();
-    const allTagsFlat = galleryImages.flatMap(img => img.tags || []);
-    const tagCount = {};
-    allTagsFlat.forEach(t => tagCount[t] = (tagCount[t] || 0) + 1);
-    const allTagsSorted = Object.keys(tagCount).sort((a, b) => tagCount[b] - tagCount[a]);
-    const suggestions = allTagsSorted.filter(t => t.toLowerCase().startsWith(value) && !tags.includes(t));
+    const suggestions = allTags.filter(t => t.toLowerCase().startsWith(value) && !tags.includes(t));
     suggestionBox.innerHTML = '';
     selectedIndex = -1;
     if (suggestions.length) {
@@ -225,10 +295,26 @@ function renderTags(imgIndex, tags) {
   if (!input.value.trim()) suggestionBox.style.display = 'none';
 }
 
-// --- Update tags in galleryImages array ---
-function updateTags(index, tags) {
-  galleryImages[index].tags = tags;
-  saveGallery();
+// --- Save the tags of one image, only this entry is sent ---
+async function updateTags(index, tags) {
+  const img = galleryImages[index];
+  const previous = img.tags || [];
+  previous.filter(t => !tags.includes(t)).forEach(t => tagCounts[t] = (tagCounts[t] || 1) - 1);
+  tags.filter(t => !previous.includes(t)).forEach(t => tagCounts[t] = (tagCounts[t] || 0) + 1);
+  Object.keys(tagCounts).forEach(t => { if (tagCounts[t] <= 0) delete tagCounts[t]; });
+  updateAllTags();
+  img.tags = [...tags];
+  try {
+    const res = await fetch('/api/gallery/images', {
+      method: 'PATCH',
+      headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify({ operations: [{ src: img.src, tags }] })
+    });
+    if (!res.ok) showToast("Error: " + (await res.json()).error, "error");
+  } catch(err) {
+    console.error(err);
+    showToast("Server error!", "error");
+  }
 }
 
 // --- Render hero images with delete buttons ---
@@ -240,7 +326,7 @@ function renderHero() {
     div.className = 'photo flex-item flex-column';
     div.innerHTML = `
       <div class="flex-item">
-        <img class="fade-in-img" src="/photos/${img.src}">
+        <img class="fade-in-img" src="${thumbnailUrl(img.src)}" loading="lazy">
       </div>
       <div class="flex-item flex-full">
         <div class="flex-item flex-end">
@@ -254,31 +340,6 @@ function renderHero() {
   applyFadeInImages(container);
 }
 
-// --- Save gallery to server ---
-async function saveGallery() {
-  await fetch('/api/gallery/update', {
-    method: 'POST',
-    headers: {'Content-Type': 'application/json'},
-    body: JSON.stringify(galleryImages)
-  });
-}
-
-// --- Save hero to server ---
-async function saveHero() {
-  await fetch('/api/hero/update', {
-    method: 'POST',
-    headers: {'Content-Type': 'application/json'},
-    body: JSON.stringify(heroImages)
-  });
-}
-
-// --- Save all changes ---
-async function saveChanges() {
-  await saveGallery();
-  await saveHero();
-  showToast('✅ Changes saved!', "success");
-}
-
 // --- Refresh gallery from folder ---
 async function refreshGallery() {
   await fetch('/api/gallery/refresh', { method: 'POST' });
@@ -344,13 +405,13 @@ async function actuallyDeleteGalleryImage(index) {
     const res = await fetch('/api/gallery/delete', {
       method: 'POST',
       headers: {'Content-Type': 'application/json'},
-      body: JSON.stringify({ src: img.src.split('/').pop() })
+      body: JSON.stringify({ src: img.src.split('/').slice(1).join('/') })
     });
     const data = await res.json();
     if (res.ok) {
       galleryImages.splice(index, 1);
+      galleryTotal--;
       renderGallery();
-      await saveGallery();
       showToast("✅ Gallery image deleted!", "success");
     } else showToast("Error: " + data.error, "error");
   } catch(err) {
@@ -365,13 +426,12 @@ async function actuallyDeleteHeroImage(index) {
     const res = await fetch('/api/hero/delete', {
       method: 'POST',
       headers: {'Content-Type': 'application/json'},
-      body: JSON.stringify({ src: img.src.split('/').pop() })
+      body: JSON.stringify({ src: img.src.split('/').slice(1).join('/') })
     });
     const data = await res.json();
     if (res.ok) {
       heroImages.splice(index, 1);
       renderHero();
-      await saveHero();
       showToast("✅ Hero image deleted!", "success");
     } else showToast("Error: " + data.error, "error");
   } catch(err) {
@@ -387,8 +447,9 @@ async function actuallyDeleteAllGalleryImages() {
     const data = await res.json();
     if (res.ok) {
       galleryImages = [];
+      galleryCursor = null;
+      galleryTotal = 0;
       renderGallery();
-      await saveGallery();
       showToast("✅ All gallery images removed!", "success");
     } else showToast("Error: " + data.error, "error");
   } catch(err) {
@@ -404,7 +465,6 @@ async function actuallyDeleteAllHeroImages() {
     if (res.ok) {
       heroImages = [];
       renderHero();
-      await saveHero();
       showToast("✅ All hero images removed!", "success");
     } else showToast("Error: " + data.error, "error");
   } catch(err) {
@@ -427,12 +487,24 @@ document.addEventListener('DOMContentLoaded', () => {
   const showUntaggedRadio = document.getElementById('show-untagged-radio');
   if (showAllRadio) showAllRadio.addEventListener('change', () => {
     showOnlyUntagged = false;
-    renderGallery();
+    loadGallery();
   });
   if (showUntaggedRadio) showUntaggedRadio.addEventListener('change', () => {
     showOnlyUntagged = true;
-    renderGallery();
+    loadGallery();
+  });
+
+  // Gallery filename search, debounced
+  const searchInput = document.getElementById('gallery-search');
+  let searchTimer = null;
+  if (searchInput) searchInput.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+      gallerySearch = searchInput.value.trim();
+      loadGallery();
+    }, 300);
   });
+  setupInfiniteScroll();
 
   // Bulk delete buttons
   [
@@ -11,25 +11,106 @@ function hideLoader() {
   if (loader) loader.classList.remove("active");
 }
 
+// --- Checksums, only available on secure origins (https, localhost) ---
+const canHash = !!(window.crypto && window.crypto.subtle);
+async function sha256(blob) {
+  const digest = await crypto.subtle.digest("SHA-256", await blob.arrayBuffer());
+  return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, "0")).join("");
+}
+
+const CHUNK_RETRIES = 3;
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+// --- Session of each file being uploaded, kept to resume it after a reload ---
+const uploadKey = (section, file) => `lumeex-upload:${section}/${file.name}:${file.size}:${file.lastModified}`;
+
+// --- Chunked upload of one file, resuming from the offset the server already has ---
+async function uploadFile(section, file, onProgress) {
+  const key = uploadKey(section, file);
+  const res = await fetch(`/api/${section}/uploads`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      filename: file.name,
+      size: file.size,
+      sha256: canHash ? await sha256(file) : null,
+      upload_id: localStorage.getItem(key)
+    })
+  });
+  let upload = await res.json();
+  if (!res.ok) throw new Error(upload.error);
+  if (upload.status !== "complete") localStorage.setItem(key, upload.upload_id);
+
+  let retries = 0;
+  while (upload.status !== "complete") {
+    const chunk = file.slice(upload.offset, upload.offset + upload.chunk_size);
+    const headers = { 'Upload-Offset': String(upload.offset), 'Content-Type': 'application/octet-stream' };
+    if (canHash) headers['Upload-Checksum'] = 'sha256 ' + await sha256(chunk);
+    try {
+      const chunkRes = await fetch(`/api/uploads/${upload.upload_id}`, { method: 'PATCH', headers, body: chunk });
+      const data = await chunkRes.json();
+      if (chunkRes.ok) {
+        upload = { ...upload, ...data };
+        retries = 0;
+        onProgress(upload.offset);
+        continue;
+      }
+      // Fatal errors, the rest is retried from the server offset
+      if (chunkRes.status === 404 || chunkRes.status === 422 || retries >= CHUNK_RETRIES) throw new Error(data.error);
+      if (typeof data.offset === "number") upload.offset = data.offset;
+    } catch (err) {
+      if (retries >= CHUNK_RETRIES) throw err;
+    }
+    retries++;
+    await sleep(500 * retries);
+    const state = await fetch(`/api/uploads/${upload.upload_id}`);
+    if (state.ok) upload = { ...upload, ...(await state.json()) };
+  }
+  localStorage.removeItem(key);
+}
+
+// --- Wait for the server to register and pre-render the uploaded photos ---
+async function waitForUploadQueue() {
+  while (true) {
+    const res = await fetch('/api/uploads/queue');
+    if (!res.ok || (await res.json()).idle) return;
+    await sleep(500);
+  }
+}
+
 // --- Generic upload handler ---
-function setupUpload(inputId, apiUrl, loaderText, successMsg, refreshFn) {
+function setupUpload(inputId, section, loaderText, successMsg, refreshFn) {
   const input = document.getElementById(inputId);
   if (!input) return;
   input.addEventListener('change', async (e) => {
-    const files = e.target.files;
+    const files = Array.from(e.target.files);
     if (!files.length) return;
+    const total = files.reduce((sum, file) => sum + file.size, 0);
+    let done = 0;
+    const uploaded = [];
+    const failed = [];
     showLoader(loaderText);
-    const formData = new FormData();
-    for (const file of files) formData.append('files', file);
 
     try {
-      const res = await fetch(apiUrl, { method: 'POST', body: formData });
-      const data = await res.json();
+      for (const [index, file] of files.entries()) {
+        try {
+          await uploadFile(section, file, offset => {
+            const percent = Math.round(((done + offset) / total) * 100);
+            showLoader(`${loaderText} ${index + 1}/${files.length} (${percent}%)`);
+          });
+          uploaded.push(file.name);
+        } catch (err) {
+          console.error(err);
+          failed.push(file.name);
+        }
+        done += file.size;
+      }
+      showLoader("Processing photos...");
+      await waitForUploadQueue();
       hideLoader();
-      if (res.ok) {
-        showToast(`✅ ${data.uploaded.length} ${successMsg}`, "success");
-        if (typeof refreshFn === "function") refreshFn();
-      } else showToast('Error: ' + data.error, "error");
+      if (uploaded.length) showToast(`✅ ${uploaded.length} ${successMsg}`, "success");
+      if (failed.length) showToast(`Error: ${failed.length} file(s) failed: ${failed.join(", ")}`, "error");
+      if (typeof refreshFn === "function") refreshFn();
     } catch(err) {
       hideLoader();
       console.error(err);
@@ -41,7 +122,7 @@ function setupUpload(inputId, apiUrl, loaderText, successMsg, refreshFn) {
 }
 
 // --- Setup all upload inputs ---
-setupUpload('upload-gallery', '/api/gallery/upload', "Uploading photos...", "gallery image(s) uploaded!", refreshGallery);
-setupUpload('upload-hero', '/api/hero/upload', "Uploading hero photos...", "hero image(s) uploaded!", refreshHero);
-setupUpload('upload-gallery-bottom', '/api/gallery/upload', "Uploading photos...", "gallery image(s) uploaded!", refreshGallery);
-setupUpload('upload-hero-bottom', '/api/hero/upload', "Uploading hero photos...", "hero image(s) uploaded!", refreshHero);
\ No newline at end of file
+setupUpload('upload-gallery', 'gallery', "Uploading photos...", "gallery image(s) uploaded!", refreshGallery);
+setupUpload('upload-hero', 'hero', "Uploading hero photos...", "hero image(s) uploaded!", refreshHero);
+setupUpload('upload-gallery-bottom', 'gallery', "Uploading photos...", "gallery image(s) uploaded!", refreshGallery);
+setupUpload('upload-hero-bottom', 'hero', "Uploading hero photos...", "hero image(s) uploaded!", refreshHero);
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The builder and the WebUI are imported from the project root, as build.py and gallery.py do
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,65 @@
+import pytest
+from flask import Flask
+from src.py.webui import gallery_api
+from src.py.webui.gallery_api import bulk_update
+from src.py.builder.config_store import read_config, save_config
+
+@pytest.fixture
+def invalidated(monkeypatch):
+    """srcs whose renditions were invalidated."""
+    srcs = []
+    monkeypatch.setattr(gallery_api, "invalidate_images", lambda batch: srcs.extend(batch) or 0)
+    return srcs
+
+@pytest.fixture
+def photos_dir(tmp_path, monkeypatch, invalidated):
+    """A temp project with two gallery photos and a hero one, in an app context."""
+    monkeypatch.chdir(tmp_path)
+    photos_dir = tmp_path / "config" / "photos"
+    for src in ("gallery/a.jpg", "gallery/b.jpg", "hero/h.jpg"):
+        (photos_dir / src).parent.mkdir(parents=True, exist_ok=True)
+        (photos_dir / src).write_bytes(src.encode())
+    save_config(gallery_api.GALLERY_YAML, {
+        "gallery": {"images": [{"src": "gallery/a.jpg", "tags": ["x"]}, {"src": "gallery/b.jpg", "tags": []}]},
+        "hero": {"images": [{"src": "hero/h.jpg"}]},
+    })
+    with Flask(__name__).app_context():
+        yield photos_dir
+
+def section(name):
+    return read_config(gallery_api.GALLERY_YAML)[name]["images"]
+
+def test_delete_applies_the_valid_srcs_and_reports_the_others(photos_dir, invalidated):
+    result = bulk_update("delete", ["gallery/a.jpg", "gallery/missing.jpg", "../a.jpg", "other/a.jpg"], photos_dir)
+    assert result["done"] == ["gallery/a.jpg"]
+    assert result["failed"] == {
+        "gallery/missing.jpg": "not found",
+        "../a.jpg": "Invalid src: ../a.jpg",
+        "other/a.jpg": "Invalid src: other/a.jpg",
+    }
+    assert section("gallery") == [{"src": "gallery/b.jpg", "tags": []}]
+    assert not (photos_dir / "gallery/a.jpg").exists()
+    assert invalidated == ["gallery/a.jpg"]
+
+def test_move_skips_conflicts_and_drops_tags_in_hero(photos_dir):
+    (photos_dir / "hero/b.jpg").write_bytes(b"already there")
+    result = bulk_update("move", ["gallery/a.jpg", "gallery/b.jpg", "hero/h.jpg"], photos_dir, to="hero")
+    assert result["moved"] == {"gallery/a.jpg": "hero/a.jpg"}
+    assert result["failed"] == {"gallery/b.jpg": "hero/b.jpg already exists", "hero/h.jpg": "already in hero"}
+    assert section("gallery") == [{"src": "gallery/b.jpg", "tags": []}]
+    assert section("hero") == [{"src": "hero/h.jpg"}, {"src": "hero/a.jpg"}]
+    assert (photos_dir / "hero/a.jpg").read_bytes() == b"gallery/a.jpg"
+
+def test_retag_only_touches_gallery_entries(photos_dir):
+    result = bulk_update("retag", ["gallery/a.jpg", "gallery/b.jpg", "hero/h.jpg"], photos_dir, changes={"add_tags": ["x"]})
+    # a.jpg already had the tag
+    assert result["done"] == ["gallery/b.jpg"]
+    assert result["failed"] == {"hero/h.jpg": "only gallery entries have tags"}
+    assert [img["tags"] for img in section("gallery")] == [["x"], ["x"]]
+
+def test_nothing_written_when_every_src_fails(photos_dir):
+    path = photos_dir.parent / "gallery.yaml"
+    before = path.stat().st_mtime_ns
+    result = bulk_update("delete", ["gallery/missing.jpg"], photos_dir)
+    assert result["done"] == [] and list(result["failed"]) == ["gallery/missing.jpg"]
+    assert path.stat().st_mtime_ns == before
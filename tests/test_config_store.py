@@ -0,0 +1,56 @@
+import os
+import threading
+import multiprocessing
+import pytest
+from src.py.builder import config_store
+from src.py.builder.config_store import read_config, load_config, save_config, update_config, locked
+
+def increment(path, times):
+    for _ in range(times):
+        update_config(path, lambda data: data.update(count=data.get("count", 0) + 1))
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    path = tmp_path / "site.yaml"
+    save_config(path, {"count": 0})
+    threads = [threading.Thread(target=increment, args=(path, 25)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert read_config(path)["count"] == 200
+
+@pytest.mark.skipif(config_store.fcntl is None or not hasattr(os, "fork"), reason="file locks are POSIX only")
+def test_updates_from_other_processes_are_not_lost(tmp_path):
+    path = tmp_path / "site.yaml"
+    save_config(path, {"count": 0})
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=increment, args=(path, 25)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    increment(path, 25)
+    for process in processes:
+        process.join()
+    assert read_config(path)["count"] == 125
+
+def test_load_config_returns_a_private_copy(tmp_path):
+    path = tmp_path / "site.yaml"
+    save_config(path, {"menu": {"items": [1]}})
+    data = load_config(path)
+    data["menu"]["items"].append(2)
+    assert read_config(path) == {"menu": {"items": [1]}}
+
+def test_read_config_sees_external_edits_and_missing_files(tmp_path):
+    path = tmp_path / "site.yaml"
+    assert read_config(path) == {}
+    save_config(path, {"title": "a"})
+    assert read_config(path)["title"] == "a"
+    path.write_text("title: an edit by hand\n", encoding="utf-8")
+    assert read_config(path)["title"] == "an edit by hand"
+
+def test_locked_is_reentrant(tmp_path):
+    path = tmp_path / "site.yaml"
+    with locked(path):
+        data = load_config(path)
+        data["title"] = "nested"
+        save_config(path, data)
+    assert read_config(path)["title"] == "nested"
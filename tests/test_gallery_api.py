@@ -0,0 +1,57 @@
+import pytest
+from flask import Flask
+from src.py.webui import gallery_api
+from src.py.webui.gallery_api import encode_cursor, resume_position
+from src.py.builder.config_store import read_config, save_config
+
+def images(*names):
+    return [{"src": f"gallery/{name}.jpg", "tags": []} for name in names]
+
+def test_resume_after_the_cursor_entry():
+    entries = images("a", "b", "c", "d")
+    assert resume_position(entries, encode_cursor(1, "gallery/b.jpg")) == 2
+
+def test_resume_when_entries_before_the_cursor_were_removed():
+    entries = images("b", "c", "d")
+    assert resume_position(entries, encode_cursor(1, "gallery/b.jpg")) == 1
+
+def test_resume_when_the_cursor_entry_was_removed():
+    entries = images("a", "c", "d")
+    assert resume_position(entries, encode_cursor(1, "gallery/b.jpg")) == 1
+    assert resume_position(images("a"), encode_cursor(3, "gallery/d.jpg")) == 1
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        resume_position(images("a"), "not a cursor")
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """An app serving the gallery API on a temp project."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config" / "photos").mkdir(parents=True)
+    save_config(gallery_api.GALLERY_YAML, {"gallery": {"images": images("a", "b", "c", "d", "e")}})
+    app = Flask(__name__)
+    app.config["PHOTOS_DIR"] = tmp_path / "config" / "photos"
+    app.register_blueprint(gallery_api.gallery_api_bp)
+    return app.test_client()
+
+def test_pages_skip_nothing_when_entries_are_removed_meanwhile(client):
+    page = client.get("/api/gallery/images?limit=2").get_json()
+    seen = [img["src"] for img in page["images"]]
+    data = read_config(gallery_api.GALLERY_YAML)
+    save_config(gallery_api.GALLERY_YAML, {"gallery": {"images": data["gallery"]["images"][1:]}})
+    while page["next_cursor"]:
+        page = client.get(f"/api/gallery/images?limit=2&cursor={page['next_cursor']}").get_json()
+        seen += [img["src"] for img in page["images"]]
+    assert seen == [f"gallery/{name}.jpg" for name in "abcde"]
+
+def test_patch_writes_only_when_something_changed(client):
+    path = client.application.config["PHOTOS_DIR"].parent / "gallery.yaml"
+    before = path.stat().st_mtime_ns
+    res = client.patch("/api/gallery/images", json={"operations": [{"src": "gallery/missing.jpg", "tags": ["x"]}]})
+    assert res.get_json()["missing"] == ["gallery/missing.jpg"]
+    assert path.stat().st_mtime_ns == before
+
+    res = client.patch("/api/gallery/images", json={"operations": [{"src": ["gallery/a.jpg", "gallery/b.jpg"], "add_tags": ["x"]}]})
+    assert res.get_json()["updated"] == 2
+    assert read_config(gallery_api.GALLERY_YAML)["gallery"]["images"][0]["tags"] == ["x"]
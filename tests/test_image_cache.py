@@ -0,0 +1,75 @@
+import os
+from src.py.builder.cache import (
+    load_image_cache, save_image_cache, source_digest, params_digest,
+    cache_lookup, cache_store, prune_stale_outputs, hash_file,
+)
+
+PARAMS = {"mode": "convert", "max_width": 1140}
+
+def photo(tmp_path, name="a.jpg", data=b"photo"):
+    path = tmp_path / "photos" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+def render(cache, build_dir, key, src_path, params=PARAMS):
+    """Look an image up and, on a miss, write and store its single output."""
+    digest, stat, hit = cache_lookup(cache, key, src_path, params, build_dir)
+    if hit is None:
+        output = f"img/{key}"
+        (build_dir / output).parent.mkdir(parents=True, exist_ok=True)
+        (build_dir / output).write_bytes(src_path.read_bytes())
+        cache_store(cache, key, digest, [output], {"src": output})
+    return hit
+
+def test_lookup_hits_once_stored(tmp_path):
+    build_dir = tmp_path / "output"
+    src_path = photo(tmp_path)
+    cache = load_image_cache(build_dir)
+    assert render(cache, build_dir, "gallery/a.jpg", src_path) is None
+    save_image_cache(cache, build_dir)
+
+    cache = load_image_cache(build_dir)
+    assert render(cache, build_dir, "gallery/a.jpg", src_path) is not None
+
+def test_lookup_misses_on_new_params_content_or_missing_output(tmp_path):
+    build_dir = tmp_path / "output"
+    src_path = photo(tmp_path)
+    cache = load_image_cache(build_dir)
+    render(cache, build_dir, "gallery/a.jpg", src_path)
+
+    assert render(cache, build_dir, "gallery/a.jpg", src_path, {**PARAMS, "max_width": 800}) is None
+    src_path.write_bytes(b"edited photo")
+    assert render(cache, build_dir, "gallery/a.jpg", src_path) is None
+    (build_dir / "img" / "gallery" / "a.jpg").unlink()
+    assert render(cache, build_dir, "gallery/a.jpg", src_path) is None
+
+def test_source_hash_reused_while_size_and_mtime_match(tmp_path):
+    src_path = photo(tmp_path)
+    stat = src_path.stat()
+    cache = {"entries": {"a": {"source_hash": "cached", "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}}, "used": set()}
+    assert source_digest(cache, "a", src_path)[0] == "cached"
+    os.utime(src_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert source_digest(cache, "a", src_path)[0] == hash_file(src_path)
+
+def test_params_digest_depends_on_source_and_params():
+    assert params_digest("x", PARAMS) == params_digest("x", dict(reversed(PARAMS.items())))
+    assert params_digest("x", PARAMS) != params_digest("y", PARAMS)
+    assert params_digest("x", PARAMS) != params_digest("x", {**PARAMS, "max_width": 800})
+
+def test_save_keeps_used_entries_and_prune_removes_their_leftovers(tmp_path):
+    build_dir = tmp_path / "output"
+    cache = load_image_cache(build_dir)
+    render(cache, build_dir, "gallery/a.jpg", photo(tmp_path, "a.jpg", b"a"))
+    render(cache, build_dir, "gallery/b.jpg", photo(tmp_path, "b.jpg", b"b"))
+    save_image_cache(cache, build_dir)
+
+    # Next build only uses a.jpg
+    cache = load_image_cache(build_dir)
+    render(cache, build_dir, "gallery/a.jpg", tmp_path / "photos" / "a.jpg")
+    assert prune_stale_outputs(cache, build_dir, ("img/gallery",)) == 1
+    save_image_cache(cache, build_dir)
+
+    assert (build_dir / "img" / "gallery" / "a.jpg").exists()
+    assert not (build_dir / "img" / "gallery" / "b.jpg").exists()
+    assert set(load_image_cache(build_dir)["entries"]) == {"gallery/a.jpg"}
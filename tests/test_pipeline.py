@@ -0,0 +1,73 @@
+import os
+import pytest
+from src.py.builder.pipeline import Stage, run_stages
+
+@pytest.fixture
+def site(tmp_path):
+    """Three stages: a from ctx["value"], b after a, c from a source file."""
+    build_dir = tmp_path / "output"
+    build_dir.mkdir()
+    source = tmp_path / "c.src"
+    source.write_text("c")
+    calls = []
+
+    def writer(name, fail=False):
+        def run(ctx):
+            calls.append(name)
+            if ctx.get("fail") == name:
+                raise RuntimeError(f"{name} failed")
+            (build_dir / f"{name}.txt").write_text(str(ctx["value"]))
+            ctx[f"{name}_url"] = f"/{name}.txt"
+        return run
+
+    stages = [
+        Stage("a", writer("a"), inputs=lambda ctx: {"value": ctx["value"]},
+              outputs=lambda ctx: [build_dir / "a.txt"], provides=("a_url",)),
+        Stage("b", writer("b"), after=("a",), inputs=lambda ctx: {"url": ctx["a_url"]},
+              outputs=lambda ctx: [build_dir / "b.txt"]),
+        Stage("c", writer("c"), inputs=lambda ctx: {"source": source},
+              outputs=lambda ctx: [build_dir / "c.txt"]),
+    ]
+
+    def build(**kwargs):
+        calls.clear()
+        ctx = {"value": kwargs.pop("value", 1), **kwargs.pop("ctx", {})}
+        run_stages(stages, ctx, build_dir, **kwargs)
+        return sorted(calls), ctx
+
+    return build, build_dir, source
+
+def test_unchanged_stages_are_skipped_and_restore_what_they_provide(site):
+    build, _, _ = site
+    assert build()[0] == ["a", "b", "c"]
+    ran, ctx = build()
+    assert ran == []
+    assert ctx["a_url"] == "/a.txt"
+
+def test_changed_input_reruns_the_stage_and_its_dependents(site):
+    build, _, source = site
+    build()
+    assert build(value=2)[0] == ["a", "b"]
+    source.write_text("edited c")
+    assert build(value=2)[0] == ["c"]
+
+def test_missing_output_reruns_only_that_stage(site):
+    build, build_dir, _ = site
+    build()
+    (build_dir / "b.txt").unlink()
+    assert build()[0] == ["b"]
+
+def test_failed_stage_runs_again_next_time(site):
+    build, _, _ = site
+    with pytest.raises(RuntimeError):
+        build(ctx={"fail": "a"})
+    assert build()[0] == ["a", "b"]
+
+def test_targets_only_check_the_named_stages_and_their_dependents(site):
+    build, _, source = site
+    build()
+    os.utime(source, ns=(0, 0))
+    # a changed too, but only c was reported changed: a and b reuse the previous results
+    ran, ctx = build(value=2, targets=["c"])
+    assert ran == ["c"]
+    assert ctx["a_url"] == "/a.txt"
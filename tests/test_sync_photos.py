@@ -0,0 +1,84 @@
+import os
+import pytest
+from src.py.builder import gallery_builder
+from src.py.builder.config_store import read_config, save_config
+
+@pytest.fixture
+def photos(tmp_path, monkeypatch):
+    """An empty project in a temp dir, return the photos dir."""
+    monkeypatch.chdir(tmp_path)
+    for section in gallery_builder.SECTIONS:
+        (tmp_path / "config" / "photos" / section).mkdir(parents=True)
+    return tmp_path / "config" / "photos"
+
+def add(photos, *srcs):
+    for src in srcs:
+        (photos / src).write_bytes(f"content of {src}".encode())
+
+def entries(section):
+    return (read_config(gallery_builder.GALLERY_YAML).get(section) or {}).get("images") or []
+
+def tag_gallery(tags):
+    data = read_config(gallery_builder.GALLERY_YAML)
+    images = [{**img, "tags": tags} for img in data["gallery"]["images"]]
+    save_config(gallery_builder.GALLERY_YAML, {**data, "gallery": {"images": images}})
+
+def test_new_photos_are_appended_and_deleted_ones_dropped(photos):
+    add(photos, "gallery/a.jpg", "hero/h.jpg")
+    gallery_builder.sync_photos()
+    assert entries("gallery") == [{"src": "gallery/a.jpg", "tags": []}]
+    assert entries("hero") == [{"src": "hero/h.jpg"}]
+
+    add(photos, "gallery/b.jpg")
+    (photos / "gallery/a.jpg").unlink()
+    gallery_builder.sync_photos()
+    assert entries("gallery") == [{"src": "gallery/b.jpg", "tags": []}]
+
+def test_rename_keeps_the_entry_tags_and_place(photos):
+    add(photos, "gallery/a.jpg", "gallery/b.jpg", "gallery/c.jpg")
+    gallery_builder.sync_photos()
+    tag_gallery(["kept"])
+
+    os.rename(photos / "gallery/a.jpg", photos / "gallery/renamed.jpg")
+    gallery_builder.sync_photos()
+    assert entries("gallery") == [
+        {"src": "gallery/renamed.jpg", "tags": ["kept"]},
+        {"src": "gallery/b.jpg", "tags": ["kept"]},
+        {"src": "gallery/c.jpg", "tags": ["kept"]},
+    ]
+
+def test_move_to_hero_keeps_the_entry_without_tags(photos):
+    add(photos, "gallery/a.jpg", "gallery/b.jpg", "hero/h.jpg")
+    gallery_builder.sync_photos()
+    tag_gallery(["kept"])
+
+    os.rename(photos / "gallery/a.jpg", photos / "hero/a.jpg")
+    gallery_builder.sync_photos()
+    assert entries("gallery") == [{"src": "gallery/b.jpg", "tags": ["kept"]}]
+    assert entries("hero") == [{"src": "hero/h.jpg"}, {"src": "hero/a.jpg"}]
+
+def test_photo_overwritten_in_place_is_hashed_again(photos):
+    add(photos, "gallery/a.jpg", "gallery/b.jpg")
+    gallery_builder.sync_photos()
+    tag_gallery(["kept"])
+
+    # New content, the dir mtime is left as it was
+    folder = photos / "gallery"
+    folder_stat = folder.stat()
+    (folder / "b.jpg").write_bytes(b"new content of b")
+    os.utime(folder, ns=(folder_stat.st_atime_ns, folder_stat.st_mtime_ns))
+    gallery_builder.sync_photos()
+
+    # Found by its new hash once renamed
+    os.rename(folder / "b.jpg", folder / "moved.jpg")
+    gallery_builder.sync_photos()
+    assert entries("gallery") == [
+        {"src": "gallery/a.jpg", "tags": ["kept"]},
+        {"src": "gallery/moved.jpg", "tags": ["kept"]},
+    ]
+
+def test_syncing_one_section_leaves_the_other_alone(photos):
+    add(photos, "gallery/a.jpg", "hero/h.jpg")
+    gallery_builder.sync_photos(("gallery",))
+    assert entries("gallery") == [{"src": "gallery/a.jpg", "tags": []}]
+    assert entries("hero") == []
@@ -0,0 +1,62 @@
+import hashlib
+import pytest
+from flask import Flask
+from src.py.webui import upload
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """An app serving the upload routes into a temp photos dir, with the queue stubbed out."""
+    queued = []
+    monkeypatch.setattr(upload, "enqueue", lambda section, src: queued.append(src))
+    app = Flask(__name__)
+    app.config["PHOTOS_DIR"] = tmp_path / "photos"
+    app.register_blueprint(upload.upload_bp)
+    client = app.test_client()
+    client.queued = queued
+    client.photos_dir = tmp_path / "photos"
+    return client
+
+def start(client, data, **fields):
+    res = client.post("/api/gallery/uploads", json={"filename": "a.jpg", "size": len(data), **fields})
+    assert res.status_code == 201
+    return res.get_json()
+
+def send(client, upload_id, offset, chunk, **headers):
+    return client.patch(f"/api/uploads/{upload_id}", data=chunk, headers={"Upload-Offset": str(offset), **headers})
+
+def test_chunks_complete_the_upload(client):
+    data = b"0123456789"
+    session = start(client, data, sha256=hashlib.sha256(data).hexdigest())
+    assert send(client, session["upload_id"], 0, data[:6]).get_json()["offset"] == 6
+    res = send(client, session["upload_id"], 6, data[6:])
+    assert res.get_json()["status"] == "complete"
+    assert (client.photos_dir / "gallery" / "a.jpg").read_bytes() == data
+    assert client.queued == ["gallery/a.jpg"]
+    assert session["upload_id"] not in upload._session_locks
+
+def test_offset_mismatch_is_rejected_with_the_current_offset(client):
+    data = b"0123456789"
+    session = start(client, data)
+    send(client, session["upload_id"], 0, data[:4])
+    res = send(client, session["upload_id"], 2, data[2:6])
+    assert res.status_code == 409
+    assert res.get_json()["offset"] == 4
+    assert client.get(f"/api/uploads/{session['upload_id']}").get_json()["offset"] == 4
+
+def test_corrupted_chunk_is_dropped(client):
+    data = b"0123456789"
+    session = start(client, data)
+    res = send(client, session["upload_id"], 0, data[:4], **{"Upload-Checksum": "sha256 " + "0" * 64})
+    assert res.status_code == 400
+    assert client.get(f"/api/uploads/{session['upload_id']}").get_json()["offset"] == 0
+
+def test_sessions_are_resumed_by_id_only(client):
+    data = b"0123456789"
+    first = start(client, data, modified=1)
+    # Another client with a file of the same name, size and mtime
+    assert start(client, data, modified=1)["upload_id"] != first["upload_id"]
+    send(client, first["upload_id"], 0, data[:4])
+    resumed = start(client, data, upload_id=first["upload_id"])
+    assert (resumed["upload_id"], resumed["offset"]) == (first["upload_id"], 4)
+    # Not the same file anymore
+    assert start(client, data + b"!", upload_id=first["upload_id"])["upload_id"] != first["upload_id"]